@@ -1,109 +1,91 @@
-import yfinance as yf
-import pandas as pd
 import matplotlib.pyplot as plt
 
-def analyze_fra_strategy(symbol='AIR.PA', start_date='2021-01-01', end_date='2022-12-31', show_plot=True):
+from strategies import register_strategy, run_strategy
+
+# Version du code de la stratégie : à incrémenter à chaque changement de logique
+# (invalide les résultats mis en cache)
+STRATEGY_VERSION = 3
+
+# Paramètres de la stratégie (fenêtres SMA sur l'ouverture, seuils de vente)
+INITIAL_CAPITAL = 671283
+DEFAULT_PARAMS = {
+    'sma_short': 20,
+    'sma_mid': 50,
+    'sma_long': 200,
+    'stop_loss': 0.90,          # stop-loss : prix chute > 10% du dernier achat
+    'trailing_stop': 0.95,      # trailing stop : recul de 5% depuis le plus haut
+    'trailing_sell_pct': 50.0   # part de la position vendue par le trailing stop
+}
+
+
+# Spécification compilée vers le moteur commun (voir strategies.py)
+SPEC = register_strategy({
+    'name': 'FRA',
+    'label': '🇫🇷',
+    'description': "TripleSMA sur l'ouverture + stop-loss + trailing stop",
+    'version': STRATEGY_VERSION,
+    'source': 'Open',
+    'capital': INITIAL_CAPITAL,
+    'params': DEFAULT_PARAMS,
+    # Grille balayée par défaut par l'optimiseur, autour des valeurs par défaut
+    'grid': {
+        'sma_short': [10, 15, 20, 25, 30],
+        'sma_mid': [40, 50, 60, 75],
+        'sma_long': [150, 200, 250],
+        'stop_loss': [0.85, 0.90, 0.95],
+        'trailing_stop': [0.90, 0.95],
+        'trailing_sell_pct': [50.0, 100.0]
+    },
+    'ordered': ['sma_short', 'sma_mid', 'sma_long'],
+    'indicators': {
+        'SMA20': {'type': 'sma', 'window': '$sma_short'},
+        'SMA50': {'type': 'sma', 'window': '$sma_mid'},
+        'SMA200': {'type': 'sma', 'window': '$sma_long'}
+    },
+    'entry': ['and', ['>', 'price', 'SMA20'], ['>', 'SMA20', 'SMA50'], ['>', 'SMA50', 'SMA200']],
+    # La dernière règle vérifiée l'emporte : trailing stop > stop-loss > croisement
+    'exits': [
+        {'when': ['and', ['>', ['prev', 'SMA20'], ['prev', 'SMA50']], ['<', 'SMA20', 'SMA50']]},
+        {'stop_loss': '$stop_loss'},
+        {'trailing_stop': '$trailing_stop', 'sell_pct': '$trailing_sell_pct'}
+    ],
+    'mode': 'sequential',
+    'sizing': 'floor',
+    'require_indicators': True,
+    'first_bar': 1,
+    'chart': {'sma5': 'SMA20', 'sma35': 'SMA50', 'sma65': 'SMA200'}
+})
+
+
+def indicator_columns(params):
+    """Indicateurs de la stratégie, par colonne ajoutée au tableau de cours"""
+    return SPEC.indicator_columns(params)
+
+
+def analyze_fra_strategy(symbol='AIR.PA', start_date='2021-01-01', end_date='2022-12-31', show_plot=True,
+                         interval='1d'):
     """
     Analyse une action selon une stratégie SMA améliorée
     - Achat : Prix > SMA20 > SMA50 > SMA200
     - Vente : SMA20 croise sous SMA50 OU stop-loss OU trailing stop
+
+    interval : intervalle des barres ('1d', '1h', '5m'... ; voir intraday.py
+    pour les historiques intraday trop longs pour la mémoire)
     """
 
-    excel = pd.DataFrame(columns=['Date', 'Ordre', 'Valeur', 'Quantite', 'Prix', 'Solde restant'])
-
-    # Récupérer les données
-    stock_data = yf.download(symbol, start=start_date, end=end_date, interval='1d', auto_adjust=True, progress=False)
-    if stock_data.empty:
-        raise ValueError(f"Aucune donnée trouvée pour {symbol}")
-
-    stock_data = stock_data.reset_index()
-
-    # Calculer les moyennes mobiles
-    stock_data['SMA20'] = stock_data['Open'].rolling(window=20).mean()
-    stock_data['SMA50'] = stock_data['Open'].rolling(window=50).mean()
-    stock_data['SMA200'] = stock_data['Open'].rolling(window=200).mean()
-
-    # Colonnes supplémentaires
-    stock_data['Signal'] = 0
-    stock_data['Buy_Price'] = 0.0
-    stock_data['Sell_Price'] = 0.0
-    stock_data['Quantity'] = 0
-
-    # Capital de départ
-    transaction_amount = 671283
-    initial_capital = transaction_amount
-    to_sell = 0
-    last_buy_price = None
-    highest_price = None  # pour trailing stop
-
-    # Boucle de décision
-    for i in range(1, len(stock_data)):
-        row = stock_data.iloc[i]
-
-        # Vérif signaux uniquement si les SMA existent
-        if pd.notna(row['SMA20']) and pd.notna(row['SMA50']) and pd.notna(row['SMA200']):
-            price = row['Open']
-
-            # ---- Signal d'achat ----
-            if price > row['SMA20'] > row['SMA50'] > row['SMA200']:
-                if transaction_amount >= price:  # assez de capital
-                    stock_paid = transaction_amount // price
-                    if stock_paid > 0:
-                        transaction = stock_paid * price
-                        transaction_amount -= transaction
-                        to_sell += stock_paid
-                        last_buy_price = price
-                        highest_price = price  # reset trailing stop
-
-                        excel = excel._append({
-                            'Date': row['Date'],
-                            'Ordre': "Achat",
-                            'Valeur': symbol,
-                            'Quantite': stock_paid,
-                            'Prix': price,
-                            'Solde restant': transaction_amount
-                        }, ignore_index=True)
-
-            # ---- Mise à jour du plus haut (trailing stop) ----
-            if to_sell > 0:
-                highest_price = max(highest_price, price) if highest_price else price
-
-            # ---- Signal de vente ----
-            sell_qty = 0
-
-            # (1) Croisement SMA20 < SMA50
-            prev_row = stock_data.iloc[i-1]
-            if prev_row['SMA20'] > prev_row['SMA50'] and row['SMA20'] < row['SMA50']:
-                sell_qty = to_sell
-
-            # (2) Stop-loss : prix chute > 10% du dernier achat
-            if last_buy_price and price < last_buy_price * 0.90:
-                sell_qty = to_sell
-
-            # (3) Trailing stop : prix recule de 5% par rapport au plus haut atteint
-            if highest_price and price < highest_price * 0.95:
-                sell_qty = int(to_sell * 0.5)  # on vend seulement la moitié
-
-            if sell_qty > 0 and to_sell > 0:
-                transaction_amount += sell_qty * price
-                to_sell -= sell_qty
-                excel = excel._append({
-                    'Date': row['Date'],
-                    'Ordre': "Vente",
-                    'Valeur': symbol,
-                    'Quantite': sell_qty,
-                    'Prix': price,
-                    'Solde restant': transaction_amount
-                }, ignore_index=True)
+    result = run_strategy(SPEC, symbol, start_date, end_date, interval=interval, keep_frame=True)
+    stock_data = result.pop('frame')
+    result.pop('fills')
+    ledger = result['ledger']
 
     # Afficher les résultats
     if show_plot:
-        print(f"Capital final: {transaction_amount}")
-        print(f"Actions restantes: {to_sell}")
+        print(f"Capital final: {result['final_capital']}")
+        print(f"Actions restantes: {result['shares_remaining']}")
 
         # Sauvegarde Excel
         file_name = f'{symbol.replace(".", "_")}_SMA.xlsx'
-        excel.to_excel(file_name)
+        ledger.to_frame().to_excel(file_name)
 
         # Graphique
         plt.figure(figsize=(12, 6))
@@ -120,13 +102,7 @@ def analyze_fra_strategy(symbol='AIR.PA', start_date='2021-01-01', end_date='202
         plt.tight_layout()
         plt.show()
 
-    return {
-        'symbol': symbol,
-        'final_capital': int(transaction_amount),
-        'shares_remaining': int(to_sell),
-        'initial_capital': initial_capital,
-        'transactions': excel.to_dict('records')
-    }
+    return result
 
 
 if __name__ == "__main__":
@@ -1,9 +1,65 @@
-import yfinance as yf
-import pandas as pd
 import matplotlib.pyplot as plt
 
-
-def analyze_usa_strategy(symbol='DXCM', start_date='2021-01-01', end_date='2022-12-31', show_plot=True):
+from strategies import register_strategy, run_strategy
+
+# Version du code de la stratégie : à incrémenter à chaque changement de logique
+# (invalide les résultats mis en cache)
+STRATEGY_VERSION = 3
+
+# Paramètres de la stratégie (fenêtres SMA sur la clôture, seuils de sortie)
+INITIAL_CAPITAL = 500000
+DEFAULT_PARAMS = {
+    'sma_fast': 10,
+    'sma_slow': 30,
+    'stop_loss': 0.93,     # vente totale si le prix chute de 7% depuis l'achat
+    'take_profit': 1.15,   # vente totale si le prix monte de 15% depuis l'achat
+    'sell_pct': 90.0       # part de la position vendue sur croisement baissier
+}
+
+
+# Spécification compilée vers le moteur commun (voir strategies.py)
+SPEC = register_strategy({
+    'name': 'USA',
+    'label': '🇺🇸',
+    'description': "Dual SMA sur la clôture + stop-loss + take-profit",
+    'version': STRATEGY_VERSION,
+    'source': 'Close',
+    'capital': INITIAL_CAPITAL,
+    'params': DEFAULT_PARAMS,
+    # Grille balayée par défaut par l'optimiseur, autour des valeurs par défaut
+    'grid': {
+        'sma_fast': [5, 8, 10, 12, 15, 20],
+        'sma_slow': [20, 30, 40, 50, 60],
+        'stop_loss': [0.90, 0.93, 0.95],
+        'take_profit': [1.10, 1.15, 1.20, 1.30],
+        'sell_pct': [50.0, 90.0, 100.0]
+    },
+    'ordered': ['sma_fast', 'sma_slow'],
+    'indicators': {
+        'SMA_10': {'type': 'sma', 'window': '$sma_fast'},
+        'SMA_30': {'type': 'sma', 'window': '$sma_slow'}
+    },
+    'entry': ['cross_above', 'SMA_10', 'SMA_30'],
+    # Achat, sinon croisement baissier, sinon stop-loss, sinon take-profit
+    'exits': [
+        {'when': ['cross_below', 'SMA_10', 'SMA_30'], 'sell_pct': '$sell_pct'},
+        {'stop_loss': '$stop_loss', 'order': 'STOP_LOSS'},
+        {'take_profit': '$take_profit', 'order': 'TAKE_PROFIT'}
+    ],
+    'mode': 'exclusive',
+    'sizing': 'truncate',
+    'reset_on_exit': True,
+    'chart': {'sma5': 'SMA_10', 'sma35': 'SMA_30'}
+})
+
+
+def indicator_columns(params):
+    """Indicateurs de la stratégie, par colonne ajoutée au tableau de cours"""
+    return SPEC.indicator_columns(params)
+
+
+def analyze_usa_strategy(symbol='DXCM', start_date='2021-01-01', end_date='2022-12-31', show_plot=True,
+                         interval='1d'):
     """
     Analyse une action selon la stratégie USA (Dual SMA 10/30 + StopLoss + TakeProfit)
 
@@ -12,115 +68,29 @@ def analyze_usa_strategy(symbol='DXCM', start_date='2021-01-01', end_date='2022-
         start_date: Date de début (format 'YYYY-MM-DD')
         end_date: Date de fin (format 'YYYY-MM-DD')
         show_plot: Afficher le graphique ou non
+        interval: Intervalle des barres ('1d', '1h', '5m'... ; voir intraday.py
+            pour les historiques intraday trop longs pour la mémoire)
 
     Returns:
         dict: Résultats de l'analyse
     """
 
-    excel = pd.DataFrame(columns=['Date', 'Ordre', 'Valeur', 'Quantite', 'Prix', 'Solde restant'])
-
-    # Charger données
-    stock_data = yf.download(symbol, start=start_date, end=end_date, interval='1d', auto_adjust=True, progress=False)
-    if stock_data.empty:
-        raise ValueError(f"Aucune donnée trouvée pour {symbol}")
-
-    stock_data = stock_data.reset_index()
+    result = run_strategy(SPEC, symbol, start_date, end_date, interval=interval, keep_frame=True)
+    stock_data = result.pop('frame')
+    fills = result.pop('fills')
+    ledger = result['ledger']
     stock_data['Datetime'] = stock_data['Date']
 
-    # Calcul SMA 10 et 30
-    stock_data['SMA_10'] = stock_data['Close'].rolling(window=10).mean()
-    stock_data['SMA_30'] = stock_data['Close'].rolling(window=30).mean()
-
-    # Signal basé sur croisement SMA
-    stock_data['Signal'] = 0
-    stock_data.loc[(stock_data['SMA_10'] > stock_data['SMA_30']) &
-                   (stock_data['SMA_10'].shift(1) <= stock_data['SMA_30'].shift(1)), 'Signal'] = 1
-    stock_data.loc[(stock_data['SMA_10'] < stock_data['SMA_30']) &
-                   (stock_data['SMA_10'].shift(1) >= stock_data['SMA_30'].shift(1)), 'Signal'] = -1
-
-    # Colonnes de trading
-    stock_data['Buy_Price'] = 0.0
-    stock_data['Sell_Price'] = 0.0
-    stock_data['Quantity'] = 0
-
-    # Paramètres
-    transaction_amount = 500000
-    initial_capital = transaction_amount
-    to_sell = 0
-    last_buy_price = None
-
-    for i in stock_data.index:
-        price = stock_data['Close'][i]
-
-        # ---- Achat ----
-        if stock_data['Signal'][i] == 1:
-            if transaction_amount >= price:
-                qty = int(transaction_amount / price)
-                cost = qty * price
-                transaction_amount -= cost
-                to_sell += qty
-                last_buy_price = price
-
-                stock_data.loc[i, 'Buy_Price'] = price
-                stock_data.loc[i, 'Quantity'] = qty
-
-                new_row = {'Date': stock_data['Datetime'][i],
-                           'Ordre': "Achat",
-                           'Valeur': symbol,
-                           'Quantite': qty,
-                           'Prix': price,
-                           'Solde restant': transaction_amount}
-                excel = excel._append(new_row, ignore_index=True)
-
-        # ---- Vente par croisement ----
-        elif stock_data['Signal'][i] == -1 and to_sell > 0:
-            sell_qty = int((to_sell * 90) / 100)
-            transaction_amount += sell_qty * price
-            to_sell -= sell_qty
-            last_buy_price = None
-
-            stock_data.loc[i, 'Sell_Price'] = price
-
-            new_row = {'Date': stock_data['Datetime'][i],
-                       'Ordre': "Vente",
-                       'Valeur': symbol,
-                       'Quantite': sell_qty,
-                       'Prix': price,
-                       'Solde restant': transaction_amount}
-            excel = excel._append(new_row, ignore_index=True)
-
-        # ---- Stop Loss ----
-        elif last_buy_price and to_sell > 0 and price < last_buy_price * 0.93:
-            transaction_amount += to_sell * price
-            new_row = {'Date': stock_data['Datetime'][i],
-                       'Ordre': "StopLoss",
-                       'Valeur': symbol,
-                       'Quantite': to_sell,
-                       'Prix': price,
-                       'Solde restant': transaction_amount}
-            excel = excel._append(new_row, ignore_index=True)
-            to_sell = 0
-            last_buy_price = None
-
-        # ---- Take Profit ----
-        elif last_buy_price and to_sell > 0 and price > last_buy_price * 1.15:
-            transaction_amount += to_sell * price
-            new_row = {'Date': stock_data['Datetime'][i],
-                       'Ordre': "TakeProfit",
-                       'Valeur': symbol,
-                       'Quantite': to_sell,
-                       'Prix': price,
-                       'Solde restant': transaction_amount}
-            excel = excel._append(new_row, ignore_index=True)
-            to_sell = 0
-            last_buy_price = None
-
-    # Sauvegarde Excel
-    file_name = f'{symbol.replace(".", "_")}_USA.xlsx'
-    excel.to_excel(file_name)
-
-    # Graphique
+    # Colonnes de trading (graphique)
+    stock_data['Buy_Price'] = fills['buy_price']
+    stock_data['Sell_Price'] = fills['sell_price']
+    stock_data['Quantity'] = fills['quantity']
+
+    # Graphique et sauvegarde Excel (exécution en script uniquement)
     if show_plot:
+        file_name = f'{symbol.replace(".", "_")}_USA.xlsx'
+        ledger.to_frame().to_excel(file_name)
+
         plt.figure(figsize=(12, 6))
         plt.plot(stock_data['Datetime'], stock_data['Close'], label="Close", color="blue")
         plt.plot(stock_data['Datetime'], stock_data['SMA_10'], label="SMA_10", color="orange")
@@ -136,19 +106,7 @@ def analyze_usa_strategy(symbol='DXCM', start_date='2021-01-01', end_date='2022-
         plt.tight_layout()
         plt.show()
 
-    return {
-        'symbol': symbol,
-        'final_capital': int(transaction_amount),
-        'shares_remaining': int(to_sell),
-        'initial_capital': initial_capital,
-        'transactions': excel.to_dict('records'),
-        'chart_data': {
-            'dates': stock_data['Datetime'].tolist(),
-            'prices': stock_data['Close'].tolist(),
-            'sma10': stock_data['SMA_10'].tolist(),
-            'sma30': stock_data['SMA_30'].tolist()
-        }
-    }
+    return result
 
 
 if __name__ == "__main__":
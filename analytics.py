@@ -0,0 +1,150 @@
+"""
+Indicateurs de performance d'une simulation, calculés sur la courbe de valeur
+
+À partir de la valeur du portefeuille par barre et du tableau des
+transactions d'une engine.Simulation : Sharpe, Sortino, drawdown maximal et
+sa durée, CAGR, exposition, taux de réussite et profit factor. Tout est
+calculé en opérations vectorisées sur les tableaux, sans boucle Python par
+barre ni par transaction : assez peu coûteux pour accompagner chaque
+combinaison d'un balayage ou chaque symbole d'un screener.
+
+Les transactions sont regroupées en cycles, de l'ouverture d'une position à
+son retour à zéro (achats et ventes partielles compris) ; le résultat d'un
+cycle est l'écart de trésorerie entre son début et sa fin, frais inclus.
+"""
+
+import numpy as np
+
+from engine import ACHAT
+
+# Barres par an quand les dates ne permettent pas de l'estimer (séance boursière)
+PERIODS_PER_YEAR = 252
+DAYS_PER_YEAR = 365.25
+
+METRICS = ('sharpe', 'sortino', 'max_drawdown', 'max_drawdown_duration', 'cagr', 'exposure',
+           'win_rate', 'profit_factor', 'round_trips')
+
+# Position considérée comme soldée (ventes en fractions d'actions)
+FLAT_POSITION = 1e-9
+
+
+def _years(dates, n):
+    """Durée couverte par les barres, en années (dates datetime64 ou None)"""
+    if dates is not None and len(dates) > 1:
+        dates = np.asarray(dates, dtype='datetime64[ns]')
+        days = (dates[-1] - dates[0]) / np.timedelta64(1, 'D')
+        if days > 0:
+            return days / DAYS_PER_YEAR
+    return n / PERIODS_PER_YEAR
+
+
+def _ratio(numerator, denominator):
+    return float(numerator / denominator) if denominator > 0 else None
+
+
+def _round_trips(trades, signed, capital):
+    """Résultat de chaque cycle clôturé (ouverture -> position nulle), en écart de trésorerie"""
+    flat = np.flatnonzero(np.abs(np.cumsum(signed)) <= FLAT_POSITION)
+    if len(flat) == 0:
+        return np.empty(0)
+    cash = trades['cash']
+    cash_before = np.concatenate(([capital], cash[:-1]))
+    starts = np.concatenate(([0], flat[:-1] + 1))
+    return cash[flat] - cash_before[starts]
+
+
+def performance(simulation, capital, dates=None):
+    """
+    Indicateurs de performance d'une simulation
+
+    Args:
+        simulation: engine.Simulation (equity : valeur par barre, trades)
+        capital: capital initial
+        dates: dates des barres (annualisation sur la durée réelle ; à défaut
+            PERIODS_PER_YEAR barres par an)
+
+    Returns:
+        dict (METRICS) : sharpe et sortino annualisés, max_drawdown (fraction),
+        max_drawdown_duration (barres sous le dernier plus haut), cagr et
+        exposure (part des barres en position) en fractions, win_rate et
+        profit_factor des cycles clôturés, round_trips ; None quand un ratio
+        n'est pas défini (aucune variation, aucune perte...)
+    """
+    equity = np.asarray(simulation.equity, dtype=np.float64)
+    n = len(equity)
+    # Valeurs manquantes (barres sans prix) : dernière valeur connue
+    known = np.isfinite(equity)
+    if not known.all():
+        last = np.maximum.accumulate(np.where(known, np.arange(n), -1))
+        equity = np.where(last >= 0, equity[np.maximum(last, 0)], capital)
+    curve = np.concatenate(([float(capital)], equity))
+
+    years = _years(dates, n)
+    periods_per_year = n / years if years > 0 else PERIODS_PER_YEAR
+
+    # Rendements par barre
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = curve[1:] / curve[:-1] - 1.0
+    returns = returns[np.isfinite(returns)]
+    if len(returns) > 1:
+        mean = returns.mean()
+        downside = np.sqrt(np.mean(np.minimum(returns, 0.0) ** 2))
+        sharpe = _ratio(mean * np.sqrt(periods_per_year), returns.std(ddof=1))
+        sortino = _ratio(mean * np.sqrt(periods_per_year), downside)
+    else:
+        sharpe = sortino = None
+
+    # Drawdown et durée sous le dernier plus haut
+    peak = np.maximum.accumulate(curve)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdown = np.where(peak > 0, 1.0 - curve / peak, 0.0)
+    positions = np.arange(len(curve))
+    last_peak = np.maximum.accumulate(np.where(curve >= peak, positions, 0))
+    duration = int((positions - last_peak).max())
+
+    cagr = None
+    if years > 0 and curve[-1] > 0 and capital > 0:
+        cagr = float((curve[-1] / capital) ** (1.0 / years) - 1.0)
+
+    # Exposition (position ouverte en fin de barre) et cycles, sur les quantités signées
+    trades = simulation.trades
+    signed = np.where(trades['order'] == ACHAT, trades['quantity'], -trades['quantity'])
+    if len(trades) and n:
+        held = np.cumsum(np.bincount(trades['index'], weights=signed, minlength=n)[:n])
+        exposure = float(np.mean(held > FLAT_POSITION))
+    else:
+        exposure = 0.0
+
+    pnl = _round_trips(trades, signed, capital)
+    gains = pnl[pnl > 0].sum()
+    losses = -pnl[pnl < 0].sum()
+    return {
+        'sharpe': sharpe,
+        'sortino': sortino,
+        'max_drawdown': float(max(drawdown.max(), 0.0)),
+        'max_drawdown_duration': duration,
+        'cagr': cagr,
+        'exposure': exposure,
+        'win_rate': _ratio((pnl > 0).sum(), len(pnl)),
+        'profit_factor': _ratio(gains, losses),
+        'round_trips': len(pnl)
+    }
+
+
+def _rounded(value, digits, scale=1.0):
+    return None if value is None else round(value * scale, digits)
+
+
+def format_metrics(metrics):
+    """Indicateurs de performance au format du frontend (pourcentages, clés camelCase)"""
+    return {
+        'sharpe': _rounded(metrics['sharpe'], 2),
+        'sortino': _rounded(metrics['sortino'], 2),
+        'maxDrawdown': _rounded(metrics['max_drawdown'], 1, 100.0),
+        'maxDrawdownDuration': metrics['max_drawdown_duration'],
+        'cagr': _rounded(metrics['cagr'], 1, 100.0),
+        'exposure': _rounded(metrics['exposure'], 1, 100.0),
+        'winRate': _rounded(metrics['win_rate'], 1, 100.0),
+        'profitFactor': _rounded(metrics['profit_factor'], 2),
+        'roundTrips': metrics['round_trips']
+    }
@@ -216,19 +216,18 @@ export class PriceChartComponent implements OnChanges, AfterViewInit {
     // Effacer le canvas
     ctx.clearRect(0, 0, width, height);
 
-    // Filtrer et valider les données
-    const validPrices = this.data.prices.filter(p => p !== null && p !== undefined && !isNaN(p) && p !== 0);
-    const validSma5 = this.data.sma5.filter(p => p !== null && p !== undefined && !isNaN(p) && p !== 0);
-    const validSma35 = this.data.sma35.filter(p => p !== null && p !== undefined && !isNaN(p) && p !== 0);
-    const validSma65 = this.data.sma65.filter(p => p !== null && p !== undefined && !isNaN(p) && p !== 0);
+    // Séries en Float64Array (NaN pour les trous) : bornes calculées sans copie
+    const prices = this.data.prices;
+    const lines = [this.data.sma5, this.data.sma35, this.data.sma65];
 
     console.log('📊 Données du graphique:', {
-      prices: validPrices.slice(0, 5),
-      sma5: validSma5.slice(0, 5),
+      points: prices.length,
+      prices: prices.subarray(0, 5),
       labels: this.data.labels.slice(0, 5)
     });
 
-    if (validPrices.length === 0) {
+    const priceRange = this.seriesRange(prices);
+    if (!priceRange) {
       ctx.fillStyle = '#64748b';
       ctx.font = '16px Inter';
       ctx.textAlign = 'center';
@@ -237,11 +236,18 @@ export class PriceChartComponent implements OnChanges, AfterViewInit {
     }
 
     // Calculer les échelles avec zoom et pan
-    const allValues = [...validPrices, ...validSma5, ...validSma35, ...validSma65];
-    const minValue = Math.min(...allValues) * 0.98;
-    const maxValue = Math.max(...allValues) * 1.02;
+    let [minValue, maxValue] = priceRange;
+    for (const line of lines) {
+      const range = this.seriesRange(line);
+      if (range) {
+        minValue = Math.min(minValue, range[0]);
+        maxValue = Math.max(maxValue, range[1]);
+      }
+    }
+    minValue *= 0.98;
+    maxValue *= 1.02;
 
-    const dataLength = Math.max(this.data.labels.length, validPrices.length);
+    const dataLength = Math.max(this.data.labels.length, prices.length);
     const xScale = ((width - 2 * padding) * this.zoomLevel) / (dataLength - 1);
     const yScale = (height - 2 * padding) / (maxValue - minValue);
 
@@ -253,18 +259,12 @@ export class PriceChartComponent implements OnChanges, AfterViewInit {
     this.drawGrid(ctx, width, height, padding, minValue, maxValue, yScale);
 
     // Dessiner les lignes SMA avec les données valides
-    if (validSma65.length > 0) {
-      this.drawLine(ctx, this.data.sma65, getX, getY, '#10b981', 2);
-    }
-    if (validSma35.length > 0) {
-      this.drawLine(ctx, this.data.sma35, getX, getY, '#f59e0b', 2);
-    }
-    if (validSma5.length > 0) {
-      this.drawLine(ctx, this.data.sma5, getX, getY, '#3b82f6', 2);
-    }
+    this.drawLine(ctx, this.data.sma65, getX, getY, '#10b981', 2);
+    this.drawLine(ctx, this.data.sma35, getX, getY, '#f59e0b', 2);
+    this.drawLine(ctx, this.data.sma5, getX, getY, '#3b82f6', 2);
     
     // Dessiner la ligne des prix
-    this.drawLine(ctx, this.data.prices, getX, getY, '#1e293b', 3);
+    this.drawLine(ctx, prices, getX, getY, '#1e293b', 3);
 
     // Dessiner les axes
     this.drawAxes(ctx, width, height, padding, this.data.labels, minValue, maxValue);
@@ -273,6 +273,25 @@ export class PriceChartComponent implements OnChanges, AfterViewInit {
     this.drawZoomControls(ctx, width, height);
   }
 
+  // Minimum et maximum des valeurs finies non nulles, null si aucune
+  private seriesRange(values: Float64Array): [number, number] | null {
+    let min = Infinity;
+    let max = -Infinity;
+    for (let i = 0; i < values.length; i++) {
+      const value = values[i];
+      if (value !== 0 && Number.isFinite(value)) {
+        if (value < min) min = value;
+        if (value > max) max = value;
+      }
+    }
+    return min <= max ? [min, max] : null;
+  }
+
+  private valueAt(values: Float64Array, index: number): number | null {
+    const value = values[index];
+    return value !== undefined && Number.isFinite(value) ? value : null;
+  }
+
   private drawGrid(ctx: CanvasRenderingContext2D, width: number, height: number, padding: number, minValue: number, maxValue: number, yScale: number) {
     ctx.strokeStyle = '#f1f5f9';
     ctx.lineWidth = 1;
@@ -330,7 +349,7 @@ export class PriceChartComponent implements OnChanges, AfterViewInit {
 
   private drawLine(
     ctx: CanvasRenderingContext2D,
-    data: number[],
+    data: Float64Array,
     getX: (index: number) => number,
     getY: (value: number) => number,
     color: string,
@@ -343,9 +362,10 @@ export class PriceChartComponent implements OnChanges, AfterViewInit {
     ctx.beginPath();
 
     let firstPoint = true;
-    data.forEach((value, index) => {
-      // Accepter toutes les valeurs numériques valides (y compris 0)
-      if (value !== null && value !== undefined && !isNaN(value)) {
+    for (let index = 0; index < data.length; index++) {
+      const value = data[index];
+      // Accepter toutes les valeurs numériques valides (y compris 0), NaN marque un trou
+      if (!isNaN(value)) {
         const x = getX(index);
         const y = getY(value);
         
@@ -356,7 +376,7 @@ export class PriceChartComponent implements OnChanges, AfterViewInit {
           ctx.lineTo(x, y);
         }
       }
-    });
+    }
 
     ctx.stroke();
   }
@@ -441,10 +461,10 @@ export class PriceChartComponent implements OnChanges, AfterViewInit {
         visible: true,
         data: {
           label: this.data.labels[index],
-          price: this.data.prices[index],
-          sma5: this.data.sma5[index],
-          sma35: this.data.sma35[index],
-          sma65: this.data.sma65[index]
+          price: this.valueAt(this.data.prices, index),
+          sma5: this.valueAt(this.data.sma5, index),
+          sma35: this.valueAt(this.data.sma35, index),
+          sma65: this.valueAt(this.data.sma65, index)
         }
       };
       this.drawChart();
@@ -27,8 +27,44 @@ import { TradingResults } from '../../models/trading.model';
         </div>
         
         <div class="summary-item">
-          <div class="summary-label">Statistiques</div>
-          <div class="summary-value">{{ results.statistics }}</div>
+          <div class="summary-label">CAGR</div>
+          <div class="summary-value">{{ formatMetric(results.metrics.cagr, '%') }}</div>
+        </div>
+        
+        <div class="summary-item">
+          <div class="summary-label">Sharpe / Sortino</div>
+          <div class="summary-value">
+            {{ formatMetric(results.metrics.sharpe) }} / {{ formatMetric(results.metrics.sortino) }}
+          </div>
+        </div>
+        
+        <div class="summary-item">
+          <div class="summary-label">Drawdown max</div>
+          <div class="summary-value">
+            {{ formatMetric(results.metrics.maxDrawdown, '%') }} ({{ results.metrics.maxDrawdownDuration }} barres)
+          </div>
+        </div>
+        
+        <div class="summary-item">
+          <div class="summary-label">Taux de réussite</div>
+          <div class="summary-value">
+            {{ formatMetric(results.metrics.winRate, '%') }} ({{ results.metrics.roundTrips }} cycles)
+          </div>
+        </div>
+        
+        <div class="summary-item">
+          <div class="summary-label">Profit factor</div>
+          <div class="summary-value">{{ formatMetric(results.metrics.profitFactor) }}</div>
+        </div>
+        
+        <div class="summary-item">
+          <div class="summary-label">Exposition</div>
+          <div class="summary-value">{{ formatMetric(results.metrics.exposure, '%') }}</div>
+        </div>
+        
+        <div class="summary-item">
+          <div class="summary-label">Frais</div>
+          <div class="summary-value">{{ formatNumber(results.costs) }}</div>
         </div>
       </div>
 
@@ -158,6 +194,16 @@ export class ResultsSummaryComponent {
     }).format(value);
   }
 
+  formatMetric(value: number | null, unit = ''): string {
+    if (value === null) {
+      return '—';
+    }
+    return new Intl.NumberFormat('fr-FR', {
+      minimumFractionDigits: 0,
+      maximumFractionDigits: 2
+    }).format(value) + unit;
+  }
+
   onExport() {
     this.exportExcel.emit();
   }
@@ -280,11 +280,11 @@ export class DashboardComponent implements OnInit {
 
   onExportExcel() {
     this.tradingService.exportToExcel().subscribe({
-      next: (blob) => {
-        const url = window.URL.createObjectURL(blob);
+      next: (file) => {
+        const url = window.URL.createObjectURL(file.blob);
         const link = document.createElement('a');
         link.href = url;
-        link.download = 'transactions.csv';
+        link.download = file.filename;
         link.click();
         window.URL.revokeObjectURL(url);
       },
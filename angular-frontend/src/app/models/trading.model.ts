@@ -14,7 +14,22 @@ export interface TradingResults {
   finalCapital: number;
   numberOfTrades: number;
   gains: number;
-  statistics: number;
+  costs: number;  // commissions + glissement payés
+  metrics: PerformanceMetrics;
+}
+
+// Indicateurs de performance (analytics.py) ; pourcentages pour les
+// fractions, null quand un ratio n'est pas défini (aucune perte...)
+export interface PerformanceMetrics {
+  sharpe: number | null;
+  sortino: number | null;
+  maxDrawdown: number;
+  maxDrawdownDuration: number;  // barres sous le dernier plus haut
+  cagr: number | null;
+  exposure: number;
+  winRate: number | null;
+  profitFactor: number | null;
+  roundTrips: number;
 }
 
 export interface Transaction {
@@ -25,12 +40,23 @@ export interface Transaction {
   capital: number;
 }
 
+// Séries du graphique en tableaux typés (NaN pour les trous, tableau vide
+// pour une courbe que la stratégie ne déclare pas)
 export interface ChartData {
   labels: string[];
-  prices: number[];
-  sma5: number[];
-  sma35: number[];
-  sma65: number[];
+  prices: Float64Array;
+  sma5: Float64Array;
+  sma35: Float64Array;
+  sma65: Float64Array;
+}
+
+// Transactions en colonnes, telles qu'envoyées en MessagePack
+export interface TransactionColumns {
+  date: string[];
+  action: Transaction['action'][];
+  price: Float64Array;
+  quantity: Float64Array;
+  capital: Float64Array;
 }
 
 export interface AnalysisParams {
@@ -38,4 +64,21 @@ export interface AnalysisParams {
   startDate: string;
   endDate: string;
   strategy: string;
-}
\ No newline at end of file
+  maxPoints?: number;
+}
+
+export type JobState = 'pending' | 'running' | 'done' | 'error' | 'cancelled';
+
+export interface JobStatus {
+  jobId: string;
+  status: JobState;
+  error: string | null;
+  coalesced?: boolean;
+}
+
+export type ExportFormat = 'csv' | 'parquet' | 'xlsx';
+
+export interface ExportFile {
+  blob: Blob;
+  filename: string;
+}
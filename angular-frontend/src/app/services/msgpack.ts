@@ -0,0 +1,135 @@
+/**
+ * Décodeur MessagePack minimal pour les réponses binaires de l'API
+ * (Accept: application/x-msgpack, voir response_format.py).
+ *
+ * Les blocs float64 petit-boutistes (extension FLOAT64_EXT) sont rendus en
+ * Float64Array : vue directe sur le tampon reçu quand l'alignement le
+ * permet, copie du bloc sinon.
+ */
+
+export const MSGPACK_MIMETYPE = 'application/x-msgpack';
+export const FLOAT64_EXT = 1;
+
+export class MsgpackDecoder {
+  private readonly view: DataView;
+  private readonly bytes: Uint8Array;
+  private readonly text = new TextDecoder();
+  private offset = 0;
+
+  constructor(private readonly buffer: ArrayBuffer) {
+    this.view = new DataView(buffer);
+    this.bytes = new Uint8Array(buffer);
+  }
+
+  decode(): unknown {
+    const value = this.read();
+    if (this.offset !== this.bytes.length) {
+      throw new Error(`MessagePack: ${this.bytes.length - this.offset} octets inattendus en fin de réponse`);
+    }
+    return value;
+  }
+
+  private read(): unknown {
+    const type = this.bytes[this.offset++];
+
+    if (type <= 0x7f) return type;
+    if (type >= 0xe0) return type - 0x100;
+    if (type >= 0x80 && type <= 0x8f) return this.readMap(type & 0x0f);
+    if (type >= 0x90 && type <= 0x9f) return this.readArray(type & 0x0f);
+    if (type >= 0xa0 && type <= 0xbf) return this.readString(type & 0x1f);
+
+    switch (type) {
+      case 0xc0: return null;
+      case 0xc2: return false;
+      case 0xc3: return true;
+      case 0xc4: return this.readBytes(this.readUint(1));
+      case 0xc5: return this.readBytes(this.readUint(2));
+      case 0xc6: return this.readBytes(this.readUint(4));
+      case 0xc7: return this.readExt(this.readUint(1));
+      case 0xc8: return this.readExt(this.readUint(2));
+      case 0xc9: return this.readExt(this.readUint(4));
+      case 0xca: return this.advance(4, () => this.view.getFloat32(this.offset));
+      case 0xcb: return this.advance(8, () => this.view.getFloat64(this.offset));
+      case 0xcc: return this.readUint(1);
+      case 0xcd: return this.readUint(2);
+      case 0xce: return this.readUint(4);
+      case 0xcf: return this.advance(8, () => Number(this.view.getBigUint64(this.offset)));
+      case 0xd0: return this.advance(1, () => this.view.getInt8(this.offset));
+      case 0xd1: return this.advance(2, () => this.view.getInt16(this.offset));
+      case 0xd2: return this.advance(4, () => this.view.getInt32(this.offset));
+      case 0xd3: return this.advance(8, () => Number(this.view.getBigInt64(this.offset)));
+      case 0xd4: return this.readExt(1);
+      case 0xd5: return this.readExt(2);
+      case 0xd6: return this.readExt(4);
+      case 0xd7: return this.readExt(8);
+      case 0xd8: return this.readExt(16);
+      case 0xd9: return this.readString(this.readUint(1));
+      case 0xda: return this.readString(this.readUint(2));
+      case 0xdb: return this.readString(this.readUint(4));
+      case 0xdc: return this.readArray(this.readUint(2));
+      case 0xdd: return this.readArray(this.readUint(4));
+      case 0xde: return this.readMap(this.readUint(2));
+      case 0xdf: return this.readMap(this.readUint(4));
+      default:
+        throw new Error(`MessagePack: type 0x${type.toString(16)} non pris en charge`);
+    }
+  }
+
+  private advance<T>(size: number, read: () => T): T {
+    const value = read();
+    this.offset += size;
+    return value;
+  }
+
+  private readUint(size: 1 | 2 | 4): number {
+    if (size === 1) return this.advance(1, () => this.view.getUint8(this.offset));
+    if (size === 2) return this.advance(2, () => this.view.getUint16(this.offset));
+    return this.advance(4, () => this.view.getUint32(this.offset));
+  }
+
+  private readString(length: number): string {
+    const start = this.offset;
+    this.offset += length;
+    return this.text.decode(this.bytes.subarray(start, start + length));
+  }
+
+  private readBytes(length: number): Uint8Array {
+    const start = this.offset;
+    this.offset += length;
+    return this.bytes.subarray(start, start + length);
+  }
+
+  private readArray(length: number): unknown[] {
+    const values = new Array(length);
+    for (let i = 0; i < length; i++) {
+      values[i] = this.read();
+    }
+    return values;
+  }
+
+  private readMap(length: number): Record<string, unknown> {
+    const values: Record<string, unknown> = {};
+    for (let i = 0; i < length; i++) {
+      const key = String(this.read());
+      values[key] = this.read();
+    }
+    return values;
+  }
+
+  private readExt(length: number): unknown {
+    const code = this.advance(1, () => this.view.getInt8(this.offset));
+    const start = this.offset;
+    this.offset += length;
+    if (code !== FLOAT64_EXT) {
+      return this.bytes.subarray(start, start + length);
+    }
+    // Float64Array exige un décalage multiple de 8 (plateforme petit-boutiste supposée)
+    return start % 8 === 0
+      ? new Float64Array(this.buffer, start, length / 8)
+      : new Float64Array(this.buffer.slice(start, start + length));
+  }
+}
+
+export function decodeMsgpack(buffer: ArrayBuffer): unknown {
+  return new MsgpackDecoder(buffer).decode();
+}
@@ -1,8 +1,42 @@
 import { Injectable } from '@angular/core';
-import { HttpClient, HttpErrorResponse } from '@angular/common/http';
-import { Observable, throwError, of } from 'rxjs';
-import { catchError, map } from 'rxjs/operators';
-import { TradingData, AnalysisParams } from '../models/trading.model';
+import { HttpClient, HttpErrorResponse, HttpResponse } from '@angular/common/http';
+import { Observable, from, throwError, of, timer } from 'rxjs';
+import { catchError, filter, map, switchMap, take } from 'rxjs/operators';
+import {
+  TradingData, AnalysisParams, ChartData, ExportFile, ExportFormat, JobStatus, Transaction, TransactionColumns
+} from '../models/trading.model';
+import { MSGPACK_MIMETYPE, decodeMsgpack } from './msgpack';
+
+type ChartSeries = Float64Array | (number | null)[];
+
+// Résultat tel que reçu : séries en listes JSON ou en tableaux typés,
+// transactions en lignes (JSON) ou en colonnes (MessagePack)
+interface WireTradingData extends Omit<TradingData, 'chartData' | 'transactions'> {
+  chartData: { labels: string[] } & Partial<Record<Exclude<keyof ChartData, 'labels'>, ChartSeries>>;
+  transactions: Transaction[] | TransactionColumns;
+}
+
+function parseErrorBody(text: string): { error?: string } | null {
+  try {
+    return JSON.parse(text);
+  } catch {
+    return null;
+  }
+}
+
+function errorMessage(error: HttpErrorResponse, body: { error?: string } | null): string {
+  if (error.error instanceof ErrorEvent) {
+    // Erreur côté client
+    return `Erreur: ${error.error.message}`;
+  }
+  if (error.status === 0) {
+    return 'Impossible de se connecter à l\'API. Vérifiez que le serveur Flask est démarré sur le port 5000.';
+  }
+  if (body?.error) {
+    return body.error;
+  }
+  return `Erreur ${error.status}: ${error.message}`;
+}
 
 @Injectable({
   providedIn: 'root'
@@ -10,6 +44,9 @@ import { TradingData, AnalysisParams } from '../models/trading.model';
 export class TradingService {
   private apiUrl = 'http://localhost:5000/api';
   private currentData: TradingData | null = null;
+  private currentJobId: string | null = null;
+  private pollIntervalMs = 1000;
+  private defaultChartPoints = 300;
 
   constructor(private http: HttpClient) {}
 
@@ -18,13 +55,19 @@ export class TradingService {
       symbol: params.symbol,
       startDate: params.startDate,
       endDate: params.endDate,
-      strategy: params.strategy
+      strategy: params.strategy,
+      maxPoints: params.maxPoints ?? this.defaultChartPoints
     };
 
     console.log('📤 Envoi vers API:', payload);
     
-    return this.http.post<TradingData>(`${this.apiUrl}/analyze`, payload)
+    // Analyse asynchrone : soumission de la tâche puis attente du résultat
+    return this.http.post<JobStatus>(`${this.apiUrl}/jobs`, payload)
       .pipe(
+        switchMap(job => {
+          this.currentJobId = job.jobId;
+          return this.waitForJob(job.jobId);
+        }),
         map(data => {
           console.log('📥 Réponse API reçue:', data);
           this.currentData = data;
@@ -34,23 +77,101 @@ export class TradingService {
       );
   }
 
-  exportToExcel(): Observable<Blob> {
+  cancelAnalysis(jobId: string): Observable<JobStatus> {
+    return this.http.delete<JobStatus>(`${this.apiUrl}/jobs/${jobId}`)
+      .pipe(catchError(this.handleError));
+  }
+
+  private waitForJob(jobId: string): Observable<TradingData> {
+    return timer(0, this.pollIntervalMs).pipe(
+      switchMap(() => this.http.get<JobStatus>(`${this.apiUrl}/jobs/${jobId}`)),
+      filter(job => job.status !== 'pending' && job.status !== 'running'),
+      take(1),
+      switchMap(job => {
+        if (job.status === 'done') {
+          // MessagePack en colonnes typées si le serveur le propose, JSON sinon
+          return this.http.get(`${this.apiUrl}/jobs/${jobId}/result`, {
+            headers: { Accept: `${MSGPACK_MIMETYPE}, application/json;q=0.9` },
+            observe: 'response',
+            responseType: 'arraybuffer'
+          }).pipe(map(response => this.decodeResult(response)));
+        }
+        const message = job.status === 'cancelled' ? 'Analyse annulée' : `Erreur lors de l'analyse: ${job.error}`;
+        return throwError(() => new HttpErrorResponse({ error: { error: message }, status: 500 }));
+      })
+    );
+  }
+
+  private decodeResult(response: HttpResponse<ArrayBuffer>): TradingData {
+    const body = response.body ?? new ArrayBuffer(0);
+    const contentType = response.headers.get('Content-Type') ?? '';
+    const raw = (contentType.startsWith(MSGPACK_MIMETYPE)
+      ? decodeMsgpack(body)
+      : JSON.parse(new TextDecoder().decode(body))) as WireTradingData;
+
+    return {
+      ...raw,
+      transactions: Array.isArray(raw.transactions) ? raw.transactions : this.transactionRows(raw.transactions),
+      chartData: {
+        labels: raw.chartData.labels,
+        prices: this.toSeries(raw.chartData.prices),
+        sma5: this.toSeries(raw.chartData.sma5),
+        sma35: this.toSeries(raw.chartData.sma35),
+        sma65: this.toSeries(raw.chartData.sma65)
+      }
+    };
+  }
+
+  private toSeries(values: ChartSeries | undefined): Float64Array {
+    if (values instanceof Float64Array) {
+      return values;
+    }
+    return Float64Array.from(values ?? [], value => value ?? NaN);
+  }
+
+  private transactionRows(columns: TransactionColumns): Transaction[] {
+    return columns.date.map((date, i) => ({
+      date,
+      action: columns.action[i],
+      price: columns.price[i],
+      quantity: columns.quantity[i],
+      capital: columns.capital[i]
+    }));
+  }
+
+  exportToExcel(format: ExportFormat = 'csv'): Observable<ExportFile> {
     if (!this.currentData) {
       return throwError(() => new Error('Aucune donnée à exporter'));
     }
 
-    const payload = {
-      transactions: this.currentData.transactions
-    };
+    // Export côté serveur à partir du résultat de l'analyse ; les données
+    // simulées n'ont pas de tâche et envoient leurs transactions, comme une
+    // tâche expirée ou inconnue du worker qui reçoit la requête (404)
+    const withTransactions = { transactions: this.currentData.transactions, format };
+    const post = (payload: object) =>
+      this.http.post(`${this.apiUrl}/export`, payload, { observe: 'response', responseType: 'blob' });
 
-    return this.http.post<{content: string, filename: string}>(`${this.apiUrl}/export`, payload)
-      .pipe(
-        map(response => {
-          const blob = new Blob([response.content], { type: 'text/csv;charset=utf-8' });
-          return blob;
-        }),
-        catchError(this.handleError)
-      );
+    const request = this.currentJobId
+      ? post({ jobId: this.currentJobId, format }).pipe(
+          catchError((error: HttpErrorResponse) =>
+            error.status === 404 ? post(withTransactions) : throwError(() => error))
+        )
+      : post(withTransactions);
+
+    return request.pipe(
+      map(response => ({
+        blob: response.body ?? new Blob(),
+        filename: this.attachmentName(response) ?? `transactions.${format}`
+      })),
+      catchError(this.handleError)
+    );
+  }
+
+  // Nom du fichier annoncé par le serveur (Content-Disposition), null s'il n'est pas lisible
+  private attachmentName(response: HttpResponse<Blob>): string | null {
+    const disposition = response.headers.get('Content-Disposition') ?? '';
+    const match = /filename="?([^";]+)"?/.exec(disposition);
+    return match ? match[1] : null;
   }
 
   checkApiHealth(): Observable<{status: string, message: string}> {
@@ -58,25 +179,19 @@ export class TradingService {
       .pipe(catchError(this.handleError));
   }
 
-  private handleError(error: HttpErrorResponse) {
-    let errorMessage = 'Une erreur est survenue';
-    
-    if (error.error instanceof ErrorEvent) {
-      // Erreur côté client
-      errorMessage = `Erreur: ${error.error.message}`;
-    } else {
-      // Erreur côté serveur
-      if (error.status === 0) {
-        errorMessage = 'Impossible de se connecter à l\'API. Vérifiez que le serveur Flask est démarré sur le port 5000.';
-      } else if (error.error?.error) {
-        errorMessage = error.error.error;
-      } else {
-        errorMessage = `Erreur ${error.status}: ${error.message}`;
-      }
-    }
-    
+  private handleError(error: HttpErrorResponse): Observable<never> {
     console.error('Erreur API:', error);
-    return throwError(() => new Error(errorMessage));
+    // Corps d'erreur d'une requête en blob (export) : le message JSON du serveur est relu
+    if (error.error instanceof Blob) {
+      return from(error.error.text()).pipe(
+        switchMap(text => throwError(() => new Error(errorMessage(error, parseErrorBody(text)))))
+      );
+    }
+    // Corps binaire pour les requêtes en arraybuffer
+    const body = error.error instanceof ArrayBuffer
+      ? parseErrorBody(new TextDecoder().decode(error.error))
+      : error.error;
+    return throwError(() => new Error(errorMessage(error, body)));
   }
 
   // Méthode de fallback avec données simulées
@@ -94,7 +209,18 @@ export class TradingService {
         finalCapital: 767283,
         numberOfTrades: 16,
         gains: 14.4,
-        statistics: 2.1
+        costs: 1240.5,
+        metrics: {
+          sharpe: 0.82,
+          sortino: 1.17,
+          maxDrawdown: 12.6,
+          maxDrawdownDuration: 94,
+          cagr: 7.0,
+          exposure: 61.3,
+          winRate: 56.3,
+          profitFactor: 1.48,
+          roundTrips: 8
+        }
       },
       transactions: [
         {
@@ -121,14 +247,15 @@ export class TradingService {
       ],
       chartData: {
         labels: ['Jan 2021', 'Avr 2021', 'Jul 2021', 'Oct 2021', 'Jan 2022', 'Avr 2022', 'Jul 2022', 'Oct 2022'],
-        prices: [60, 70, 85, 95, 110, 120, 140, 150],
-        sma5: [62, 72, 87, 97, 112, 122, 142, 148],
-        sma35: params.strategy === 'FRA' ? [65, 75, 88, 98, 115, 125, 138, 145] : [],
-        sma65: params.strategy === 'FRA' ? [68, 78, 90, 100, 118, 128, 135, 142] : []
+        prices: Float64Array.of(60, 70, 85, 95, 110, 120, 140, 150),
+        sma5: Float64Array.of(62, 72, 87, 97, 112, 122, 142, 148),
+        sma35: params.strategy === 'FRA' ? Float64Array.of(65, 75, 88, 98, 115, 125, 138, 145) : new Float64Array(0),
+        sma65: params.strategy === 'FRA' ? Float64Array.of(68, 78, 90, 100, 118, 128, 135, 142) : new Float64Array(0)
       }
     };
 
     this.currentData = mockData;
+    this.currentJobId = null;
     return of(mockData);
   }
 }
\ No newline at end of file
@@ -3,142 +3,131 @@
 API Flask simple qui utilise directement les fonctions de FRA.py et USA.py
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
+import numpy as np
 import pandas as pd
+import json
 from datetime import datetime
 import sys
 import os
+import time
+import atexit
+import threading
 
 # Importer les fonctions de nos scripts
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from FRA import analyze_fra_strategy
-from USA import analyze_usa_strategy
+from strategies import CHART_SLOTS, available_strategies, get_strategy, run_strategy
+from optimizer import run_sweep
+from walkforward import run_walk_forward
+from intraday import INTERVALS, run_intraday
+from montecarlo import METHODS, run_monte_carlo
+from batch import resolve_universe, run_batch
+from portfolio import DEFAULT_CAPITAL, run_portfolio, summarize_portfolio
+from jobs import CANCELLED, DONE, ERROR, JobManager, JobQueueFull
+from process_pool import shutdown_process_pool
+from price_store import add_update_listener, get_price_store
+from segments import mapped_stats
+from result_cache import ResultCache, make_key
+from downsample import downsample_indices
+from export import EXPORT_FORMATS, check_format, iter_export
+from ledger import TradeLedger
+from analytics import format_metrics
+from response_format import MSGPACK_MIMETYPE, available_mimetypes, compress, encode_msgpack, negotiate
+from metrics import REGISTRY, REQUEST_SECONDS, Gauge, available_profilers, profile_call, stage_timer
 
 app = Flask(__name__)
-CORS(app)
+# Content-Disposition exposé : le frontend y lit le nom du fichier exporté
+CORS(app, expose_headers=['Content-Disposition'])
 
-def format_results_for_frontend(raw_results, symbol, start_date, end_date, strategy):
-    """Formate les résultats pour le frontend Angular"""
+# Nombre de points du graphique si le client n'en demande pas
+DEFAULT_CHART_POINTS = 20
+MAX_CHART_POINTS = 5000
+
+# Version du format des résultats formatés : à incrémenter quand leurs champs
+# changent (invalide les résultats mis en cache)
+RESULT_FORMAT_VERSION = 2
+
+# Nombre maximal de trajectoires d'une requête Monte Carlo (chacune est un
+# backtest événementiel complet, voir montecarlo.py)
+MAX_MONTE_CARLO_PATHS = 10000
+
+# Cache des résultats formatés, invalidé quand de nouvelles barres arrivent
+result_cache = ResultCache(
+    max_entries=int(os.environ.get('PYTRADER_RESULT_CACHE_SIZE', 256)),
+    disk_dir=os.environ.get('PYTRADER_RESULT_CACHE_DIR')
+)
+add_update_listener(result_cache.invalidate_symbol)
+
+# Profilage à la demande (champ "profile" de /api/analyze), désactivé par défaut :
+# chaque requête profilée contourne le cache et écrit un rapport sur le serveur
+PROFILING_ENABLED = os.environ.get('PYTRADER_PROFILING', '0') == '1'
+
+@app.before_request
+def _start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def _record_request(response):
+    start = g.get('request_start')
+    if start is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - start,
+                                endpoint=request.endpoint or 'unknown', status=response.status_code)
+    return response
+
+def _as_series(values, length):
+    """Convertit une série du graphique en tableau float64 de longueur length (NaN pour les trous)"""
+    array = np.asarray(pd.array(values, dtype='Float64').to_numpy(dtype=np.float64, na_value=np.nan))
+    if len(array) < length:
+        array = np.concatenate([array, np.full(length - len(array), np.nan)])
+    return array[:length]
+
+def _chart_values(array, indices):
+    """Valeurs échantillonnées, None pour les valeurs manquantes ou non positives"""
+    sampled = array[indices]
+    return np.where(np.isfinite(sampled) & (sampled > 0), sampled, None).tolist()
+
+def _format_labels(dates, indices):
+    """Libellés courts (mm/aa) des dates échantillonnées, l'indice si la date est illisible"""
+    if len(indices) == 0:
+        return []
+    sampled = pd.to_datetime(pd.Series(np.asarray(dates, dtype=object)[indices]), errors='coerce')
+    labels = sampled.dt.strftime('%m/%y')
+    fallback = pd.Series(indices, index=labels.index).astype(str)
+    return labels.where(sampled.notna(), fallback).tolist()
+
+def format_results_for_frontend(raw_results, symbol, start_date, end_date, strategy, max_points=DEFAULT_CHART_POINTS):
+    """Formate les résultats pour le frontend Angular (graphique réduit à max_points points)"""
     
-    transactions = []
-    for tx in raw_results.get('transactions', []):
-        if pd.notna(tx.get('Date')) and tx.get('Ordre'):
-            # Convertir la date en string si c'est un Timestamp
-            date_str = str(tx['Date'])[:10] if pd.notna(tx.get('Date')) else ''
-            
-            transactions.append({
-                'date': date_str,
-                'action': 'Achat' if tx['Ordre'] == 'Achat' else 'Vente',
-                'price': float(tx.get('Prix', 0)),
-                'quantity': int(tx.get('Quantite', 0)),
-                'capital': int(tx.get('Solde restant', 0))
-            })
+    # Journal en colonnes : conversion directe au format du frontend
+    ledger = raw_results.get('ledger')
+    transactions = ledger.to_records() if ledger is not None else []
     
     # Calculer les gains
-    initial_capital = raw_results.get('initial_capital', 671283 if strategy == 'FRA' else 500000)
+    initial_capital = raw_results.get('initial_capital') or get_strategy(strategy).capital
     final_capital = raw_results.get('final_capital', initial_capital)
     gains = ((final_capital - initial_capital) / initial_capital) * 100
+    costs = raw_results.get('costs', {})
     
     # Préparer les données du graphique
     chart_data = raw_results.get('chart_data', {})
     dates = chart_data.get('dates', [])
     
-    # Échantillonner les données pour le graphique (max 20 points pour éviter les chevauchements)
-    max_points = 20
-    if len(dates) > max_points:
-        step = len(dates) // max_points
-        sampled_indices = list(range(0, len(dates), step))[:max_points]
-        # S'assurer d'inclure le dernier point
-        if sampled_indices[-1] != len(dates) - 1:
-            sampled_indices.append(len(dates) - 1)
-    else:
-        sampled_indices = list(range(len(dates)))
-    
-    # Formater les dates pour l'affichage (format court pour éviter les chevauchements)
-    formatted_labels = []
-    for i in sampled_indices:
-        if i < len(dates):
-            date_obj = dates[i]
-            try:
-                if hasattr(date_obj, 'strftime'):
-                    formatted_labels.append(date_obj.strftime('%m/%y'))
-                elif isinstance(date_obj, str):
-                    parsed_date = pd.to_datetime(date_obj)
-                    formatted_labels.append(parsed_date.strftime('%m/%y'))
-                elif hasattr(date_obj, 'date'):
-                    formatted_labels.append(date_obj.date().strftime('%m/%y'))
-                else:
-                    # Fallback pour les timestamps pandas
-                    date_str = str(date_obj)[:10]  # YYYY-MM-DD
-                    try:
-                        parsed = pd.to_datetime(date_str)
-                        formatted_labels.append(parsed.strftime('%m/%y'))
-                    except:
-                        formatted_labels.append(f"{i}")
-            except Exception as e:
-                print(f"Erreur formatage date {date_obj}: {e}")
-                formatted_labels.append(f"{i}")
-    
-    # Échantillonner les données avec gestion des erreurs
-    prices = chart_data.get('prices', [])
-    sma5 = chart_data.get('sma5', [])
-    sma35 = chart_data.get('sma35', [])
-    sma65 = chart_data.get('sma65', [])
-    
-    def safe_get_value(data_list, index):
-        """Récupère une valeur de manière sécurisée"""
-        try:
-            if index < len(data_list):
-                value = data_list[index]
-                return float(value) if pd.notna(value) and value is not None else None
-        except (ValueError, TypeError):
-            pass
-        return None
-    
-    # Construire les données du graphique de manière sécurisée
-    chart_prices = []
-    chart_sma5 = []
-    chart_sma35 = []
-    chart_sma65 = []
+    # Échantillonnage LTTB sur le prix : garde les pics et les creux dans le budget de points
+    prices = _as_series(chart_data.get('prices', []), len(dates))
+    sampled_indices = downsample_indices(prices, max_points) if len(dates) > max_points else np.arange(len(dates))
     
-    # S'assurer que les données correspondent aux labels
-    for i in sampled_indices:
-        # Prix - inclure seulement les valeurs valides
-        price_val = safe_get_value(prices, i)
-        if price_val is not None and price_val > 0:
-            chart_prices.append(price_val)
-        else:
-            chart_prices.append(None)
-        
-        # SMA5 - inclure seulement les valeurs valides
-        sma5_val = safe_get_value(sma5, i)
-        if sma5_val is not None and sma5_val > 0:
-            chart_sma5.append(sma5_val)
-        else:
-            chart_sma5.append(None)
-        
-        # SMA35 et SMA65 seulement pour FRA
-        if strategy == 'FRA':
-            sma35_val = safe_get_value(sma35, i)
-            if sma35_val is not None and sma35_val > 0:
-                chart_sma35.append(sma35_val)
-            else:
-                chart_sma35.append(None)
-            
-            sma65_val = safe_get_value(sma65, i)
-            if sma65_val is not None and sma65_val > 0:
-                chart_sma65.append(sma65_val)
-            else:
-                chart_sma65.append(None)
+    formatted_labels = _format_labels(dates, sampled_indices)
     
+    # Courbes déclarées par la stratégie (spec.chart), vides sinon
     formatted_chart = {
         'labels': formatted_labels,
-        'prices': chart_prices,
-        'sma5': chart_sma5,
-        'sma35': chart_sma35,
-        'sma65': chart_sma65
+        'prices': _chart_values(prices, sampled_indices)
     }
+    for slot in CHART_SLOTS:
+        formatted_chart[slot] = (_chart_values(_as_series(chart_data[slot], len(dates)), sampled_indices)
+                                 if slot in chart_data else [])
     
     return {
         'symbol': symbol,
@@ -151,12 +140,141 @@ def format_results_for_frontend(raw_results, symbol, start_date, end_date, strat
             'finalCapital': int(final_capital),
             'numberOfTrades': len(transactions),
             'gains': round(gains, 1),
-            'statistics': round(len(transactions) / max(1, len(dates)) * 100, 1)
+            'costs': round(costs.get('commission', 0.0) + costs.get('slippage', 0.0), 2),
+            'metrics': format_metrics(raw_results['performance'])
         },
         'transactions': transactions,
         'chartData': formatted_chart
     }
 
+def run_analysis(symbol, start_date, end_date, strategy, max_points=DEFAULT_CHART_POINTS, use_cache=True):
+    """Exécute la stratégie demandée et retourne les résultats formatés pour le frontend"""
+    spec = get_strategy(strategy)
+    
+    # Période encore ouverte : on complète d'abord le cache de cours, ce qui
+    # invalide les résultats si de nouvelles barres sont arrivées
+    if pd.Timestamp(end_date) > pd.Timestamp.today().normalize():
+        get_price_store().load(symbol, start_date, end_date)
+    
+    key = make_key(symbol, start_date, end_date, strategy, spec.version, RESULT_FORMAT_VERSION, max_points)
+    cached = result_cache.get(key) if use_cache else None
+    if cached is not None:
+        print(f"⚡ Résultat servi depuis le cache: {key}")
+        return cached
+    
+    # Stratégie enregistrée (FRA, USA ou spécification JSON de PYTRADER_STRATEGY_DIR)
+    print(f"{spec.label} Exécution stratégie {strategy}...")
+    raw_results = run_strategy(spec, symbol, start_date, end_date)
+    
+    print(f"✅ Analyse terminée. Transactions: {len(raw_results['ledger'])}")
+    
+    # Formater pour le frontend
+    with stage_timer(strategy, 'formatting'):
+        formatted_results = format_results_for_frontend(
+            raw_results, symbol, start_date, end_date, strategy, max_points=max_points
+        )
+    result_cache.put(key, formatted_results)
+    return formatted_results
+
+def parse_analysis_request(data):
+    """
+    Valide le corps JSON d'une demande d'analyse
+
+    Returns:
+        tuple: (paramètres de run_analysis, None) ou (None, message d'erreur)
+    """
+    if not data:
+        return None, 'Aucune donnée JSON reçue'
+    
+    # Validation
+    required_fields = ['symbol', 'startDate', 'endDate', 'strategy']
+    for field in required_fields:
+        if field not in data:
+            print(f"❌ Champ manquant: {field}")
+            return None, f'Champ manquant: {field}'
+    
+    if data['strategy'] not in available_strategies():
+        print(f"❌ Stratégie inconnue: {data['strategy']}")
+        return None, f'Stratégie inconnue: {data["strategy"]}'
+    
+    try:
+        max_points = int(data.get('maxPoints', DEFAULT_CHART_POINTS))
+    except (TypeError, ValueError):
+        return None, 'maxPoints doit être un entier'
+    if not 2 <= max_points <= MAX_CHART_POINTS:
+        return None, f'maxPoints doit être compris entre 2 et {MAX_CHART_POINTS}'
+    
+    return {
+        'symbol': data['symbol'],
+        'start_date': data['startDate'],
+        'end_date': data['endDate'],
+        'strategy': data['strategy'],
+        'max_points': max_points
+    }, None
+
+# Analyses asynchrones : pool de threads borné, demandes identiques regroupées
+job_manager = JobManager(
+    run_analysis,
+    max_workers=int(os.environ.get('PYTRADER_JOB_WORKERS', 4)),
+    max_pending=int(os.environ.get('PYTRADER_JOB_QUEUE', 32))
+)
+
+REGISTRY.register(Gauge('pytrader_result_cache_entries', 'Entrées du cache de résultats',
+                        lambda: result_cache.stats()['entries']))
+REGISTRY.register(Gauge('pytrader_result_cache_hit_ratio', 'Taux de succès du cache de résultats',
+                        lambda: result_cache.stats()['hitRate']))
+REGISTRY.register(Gauge('pytrader_jobs_inflight', 'Analyses asynchrones en attente ou en cours',
+                        lambda: job_manager.stats()['inflight']))
+
+_shutdown_lock = threading.Lock()
+_shutdown_done = False
+
+def shutdown_services(wait=True):
+    """
+    Arrêt propre du processus : termine les analyses en cours (celles en
+    attente sont annulées), arrête le pool de processus et vide le cache de
+    résultats en mémoire (le niveau disque est déjà à jour). Idempotent :
+    appelé par le hook worker_exit de gunicorn et à la sortie de l'interpréteur.
+    """
+    global _shutdown_done
+    with _shutdown_lock:
+        if _shutdown_done:
+            return
+        _shutdown_done = True
+    print(f"🛑 Arrêt du serveur (pid {os.getpid()}): cache {result_cache.stats()}")
+    job_manager.shutdown(wait=wait)
+    shutdown_process_pool(wait=wait)
+    result_cache.clear()
+
+atexit.register(shutdown_services)
+
+def negotiated_response(formatted_results, strategy):
+    """
+    Réponse au format demandé par l'en-tête Accept (JSON par défaut,
+    MessagePack en colonnes typées), compressée si le client accepte gzip
+    """
+    mimetype = negotiate(request.accept_mimetypes)
+    if mimetype == MSGPACK_MIMETYPE:
+        with stage_timer(strategy, 'msgpack_encoding'):
+            response = Response(encode_msgpack(formatted_results), mimetype=MSGPACK_MIMETYPE)
+    else:
+        with stage_timer(strategy, 'json_encoding'):
+            response = jsonify(formatted_results)
+    with stage_timer(strategy, 'compression'):
+        body, encoding = compress(response.get_data(), request.accept_encodings)
+    if encoding:
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+    response.vary.update(('Accept', 'Accept-Encoding'))
+    return response
+
+def parse_profile_option(data):
+    """Profileur demandé ('profile': true ou nom du profileur, ou ?profile=), None sinon"""
+    value = request.args.get('profile') or (data or {}).get('profile')
+    if not value or value in ('0', 'false'):
+        return None
+    return 'cprofile' if value in (True, '1', 'true') else str(value)
+
 @app.route('/api/analyze', methods=['POST'])
 def analyze_stock():
     """Endpoint pour analyser une action"""
@@ -165,75 +283,509 @@ def analyze_stock():
         data = request.get_json()
         print(f"📥 Données reçues: {data}")
         
+        params, error = parse_analysis_request(data)
+        if error:
+            return jsonify({'error': error}), 400
+        
+        print(f"🔍 Analyse demandée:")
+        print(f"   Symbol: {params['symbol']}")
+        print(f"   Dates: {params['start_date']} -> {params['end_date']}")
+        print(f"   Stratégie: {params['strategy']}")
+        
+        profiler = parse_profile_option(data)
+        if profiler and not PROFILING_ENABLED:
+            return jsonify({'error': 'Profilage désactivé sur ce serveur'}), 403
+        if profiler and profiler not in available_profilers():
+            return jsonify({'error': f'Profileur indisponible: {profiler}'}), 400
+        
+        if profiler:
+            # Le cache est contourné : on veut le profil du calcul complet
+            formatted_results, profile = profile_call(run_analysis, engine=profiler, use_cache=False, **params)
+            # Le chemin du rapport reste côté serveur : le client ne reçoit que le résumé
+            formatted_results = dict(formatted_results, profile={'engine': profile['engine'],
+                                                                 'summary': profile['summary']})
+            print(f"🔬 Profil enregistré: {profile['path']}")
+        else:
+            formatted_results = run_analysis(**params)
+        
+        print(f"📤 Envoi des résultats formatés")
+        return negotiated_response(formatted_results, params['strategy'])
+        
+    except Exception as e:
+        print(f"❌ Erreur dans analyze_stock: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': f'Erreur lors de l\'analyse: {str(e)}'}), 500
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Endpoint pour soumettre une analyse asynchrone"""
+    data = request.get_json()
+    params, error = parse_analysis_request(data)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    key = (params['symbol'], params['start_date'], params['end_date'], params['strategy'], params['max_points'])
+    try:
+        job, coalesced = job_manager.submit(key, params)
+    except JobQueueFull as e:
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = '5'
+        return response, 429
+    
+    print(f"🧾 Tâche {'regroupée' if coalesced else 'créée'}: {job.id} {key}")
+    body = job.to_dict()
+    body['coalesced'] = coalesced
+    return jsonify(body), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Endpoint pour consulter l'état d'une analyse asynchrone"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Tâche inconnue: {job_id}'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """Endpoint pour récupérer le résultat d'une analyse asynchrone"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Tâche inconnue: {job_id}'}), 404
+    if job.status == DONE:
+        return negotiated_response(job.result, job.result['strategy'])
+    if job.status == ERROR:
+        return jsonify({'error': f'Erreur lors de l\'analyse: {job.error}'}), 500
+    if job.status == CANCELLED:
+        return jsonify({'error': 'Tâche annulée'}), 409
+    return jsonify(job.to_dict()), 202
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Endpoint pour annuler une analyse pas encore démarrée"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Tâche inconnue: {job_id}'}), 404
+    if not job_manager.cancel(job_id):
+        return jsonify({'error': 'Tâche déjà démarrée ou terminée', 'status': job.status}), 409
+    return jsonify(job.to_dict())
+
+@app.route('/api/optimize', methods=['POST'])
+def optimize_strategy():
+    """Endpoint pour optimiser les paramètres d'une stratégie (balayage de grille)"""
+    try:
+        data = request.get_json()
+
         if not data:
             return jsonify({'error': 'Aucune donnée JSON reçue'}), 400
-        
-        # Validation
+
         required_fields = ['symbol', 'startDate', 'endDate', 'strategy']
         for field in required_fields:
             if field not in data:
-                print(f"❌ Champ manquant: {field}")
                 return jsonify({'error': f'Champ manquant: {field}'}), 400
-        
+
         symbol = data['symbol']
         start_date = data['startDate']
         end_date = data['endDate']
         strategy = data['strategy']
-        
-        print(f"🔍 Analyse demandée:")
-        print(f"   Symbol: {symbol}")
-        print(f"   Dates: {start_date} -> {end_date}")
-        print(f"   Stratégie: {strategy}")
-        
-        # Appeler la fonction appropriée
-        if strategy == 'FRA':
-            print("🇫🇷 Exécution stratégie FRA...")
-            raw_results = analyze_fra_strategy(symbol, start_date, end_date, show_plot=False)
-        elif strategy == 'USA':
-            print("🇺🇸 Exécution stratégie USA...")
-            raw_results = analyze_usa_strategy(symbol, start_date, end_date, show_plot=False)
-        else:
-            print(f"❌ Stratégie inconnue: {strategy}")
+        top = int(data.get('top', 20))
+
+        if strategy not in available_strategies():
             return jsonify({'error': f'Stratégie inconnue: {strategy}'}), 400
-        
-        print(f"✅ Analyse terminée. Transactions: {len(raw_results.get('transactions', []))}")
-        
-        # Formater pour le frontend
-        formatted_results = format_results_for_frontend(
-            raw_results, symbol, start_date, end_date, strategy
-        )
-        
-        print(f"📤 Envoi des résultats formatés")
-        return jsonify(formatted_results)
-        
+
+        print(f"🔧 Optimisation demandée: {symbol} {start_date} -> {end_date} ({strategy})")
+        try:
+            ranking = run_sweep(symbol, start_date, end_date, strategy, grid=data.get('grid'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        ranking = ranking.rename(columns={
+            'final_capital': 'finalCapital',
+            'final_equity': 'finalEquity',
+            'number_of_trades': 'numberOfTrades',
+            'max_drawdown': 'maxDrawdown',
+            'max_drawdown_duration': 'maxDrawdownDuration',
+            'win_rate': 'winRate',
+            'profit_factor': 'profitFactor',
+            'round_trips': 'roundTrips'
+        })
+        print(f"✅ Optimisation terminée: {len(ranking)} combinaisons")
+        # Ratios non définis (aucune perte, aucune variation) : null plutôt que NaN
+        best = ranking.head(top).astype(object)
+        best = best.where(best.notna(), None)
+
+        return jsonify({
+            'symbol': symbol,
+            'period': {
+                'start': start_date,
+                'end': end_date
+            },
+            'strategy': strategy,
+            'combinations': len(ranking),
+            'results': best.to_dict('records')
+        })
+
     except Exception as e:
-        print(f"❌ Erreur dans analyze_stock: {str(e)}")
+        print(f"❌ Erreur dans optimize_strategy: {str(e)}")
         import traceback
         traceback.print_exc()
-        return jsonify({'error': f'Erreur lors de l\'analyse: {str(e)}'}), 500
+        return jsonify({'error': f'Erreur lors de l\'optimisation: {str(e)}'}), 500
 
-@app.route('/api/export', methods=['POST'])
-def export_transactions():
-    """Endpoint pour exporter les transactions"""
+@app.route('/api/walkforward', methods=['POST'])
+def walk_forward():
+    """Endpoint pour un backtest walk-forward (optimisation in-sample, validation out-of-sample)"""
     try:
         data = request.get_json()
-        transactions = data.get('transactions', [])
-        
-        if not transactions:
-            return jsonify({'error': 'Aucune transaction à exporter'}), 400
-        
-        # Générer le CSV
-        csv_content = "Date,Action,Prix,Quantité,Capital\n"
-        for tx in transactions:
-            csv_content += f"{tx['date']},{tx['action']},{tx['price']},{tx['quantity']},{tx['capital']}\n"
-        
+
+        if not data:
+            return jsonify({'error': 'Aucune donnée JSON reçue'}), 400
+
+        for field in ['symbol', 'startDate', 'endDate', 'strategy']:
+            if field not in data:
+                return jsonify({'error': f'Champ manquant: {field}'}), 400
+
+        symbol = data['symbol']
+        start_date = data['startDate']
+        end_date = data['endDate']
+        strategy = data['strategy']
+
+        if strategy not in available_strategies():
+            return jsonify({'error': f'Stratégie inconnue: {strategy}'}), 400
+
+        try:
+            n_folds = int(data.get('folds', 5))
+            in_sample_ratio = float(data.get('inSampleRatio', 0.75))
+            max_points = int(data.get('maxPoints', DEFAULT_CHART_POINTS))
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+        if not 2 <= max_points <= MAX_CHART_POINTS:
+            return jsonify({'error': f'maxPoints doit être compris entre 2 et {MAX_CHART_POINTS}'}), 400
+
+        print(f"🧭 Walk-forward: {symbol} {start_date} -> {end_date} ({strategy}, {n_folds} plis)")
+        try:
+            result = run_walk_forward(symbol, start_date, end_date, strategy, n_folds=n_folds,
+                                      in_sample_ratio=in_sample_ratio, grid=data.get('grid'),
+                                      anchored=bool(data.get('anchored', False)))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        equity = result['equity']
+        indices = downsample_indices(equity, max_points) if len(equity) > max_points else np.arange(len(equity))
+        print(f"✅ Walk-forward terminé: {result['summary']['gains']}% hors échantillon")
+
         return jsonify({
-            'content': csv_content,
-            'filename': f"transactions_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+            'symbol': symbol,
+            'period': {
+                'start': start_date,
+                'end': end_date
+            },
+            'strategy': strategy,
+            'results': result['summary'],
+            'folds': result['folds'],
+            'equityCurve': {
+                'labels': _format_labels(result['dates'], indices),
+                'equity': np.round(equity[indices], 2).tolist()
+            }
         })
-        
+
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        print(f"❌ Erreur dans walk_forward: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': f'Erreur lors du walk-forward: {str(e)}'}), 500
+
+@app.route('/api/montecarlo', methods=['POST'])
+def monte_carlo():
+    """Endpoint pour une analyse de robustesse Monte Carlo (trajectoires rééchantillonnées)"""
+    try:
+        data = request.get_json()
+
+        if not data:
+            return jsonify({'error': 'Aucune donnée JSON reçue'}), 400
+
+        for field in ['symbol', 'startDate', 'endDate', 'strategy']:
+            if field not in data:
+                return jsonify({'error': f'Champ manquant: {field}'}), 400
+
+        symbol = data['symbol']
+        start_date = data['startDate']
+        end_date = data['endDate']
+        strategy = data['strategy']
+        method = data.get('method', 'block')
+
+        if strategy not in available_strategies():
+            return jsonify({'error': f'Stratégie inconnue: {strategy}'}), 400
+        if method not in METHODS:
+            return jsonify({'error': f"Méthode inconnue: {method} ({', '.join(METHODS)})"}), 400
+
+        try:
+            n_paths = int(data.get('paths', 1000))
+            n_bars = int(data['bars']) if data.get('bars') else None
+            block_size = int(data.get('blockSize', 20))
+            seed = int(data['seed']) if data.get('seed') is not None else None
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+        if not 1 <= n_paths <= MAX_MONTE_CARLO_PATHS:
+            return jsonify({'error': f'paths doit être compris entre 1 et {MAX_MONTE_CARLO_PATHS}'}), 400
+
+        print(f"🎲 Monte Carlo: {symbol} {start_date} -> {end_date} ({strategy}, {n_paths} trajectoires)")
+        try:
+            result = run_monte_carlo(symbol, start_date, end_date, strategy, n_paths=n_paths, n_bars=n_bars,
+                                     method=method, block_size=block_size, params=data.get('params'),
+                                     seed=seed)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        print(f"✅ Monte Carlo terminé: perte dans {result['probabilityOfLoss'] * 100:.1f}% des trajectoires")
+
+        return jsonify({
+            'symbol': symbol,
+            'period': {
+                'start': start_date,
+                'end': end_date
+            },
+            'strategy': strategy,
+            'results': result
+        })
+
+    except Exception as e:
+        print(f"❌ Erreur dans monte_carlo: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': f'Erreur lors du Monte Carlo: {str(e)}'}), 500
+
+@app.route('/api/intraday', methods=['POST'])
+def analyze_intraday():
+    """Endpoint pour un backtest sur barres intraday (1m, 5m...), parcourues mois par mois"""
+    try:
+        data = request.get_json()
+
+        if not data:
+            return jsonify({'error': 'Aucune donnée JSON reçue'}), 400
+
+        for field in ['symbol', 'startDate', 'endDate', 'strategy']:
+            if field not in data:
+                return jsonify({'error': f'Champ manquant: {field}'}), 400
+
+        symbol = data['symbol']
+        start_date = data['startDate']
+        end_date = data['endDate']
+        strategy = data['strategy']
+        interval = data.get('interval', '5m')
+
+        if strategy not in available_strategies():
+            return jsonify({'error': f'Stratégie inconnue: {strategy}'}), 400
+        if interval not in INTERVALS:
+            return jsonify({'error': f"Intervalle inconnu: {interval} ({', '.join(INTERVALS)})"}), 400
+
+        try:
+            max_points = int(data.get('maxPoints', DEFAULT_CHART_POINTS))
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+        if not 2 <= max_points <= MAX_CHART_POINTS:
+            return jsonify({'error': f'maxPoints doit être compris entre 2 et {MAX_CHART_POINTS}'}), 400
+
+        print(f"⏱️ Intraday: {symbol} {start_date} -> {end_date} ({strategy}, {interval})")
+        try:
+            result = run_intraday(symbol, start_date, end_date, strategy, interval, params=data.get('params'))
+        except (ValueError, KeyError) as e:
+            return jsonify({'error': str(e)}), 400
+
+        equity = result['equity']
+        indices = downsample_indices(equity, max_points) if len(equity) > max_points else np.arange(len(equity))
+        capital = result['initial_capital']
+        final_equity = result['final_equity']
+        print(f"✅ Intraday terminé: {result['number_of_bars']} barres, {len(result['ledger'])} transactions")
+
+        return jsonify({
+            'symbol': symbol,
+            'period': {
+                'start': start_date,
+                'end': end_date
+            },
+            'strategy': strategy,
+            'interval': interval,
+            'results': {
+                'initialCapital': capital,
+                'finalCapital': result['final_capital'],
+                'finalEquity': round(final_equity, 2),
+                'sharesRemaining': result['shares_remaining'],
+                'gains': round((final_equity - capital) / capital * 100, 1),
+                'maxDrawdown': result['max_drawdown'],
+                'numberOfTrades': len(result['ledger']),
+                'numberOfBars': result['number_of_bars']
+            },
+            'equityCurve': {
+                'labels': pd.DatetimeIndex(result['equity_dates'][indices]).strftime('%d/%m/%y %H:%M').tolist(),
+                'equity': np.round(equity[indices], 2).tolist()
+            }
+        })
+
+    except Exception as e:
+        print(f"❌ Erreur dans analyze_intraday: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': f'Erreur lors du backtest intraday: {str(e)}'}), 500
+
+@app.route('/api/batch', methods=['POST'])
+def batch_analyze():
+    """Endpoint pour analyser un univers de symboles (réponse NDJSON, une ligne par symbole)"""
+    data = request.get_json()
+
+    if not data:
+        return jsonify({'error': 'Aucune donnée JSON reçue'}), 400
+
+    for field in ['startDate', 'endDate', 'strategy']:
+        if field not in data:
+            return jsonify({'error': f'Champ manquant: {field}'}), 400
+
+    strategy = data['strategy']
+    start_date = data['startDate']
+    end_date = data['endDate']
+
+    if strategy not in available_strategies():
+        return jsonify({'error': f'Stratégie inconnue: {strategy}'}), 400
+
+    try:
+        symbols = resolve_universe(data.get('universe'), data.get('symbols'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not symbols:
+        return jsonify({'error': 'Aucun symbole à analyser'}), 400
+
+    print(f"📦 Analyse par lot: {len(symbols)} symboles ({strategy})")
+
+    def generate():
+        try:
+            for item in run_batch(symbols, strategy, start_date, end_date):
+                yield json.dumps(item) + '\n'
+        except Exception as e:
+            print(f"❌ Erreur dans batch_analyze: {str(e)}")
+            yield json.dumps({'status': 'error', 'error': str(e)}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/api/portfolio', methods=['POST'])
+def portfolio_backtest():
+    """Endpoint pour le backtest d'une stratégie sur plusieurs symboles avec une trésorerie commune"""
+    try:
+        data = request.get_json()
+
+        if not data:
+            return jsonify({'error': 'Aucune donnée JSON reçue'}), 400
+
+        for field in ['startDate', 'endDate', 'strategy']:
+            if field not in data:
+                return jsonify({'error': f'Champ manquant: {field}'}), 400
+
+        strategy = data['strategy']
+        start_date = data['startDate']
+        end_date = data['endDate']
+
+        if strategy not in available_strategies():
+            return jsonify({'error': f'Stratégie inconnue: {strategy}'}), 400
+
+        try:
+            symbols = resolve_universe(data.get('universe'), data.get('symbols'))
+            capital = float(data.get('capital', DEFAULT_CAPITAL))
+            max_positions = int(data['maxPositions']) if data.get('maxPositions') else None
+            position_size = float(data['positionSize']) if data.get('positionSize') else None
+            max_points = int(data.get('maxPoints', DEFAULT_CHART_POINTS))
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+        if not symbols:
+            return jsonify({'error': 'Aucun symbole à analyser'}), 400
+        if capital <= 0 or (position_size is not None and not 0 < position_size <= 1):
+            return jsonify({'error': 'capital doit être positif et positionSize compris entre 0 et 1'}), 400
+        if not 2 <= max_points <= MAX_CHART_POINTS:
+            return jsonify({'error': f'maxPoints doit être compris entre 2 et {MAX_CHART_POINTS}'}), 400
+
+        print(f"💼 Portefeuille: {len(symbols)} symboles ({strategy}) {start_date} -> {end_date}")
+        try:
+            result = run_portfolio(symbols, start_date, end_date, strategy, capital=capital,
+                                   max_positions=max_positions, position_size=position_size)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        indices = (downsample_indices(result.equity, max_points)
+                   if len(result.equity) > max_points else np.arange(len(result.equity)))
+        print(f"✅ Portefeuille terminé: {len(result.ledger)} transactions")
+
+        return jsonify({
+            'symbols': result.symbols,
+            'period': {
+                'start': start_date,
+                'end': end_date
+            },
+            'strategy': strategy,
+            'results': summarize_portfolio(result, capital),
+            'equityCurve': {
+                'labels': _format_labels(result.dates, indices),
+                'equity': np.round(result.equity[indices], 2).tolist(),
+                'drawdown': np.round(result.drawdown[indices], 4).tolist()
+            },
+            'transactions': result.ledger.to_records(with_symbol=True)
+        })
+
+    except Exception as e:
+        print(f"❌ Erreur dans portfolio_backtest: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': f'Erreur lors du backtest de portefeuille: {str(e)}'}), 500
+
+@app.route('/api/export', methods=['POST'])
+def export_transactions():
+    """
+    Endpoint pour exporter les transactions (fichier envoyé en flux)
+
+    Source des transactions, au choix : 'jobId' d'une analyse asynchrone
+    terminée, paramètres d'une analyse (servie depuis le cache si elle vient
+    d'être faite) ou liste 'transactions' envoyée par le client.
+    Format : 'format' du corps ou ?format= ('csv' par défaut, 'parquet', 'xlsx').
+    """
+    data = request.get_json(silent=True) or {}
+    fmt = (request.args.get('format') or data.get('format') or 'csv').lower()
+    try:
+        check_format(fmt)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    symbol = ''
+    if data.get('jobId'):
+        job = job_manager.get(data['jobId'])
+        if job is None:
+            return jsonify({'error': f'Tâche inconnue: {data["jobId"]}'}), 404
+        if job.status != DONE:
+            return jsonify({'error': 'Analyse non terminée', 'status': job.status}), 409
+        transactions = job.result['transactions']
+        symbol = job.result['symbol']
+    elif 'symbol' in data:
+        params, error = parse_analysis_request(data)
+        if error:
+            return jsonify({'error': error}), 400
+        try:
+            transactions = run_analysis(**params)['transactions']
+        except Exception as e:
+            return jsonify({'error': f'Erreur lors de l\'analyse: {str(e)}'}), 500
+        symbol = params['symbol']
+    else:
+        transactions = data.get('transactions', [])
+    
+    if not transactions:
+        return jsonify({'error': 'Aucune transaction à exporter'}), 400
+    
+    try:
+        ledger = TradeLedger.from_records(transactions, symbol)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Transactions invalides: {str(e)}'}), 400
+    
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    filename = f"transactions_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+    print(f"📄 Export {fmt}: {len(ledger)} transactions")
+    return Response(
+        stream_with_context(iter_export(ledger, fmt)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -241,12 +793,18 @@ def health_check():
     return jsonify({
         'status': 'OK', 
         'message': 'PyTrader API utilisant les fonctions FRA et USA',
-        'strategies_available': {
-            'FRA': 'analyze_fra_strategy' in globals(),
-            'USA': 'analyze_usa_strategy' in globals()
-        }
+        'strategies_available': {name: True for name in available_strategies()},
+        'formats': available_mimetypes(),
+        'jobs': job_manager.stats(),
+        'cache': result_cache.stats(),
+        'sharedSegments': mapped_stats()
     })
 
+@app.route('/api/metrics', methods=['GET'])
+def export_metrics():
+    """Métriques au format texte de Prometheus (durées par étape et par requête)"""
+    return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/api/test', methods=['POST'])
 def test_analyze():
     """Endpoint de test pour déboguer"""
@@ -263,12 +821,12 @@ def test_analyze():
         
         raw_results = analyze_fra_strategy(symbol, start_date, end_date, show_plot=False)
         
-        print(f"✅ Test réussi. Transactions: {len(raw_results.get('transactions', []))}")
+        print(f"✅ Test réussi. Transactions: {len(raw_results['ledger'])}")
         
         return jsonify({
             'status': 'success',
             'symbol': symbol,
-            'transactions_count': len(raw_results.get('transactions', [])),
+            'transactions_count': len(raw_results['ledger']),
             'final_capital': raw_results.get('final_capital', 0)
         })
         
@@ -284,7 +842,19 @@ if __name__ == '__main__':
     print("📍 URL: http://localhost:5000")
     print("🔗 Endpoints:")
     print("   POST /api/analyze - Analyser avec les fonctions")
-    print("   POST /api/export - Exporter les transactions")
+    print("   POST /api/optimize - Optimiser les paramètres d'une stratégie")
+    print("   POST /api/walkforward - Backtest walk-forward (optimisation / validation)")
+    print("   POST /api/intraday - Backtest sur barres intraday (1m, 5m...)")
+    print("   POST /api/montecarlo - Robustesse Monte Carlo (trajectoires rééchantillonnées)")
+    print("   POST /api/batch - Analyser un univers de symboles")
+    print("   POST /api/portfolio - Backtest multi-symboles à trésorerie commune")
+    print("   POST /api/jobs - Soumettre une analyse asynchrone")
+    print("   POST /api/export - Exporter les transactions (CSV, Parquet, Excel)")
     print("   GET /api/health - Vérification de santé")
+    print("   GET /api/metrics - Métriques Prometheus")
+    
+    print("   (production : gunicorn -c gunicorn.conf.py wsgi:app)")
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # Mode développement : rechargement automatique sauf PYTRADER_DEBUG=0
+    app.run(debug=os.environ.get('PYTRADER_DEBUG', '1') != '0', host='0.0.0.0',
+            port=int(os.environ.get('PYTRADER_PORT', 5000)), threaded=True)
\ No newline at end of file
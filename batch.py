@@ -0,0 +1,87 @@
+"""
+Backtests par lots : une stratégie appliquée à tout un univers de symboles
+
+Les cours de l'univers sont d'abord chargés dans le cache disque par un seul
+téléchargement groupé, puis chaque symbole est analysé dans un processus du
+pool. Les résultats sont rendus au fil de l'eau, dans l'ordre de fin.
+"""
+
+from concurrent.futures import as_completed
+
+from analytics import format_metrics
+from price_store import get_price_store, set_price_store
+from process_pool import get_process_pool
+from strategies import get_strategy, run_strategy
+
+UNIVERSES = {
+    'CAC40': [
+        'AC.PA', 'AI.PA', 'AIR.PA', 'MT.AS', 'CS.PA', 'BNP.PA', 'EN.PA', 'BVI.PA',
+        'CAP.PA', 'CA.PA', 'ACA.PA', 'BN.PA', 'DSY.PA', 'EDEN.PA', 'ENGI.PA', 'EL.PA',
+        'ERF.PA', 'RMS.PA', 'KER.PA', 'OR.PA', 'LR.PA', 'MC.PA', 'ML.PA', 'ORA.PA',
+        'RI.PA', 'PUB.PA', 'RNO.PA', 'SAF.PA', 'SGO.PA', 'SAN.PA', 'SU.PA', 'GLE.PA',
+        'STLAP.PA', 'STMPA.PA', 'TEP.PA', 'HO.PA', 'TTE.PA', 'URW.PA', 'VIE.PA', 'DG.PA'
+    ]
+}
+
+
+def resolve_universe(universe=None, symbols=None):
+    """Retourne la liste de symboles à analyser (univers nommé et/ou liste explicite)"""
+    resolved = []
+    if universe:
+        if universe not in UNIVERSES:
+            raise ValueError(f"Univers inconnu: {universe}")
+        resolved.extend(UNIVERSES[universe])
+    if symbols:
+        resolved.extend(symbols)
+    # Supprime les doublons en gardant l'ordre
+    return list(dict.fromkeys(resolved))
+
+
+def _summarize(raw_results, strategy):
+    initial_capital = raw_results['initial_capital']
+    final_capital = raw_results['final_capital']
+    return {
+        'symbol': raw_results['symbol'],
+        'strategy': strategy,
+        'finalCapital': final_capital,
+        'initialCapital': initial_capital,
+        'sharesRemaining': raw_results['shares_remaining'],
+        'numberOfTrades': len(raw_results['ledger']),
+        'gains': round((final_capital - initial_capital) / initial_capital * 100, 1),
+        'metrics': format_metrics(raw_results['performance'])
+    }
+
+
+def _analyze_symbol(spec, symbol, start_date, end_date, store):
+    """Analyse un symbole (exécuté dans un processus du pool, spec : StrategySpec)"""
+    # Même cache disque que le processus parent : les cours y sont déjà chargés
+    set_price_store(store)
+    try:
+        raw_results = run_strategy(spec, symbol, start_date, end_date)
+        return {'symbol': symbol, 'status': 'ok', 'result': _summarize(raw_results, spec.name)}
+    except Exception as e:
+        return {'symbol': symbol, 'status': 'error', 'error': str(e)}
+
+
+def run_batch(symbols, strategy, start_date, end_date):
+    """
+    Analyse tous les symboles en parallèle
+
+    Yields:
+        dict par symbole, dès qu'il est terminé : {'symbol', 'status', 'result' | 'error'}
+    """
+    spec = get_strategy(strategy)
+
+    store = get_price_store()
+    store.load_many(symbols, start_date, end_date, interval='1d')
+
+    pool = get_process_pool()
+    futures = [pool.submit(_analyze_symbol, spec, symbol, start_date, end_date, store)
+               for symbol in symbols]
+    try:
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        # Client déconnecté ou erreur : on abandonne les analyses pas encore démarrées
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Banc de mesure des moteurs de stratégie, du formatage API et de la latence de bout en bout
+
+Les cours sont des séries synthétiques (mouvement brownien géométrique) de
+1k, 10k et 100k barres servies par un fournisseur hors ligne à la place de
+yfinance : les mesures sont reproductibles et ne dépendent pas du réseau.
+Pour chaque étape (chargement, indicateurs, simulation, journal des
+transactions, formatage, JSON) le script mesure le débit et le pic mémoire,
+puis compare le tout à une référence enregistrée pour détecter les régressions.
+
+Exemples :
+    python benchmark.py                    # mesure et comparaison à la référence
+    python benchmark.py --save-baseline    # enregistre la référence
+    python benchmark.py --sizes 1000 --skip-load
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.request
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import price_store
+from price_store import PriceProvider, PriceStore
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+SYNTHETIC_START = '1800-01-01'
+
+
+def gbm_frame(n_bars, seed=0, mu=0.0003, sigma=0.02, start=SYNTHETIC_START, s0=100.0):
+    """Série OHLCV synthétique : clôtures en mouvement brownien géométrique, une barre par jour
+
+    Une barre par jour calendaire : 100k barres ouvrées dépasseraient la plage
+    des horodatages pandas en nanosecondes."""
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(mu - 0.5 * sigma ** 2, sigma, n_bars)
+    close = s0 * np.exp(np.cumsum(returns))
+    open_ = np.concatenate([[s0], close[:-1]]) * np.exp(rng.normal(0, sigma / 4, n_bars))
+    spread = np.abs(rng.normal(0, sigma / 2, n_bars))
+    high = np.maximum(open_, close) * (1 + spread)
+    low = np.minimum(open_, close) * (1 - spread)
+    volume = rng.integers(100_000, 1_000_000, n_bars).astype(np.float64)
+    index = pd.date_range(start, periods=n_bars, freq='D', name='Date')
+    return pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume},
+                        index=index)
+
+
+class SyntheticProvider(PriceProvider):
+    """
+    Remplaçant hors ligne de yfinance : chaque symbole reçoit une série GBM
+    déterministe (graine dérivée du symbole) de n_bars barres
+    """
+
+    def __init__(self, n_bars=max(DEFAULT_SIZES)):
+        self.n_bars = n_bars
+        self._series = {}
+
+    def fetch(self, symbol, start, end, interval='1d'):
+        if symbol not in self._series:
+            self._series[symbol] = gbm_frame(self.n_bars, seed=zlib.crc32(symbol.encode('utf-8')))
+        data = self._series[symbol]
+        return data[(data.index >= pd.Timestamp(start)) & (data.index < pd.Timestamp(end))]
+
+
+def period_for(n_bars):
+    """Période [début, fin) couvrant exactement n_bars barres synthétiques"""
+    dates = pd.date_range(SYNTHETIC_START, freq='D', periods=n_bars + 1)
+    return dates[0].strftime('%Y-%m-%d'), dates[-1].strftime('%Y-%m-%d')
+
+
+def measure(func, repeat):
+    """Meilleur temps sur repeat exécutions et pic mémoire Python (tracemalloc) de la dernière"""
+    best = float('inf')
+    result = None
+    for k in range(repeat):
+        if k == repeat - 1:
+            tracemalloc.start()
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, best, peak
+
+
+def bench_pipeline(strategy, n_bars, repeat):
+    """Mesure chaque étape de l'analyse d'une stratégie sur n_bars barres"""
+    import api_server
+    from analytics import performance
+    from indicators import IndicatorGraph
+    from ledger import TradeLedger
+    from strategies import get_strategy, run_strategy
+
+    symbol = f'SYN{n_bars}'
+    start_date, end_date = period_for(n_bars)
+    store = price_store.get_price_store()
+    spec = get_strategy(strategy)
+    stages = {}
+
+    def record(name, func):
+        result, seconds, peak = measure(func, repeat)
+        stages[name] = {
+            'seconds': seconds,
+            'bars_per_second': n_bars / seconds if seconds > 0 else float('inf'),
+            'peak_kib': peak / 1024
+        }
+        return result
+
+    stock_data = record('fetch', lambda: store.load(symbol, start_date, end_date))
+    columns = {column: stock_data[column].to_numpy() for column in price_store.COLUMNS}
+
+    def indicators():
+        graph = IndicatorGraph(columns)
+        graph.compute(spec.indicator_columns())
+        return graph
+
+    graph = record('indicators', indicators)
+    # Backtest événementiel de /api/analyze (exécution à la barre suivante, frais)
+    simulation = record('simulation', lambda: spec.backtest(graph))
+
+    chart_data = {'dates': stock_data['Date'].to_numpy(), 'prices': graph.source(spec.source)}
+    indicator_columns = spec.indicator_columns()
+    for slot, column in spec.chart.items():
+        chart_data[slot] = graph.get(indicator_columns[column])
+
+    ledger = record('trade_log', lambda: TradeLedger.from_trades(simulation.trades, stock_data['Date'], symbol))
+    capital = spec.capital
+    metrics = record('analytics', lambda: performance(simulation, capital, stock_data['Date'].to_numpy()))
+
+    raw_results = {
+        'symbol': symbol,
+        'final_capital': int(simulation.cash),
+        'shares_remaining': int(simulation.position),
+        'initial_capital': capital,
+        'ledger': ledger,
+        'costs': {'commission': round(simulation.state['commission'], 2),
+                  'slippage': round(simulation.state['slippage'], 2)},
+        'performance': metrics,
+        'chart_data': chart_data
+    }
+    formatted = record('formatting', lambda: api_server.format_results_for_frontend(
+        raw_results, symbol, start_date, end_date, strategy, max_points=300))
+    record('json', lambda: json.dumps(formatted))
+
+    # Chemin de /api/analyze : stratégie résolue dans le registre
+    record('end_to_end', lambda: run_strategy(strategy, symbol, start_date, end_date))
+    return {'trades': len(simulation.trades), 'stages': stages}
+
+
+def _serve(app):
+    """Démarre l'API sur un port libre dans un thread ; retourne (serveur, url)"""
+    from werkzeug.serving import make_server
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def _post(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    with urllib.request.urlopen(request) as response:
+        response.read()
+        status = response.status
+    return time.perf_counter() - start, status
+
+
+def _latency_summary(latencies, wall):
+    latencies = np.sort(np.asarray(latencies))
+    return {
+        'requests': len(latencies),
+        'requests_per_second': len(latencies) / wall if wall > 0 else float('inf'),
+        'p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'p95_ms': float(np.percentile(latencies, 95) * 1000),
+        'max_ms': float(latencies[-1] * 1000)
+    }
+
+
+def bench_load(n_bars, clients, requests):
+    """
+    Charge /api/analyze avec clients connexions simultanées
+
+    Deux phases : demandes toutes différentes (cache de résultats manqué),
+    puis la même demande répétée (cache touché).
+    """
+    import api_server
+
+    server, url = _serve(api_server.app)
+    start_date, _ = period_for(n_bars)
+    dates = pd.date_range(SYNTHETIC_START, freq='D', periods=n_bars + requests + 1)
+    symbol = f'SYN{n_bars}'
+    results = {}
+    try:
+        for phase in ('uncached', 'cached'):
+            payloads = []
+            for k in range(requests):
+                end_index = n_bars - k if phase == 'uncached' else n_bars
+                payloads.append({'symbol': symbol, 'startDate': start_date,
+                                 'endDate': dates[end_index].strftime('%Y-%m-%d'),
+                                 'strategy': 'USA' if k % 2 else 'FRA', 'maxPoints': 300})
+            wall_start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=clients) as pool:
+                responses = list(pool.map(lambda p: _post(f'{url}/api/analyze', p), payloads))
+            wall = time.perf_counter() - wall_start
+            results[phase] = _latency_summary([latency for latency, _ in responses], wall)
+            results[phase]['errors'] = sum(1 for _, status in responses if status != 200)
+    finally:
+        server.shutdown()
+    return results
+
+
+def compare(report, baseline, tolerance):
+    """Liste des étapes plus lentes que la référence au-delà de la tolérance (ratio)"""
+    regressions = []
+    for key, entry in report['pipelines'].items():
+        reference = baseline.get('pipelines', {}).get(key)
+        if not reference:
+            continue
+        for stage, values in entry['stages'].items():
+            ref_stage = reference['stages'].get(stage)
+            if ref_stage and values['seconds'] > ref_stage['seconds'] * tolerance and values['seconds'] > 1e-3:
+                regressions.append(f"{key}/{stage}: {values['seconds'] * 1000:.2f} ms "
+                                   f"(référence {ref_stage['seconds'] * 1000:.2f} ms)")
+    return regressions
+
+
+def print_report(report):
+    print(f"{'Stratégie':<10}{'Barres':>9}  {'Étape':<12}{'Temps (ms)':>12}{'Barres/s':>14}{'Pic (KiB)':>12}")
+    for key, entry in report['pipelines'].items():
+        strategy, n_bars = key.split('/')
+        for stage, values in entry['stages'].items():
+            print(f"{strategy:<10}{n_bars:>9}  {stage:<12}{values['seconds'] * 1000:>12.2f}"
+                  f"{values['bars_per_second']:>14,.0f}{values['peak_kib']:>12.1f}")
+    for phase, values in report.get('load', {}).items():
+        print(f"Charge {phase:<9}: {values['requests_per_second']:.1f} req/s, p50 {values['p50_ms']:.1f} ms, "
+              f"p95 {values['p95_ms']:.1f} ms, erreurs {values['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Banc de mesure PyTrader')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Tailles de séries (barres)')
+    parser.add_argument('--repeat', type=int, default=3, help='Répétitions par étape (meilleur temps retenu)')
+    parser.add_argument('--clients', type=int, default=8, help='Clients simultanés pour le test de charge')
+    parser.add_argument('--requests', type=int, default=64, help='Requêtes par phase du test de charge')
+    parser.add_argument('--load-bars', type=int, default=2500, help='Taille de série du test de charge')
+    parser.add_argument('--skip-load', action='store_true', help='Ne pas lancer le test de charge')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Fichier de référence')
+    parser.add_argument('--save-baseline', action='store_true', help='Enregistrer les mesures comme référence')
+    parser.add_argument('--tolerance', type=float, default=1.5, help='Ralentissement toléré (ratio)')
+    parser.add_argument('--output', help='Écrire le rapport JSON dans ce fichier')
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp(prefix='pytrader-bench-')
+    price_store.set_price_store(PriceStore(cache_dir, SyntheticProvider(max(args.sizes + [args.load_bars]) + args.requests + 1)))
+    try:
+        report = {'pipelines': {}}
+        for n_bars in args.sizes:
+            for strategy in ('FRA', 'USA'):
+                report['pipelines'][f'{strategy}/{n_bars}'] = bench_pipeline(strategy, n_bars, args.repeat)
+        if not args.skip_load:
+            report['load'] = bench_load(args.load_bars, args.clients, args.requests)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Référence enregistrée: {args.baseline}")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print("❌ Régressions détectées:")
+            for line in regressions:
+                print(f"   {line}")
+            return 1
+        print("✅ Aucune régression par rapport à la référence")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
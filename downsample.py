@@ -0,0 +1,82 @@
+"""
+Réduction du nombre de points des séries envoyées au graphique
+
+LTTB (Largest-Triangle-Three-Buckets) garde, dans chaque paquet, le point qui
+forme le plus grand triangle avec le point retenu précédemment et la moyenne
+du paquet suivant : les pics et les creux sont conservés, contrairement à un
+échantillonnage régulier. Les fonctions retournent des indices afin que
+toutes les séries (prix, SMA, dates) soient échantillonnées de la même façon.
+"""
+
+import numpy as np
+
+
+def _fill_nan(y):
+    """Remplace les NaN par la moyenne de la série (ils ne doivent pas guider la sélection)"""
+    mask = np.isnan(y)
+    if not mask.any():
+        return y
+    fill = np.nanmean(y) if (~mask).any() else 0.0
+    return np.where(mask, fill, y)
+
+
+def lttb_indices(y, n_out, x=None):
+    """
+    Indices des n_out points retenus par LTTB
+
+    Args:
+        y: valeurs de la série
+        n_out: nombre de points voulus (>= 3)
+        x: abscisses (par défaut 0..n-1)
+    """
+    y = _fill_nan(np.asarray(y, dtype=np.float64))
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n) if n_out >= n else np.linspace(0, n - 1, max(n_out, 1)).astype(np.int64)
+    x = np.arange(n, dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64)
+
+    # Paquets intermédiaires : le premier et le dernier point sont toujours gardés
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for k in range(n_out - 2):
+        start, end = edges[k], edges[k + 1]
+        next_start, next_end = edges[k + 1], (edges[k + 2] if k + 2 < len(edges) else n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        # Aire (au facteur 1/2 près) des triangles (a, point candidat, moyenne suivante)
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) -
+                      (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[k + 1] = a
+    return selected
+
+
+def minmax_indices(y, n_out):
+    """Indices du minimum et du maximum de chaque paquet (n_out // 2 paquets)"""
+    y = _fill_nan(np.asarray(y, dtype=np.float64))
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+
+    n_buckets = max(1, n_out // 2)
+    usable = (n // n_buckets) * n_buckets
+    buckets = y[:usable].reshape(n_buckets, -1)
+    offsets = np.arange(n_buckets) * buckets.shape[1]
+    indices = np.concatenate([offsets + buckets.argmin(axis=1), offsets + buckets.argmax(axis=1)])
+    if usable < n:
+        indices = np.append(indices, n - 1)
+    return np.unique(indices)
+
+
+def downsample_indices(y, n_out, method='lttb'):
+    """Indices à conserver pour afficher y avec au plus n_out points"""
+    if method == 'minmax':
+        return minmax_indices(y, n_out)
+    if method == 'lttb':
+        return lttb_indices(y, n_out)
+    raise ValueError(f"Méthode d'échantillonnage inconnue: {method}")
@@ -0,0 +1,73 @@
+"""
+Types communs des moteurs de simulation
+
+Types d'ordre, format des transactions et des exécutions par barre, règles
+de sortie, enchaînement des règles et dimensionnement des achats partagés
+par le moteur événementiel (execution.py), les stratégies déclaratives
+(strategies.py) et le portefeuille multi-symboles (portfolio.py), ainsi que
+le résultat d'une simulation (Simulation).
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from ledger import OrderType
+
+# Types d'ordre (colonne 'order' des tableaux de transactions), entiers pour les moteurs
+ACHAT = int(OrderType.ACHAT)
+VENTE = int(OrderType.VENTE)
+STOP_LOSS = int(OrderType.STOP_LOSS)
+TAKE_PROFIT = int(OrderType.TAKE_PROFIT)
+
+TRADE_DTYPE = np.dtype([
+    ('index', np.int64),      # position de la barre dans les données
+    ('order', np.int8),       # ACHAT, VENTE...
+    ('quantity', np.float64),
+    ('price', np.float64),
+    ('cash', np.float64)      # solde restant après l'ordre
+])
+
+FILL_DTYPE = np.dtype([
+    ('buy_price', np.float64),   # prix d'achat sur la barre, 0 sinon
+    ('sell_price', np.float64),  # prix de vente sur croisement, 0 sinon
+    ('quantity', np.int64)       # quantité achetée sur la barre
+])
+
+# Résultat d'une simulation : transactions, valeur du portefeuille par barre,
+# exécutions par barre, trésorerie et position finales, état complet de fin
+# (dict à passer en state= pour poursuivre sur les barres suivantes)
+Simulation = namedtuple('Simulation', ['trades', 'equity', 'fills', 'cash', 'position', 'state'],
+                        defaults=(None,))
+
+
+# ---------------------------------------------------------------------------
+# Règles de sortie, enchaînement, dimensionnement
+# ---------------------------------------------------------------------------
+
+# Types de règles de sortie
+RULE_SIGNAL = 0         # condition précalculée (signal par barre joint à la règle)
+RULE_STOP_LOSS = 1      # prix < dernier achat * niveau
+RULE_TAKE_PROFIT = 2    # prix > dernier achat * niveau
+RULE_TRAILING_STOP = 3  # prix < plus haut depuis l'achat * niveau
+
+# Enchaînement des règles d'une barre
+SEQUENTIAL = 0   # achat puis sorties sur la même barre, la dernière règle vérifiée l'emporte
+EXCLUSIVE = 1    # achat, sinon la première règle vérifiée (même pour une quantité nulle)
+
+# Dimensionnement des achats
+SIZING_FLOOR = 0     # cash // prix
+SIZING_TRUNCATE = 1  # int(cash / prix)
+
+
+def max_drawdown(equity):
+    """Perte maximale depuis un plus haut, en fraction (0.25 = -25 %)"""
+    equity = np.asarray(equity, dtype=np.float64)
+    if len(equity) == 0:
+        return 0.0
+    peak = np.fmax.accumulate(equity)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        drawdown = 1.0 - equity / peak
+    worst = np.nanmax(drawdown) if np.any(~np.isnan(drawdown)) else 0.0
+    return float(max(worst, 0.0))
+
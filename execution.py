@@ -0,0 +1,512 @@
+"""
+Moteur de backtest événementiel : exécution à la barre suivante, ordres
+limites et stops, glissement et commissions
+
+Les décisions d'une stratégie (conditions compilées par strategies.py) sont
+prises sur la barre i et exécutées à partir de la barre i + 1 :
+
+- achats et ventes sur signal : ordres au marché, exécutés à l'ouverture
+  suivante (ou ordre d'achat limite valable une barre, voir entry_limit) ;
+- stop-loss et trailing stop : ordres stop de vente en attente, déclenchés
+  quand le plus bas de la barre atteint le stop et exécutés au stop, ou à
+  l'ouverture si elle est déjà en dessous ;
+- take-profit : ordre limite de vente en attente, exécuté au prix limite (ou
+  à l'ouverture si elle est au-dessus) quand le plus haut l'atteint.
+
+Les ordres en attente sont rangés dans des tas (heapq) par prix de
+déclenchement : à chaque barre, seul le sommet de chaque tas est comparé à
+la plage de la barre. Ce sont des objets à __slots__ pris dans une réserve
+préallouée et recyclés après exécution ou annulation. Les exécutions au
+marché et sur stop paient le glissement ; toutes paient la commission du
+barème (Costs).
+"""
+
+import heapq
+import math
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+import numpy as np
+
+from engine import (ACHAT, EXCLUSIVE, FILL_DTYPE, RULE_SIGNAL, RULE_TAKE_PROFIT, RULE_TRAILING_STOP,
+                    SEQUENTIAL, SIZING_FLOOR, TRADE_DTYPE, VENTE, Simulation)
+
+# Type d'ordre
+MARKET = 0
+LIMIT = 1
+STOP = 2
+
+# Sens
+BUY = 0
+SELL = 1
+
+# Ordres préalloués par simulation (la réserve grandit au besoin)
+ORDER_POOL_SIZE = 16
+
+
+class CommissionSchedule:
+    """
+    Barème de commission d'un ordre, en fonction de son montant
+
+    Args:
+        rate: taux appliqué au montant (0.001 = 0,1 %)
+        minimum: commission minimale par ordre
+        fixed: part fixe par ordre
+        tiers: tranches ((montant minimal, taux), ...) remplaçant rate : le
+            taux de la dernière tranche atteinte s'applique à tout le montant
+    """
+
+    __slots__ = ('rate', 'minimum', 'fixed', 'tiers', '_thresholds', '_rates')
+
+    def __init__(self, rate=0.0, minimum=0.0, fixed=0.0, tiers=None):
+        self.rate = float(rate)
+        self.minimum = float(minimum)
+        self.fixed = float(fixed)
+        self.tiers = tuple(sorted((float(t), float(r)) for t, r in tiers)) if tiers else ()
+        if self.tiers and self.tiers[0][0] > 0:
+            self.tiers = ((0.0, self.rate),) + self.tiers
+        self._thresholds = [t for t, _ in self.tiers]
+        self._rates = [r for _, r in self.tiers]
+
+    def __call__(self, notional):
+        if notional <= 0:
+            return 0.0
+        rate = self._rates[bisect_right(self._thresholds, notional) - 1] if self.tiers else self.rate
+        return max(self.minimum, self.fixed + notional * rate)
+
+    def many(self, notional):
+        """Commission de chaque montant d'un tableau (0 pour un montant nul)"""
+        notional = np.asarray(notional, dtype=np.float64)
+        if self.tiers:
+            rate = np.asarray(self._rates)[np.searchsorted(self._thresholds, notional, side='right') - 1]
+        else:
+            rate = self.rate
+        return np.where(notional > 0, np.maximum(self.minimum, self.fixed + notional * rate), 0.0)
+
+    def affordable(self, cash, price, limit):
+        """
+        Plus grande quantité entière, au plus limit, dont le montant au prix
+        price plus la commission tient dans cash
+
+        Calculée tranche par tranche sans tâtonnement : dans une tranche de
+        taux r, il faut q * price + minimum <= cash et
+        q * price * (1 + r) + fixed <= cash ; avec des tranches le coût total
+        n'est pas monotone en q, la meilleure tranche réalisable l'emporte.
+        """
+        if limit <= 0 or price <= 0:
+            return 0.0
+        tiers = self.tiers or ((0.0, self.rate),)
+        best = 0.0
+        for k, (threshold, rate) in enumerate(tiers):
+            qty = min(float(limit), math.floor((cash - self.minimum) / price),
+                      math.floor((cash - self.fixed) / (price * (1.0 + rate))))
+            if k + 1 < len(tiers):
+                qty = min(qty, math.ceil(tiers[k + 1][0] / price) - 1.0)
+            if qty > best and qty * price >= threshold:
+                best = qty
+        # Arrondi des divisions : au plus une unité de trop
+        if best > 0 and best * price + self(best * price) > cash:
+            best -= 1.0
+        return best
+
+    def __repr__(self):
+        return (f'CommissionSchedule(rate={self.rate}, minimum={self.minimum}, fixed={self.fixed}, '
+                f'tiers={list(self.tiers) or None})')
+
+    def to_dict(self):
+        return {'rate': self.rate, 'minimum': self.minimum, 'fixed': self.fixed,
+                'tiers': [list(tier) for tier in self.tiers] or None}
+
+
+# Frais d'exécution : barème de commission et glissement en points de base
+# (pris contre l'ordre : achat plus cher, vente moins chère)
+Costs = namedtuple('Costs', ['commission', 'slippage_bps'])
+
+NO_COSTS = Costs(CommissionSchedule(), 0.0)
+
+# Frais par défaut : 0,1 % du montant (1 minimum) et 5 points de base de glissement
+DEFAULT_COSTS = Costs(CommissionSchedule(rate=0.001, minimum=1.0), 5.0)
+
+
+def make_costs(value=None):
+    """
+    Frais à partir d'une déclaration : None -> DEFAULT_COSTS, False -> NO_COSTS,
+    dict {commission_rate, commission_minimum, commission_fixed,
+    commission_tiers, slippage_bps} (clés absentes : valeurs par défaut)
+    """
+    if value is None or value is True:
+        return DEFAULT_COSTS
+    if value is False:
+        return NO_COSTS
+    if isinstance(value, Costs):
+        return value
+    unknown = set(value) - {'commission_rate', 'commission_minimum', 'commission_fixed',
+                            'commission_tiers', 'slippage_bps'}
+    if unknown:
+        raise ValueError(f"Paramètres de frais inconnus: {', '.join(sorted(unknown))}")
+    default = DEFAULT_COSTS.commission
+    commission = CommissionSchedule(
+        rate=value.get('commission_rate', default.rate),
+        minimum=value.get('commission_minimum', default.minimum),
+        fixed=value.get('commission_fixed', default.fixed),
+        tiers=value.get('commission_tiers')
+    )
+    return Costs(commission, float(value.get('slippage_bps', DEFAULT_COSTS.slippage_bps)))
+
+
+class Order:
+    """Ordre (objet recyclé : seq change à chaque réutilisation)"""
+
+    __slots__ = ('kind', 'side', 'price', 'pct', 'order_type', 'rule', 'active', 'seq')
+
+    def __init__(self):
+        self.active = False
+        self.seq = -1
+
+
+class OrderPool:
+    """Réserve d'ordres préalloués"""
+
+    def __init__(self, size=ORDER_POOL_SIZE):
+        self._free = [Order() for _ in range(size)]
+
+    def acquire(self, kind, side, price, pct, order_type, rule=-1):
+        order = self._free.pop() if self._free else Order()
+        order.kind = kind
+        order.side = side
+        order.price = price
+        order.pct = pct
+        order.order_type = order_type
+        order.rule = rule
+        order.active = True
+        return order
+
+    def release(self, order):
+        order.active = False
+        self._free.append(order)
+
+
+class OrderBook:
+    """
+    Ordres en attente
+
+    Les ordres au marché sont exécutés à la prochaine ouverture dans leur
+    ordre d'arrivée. Les autres sont rangés dans un tas par famille, le plus
+    proche du déclenchement au sommet ; une annulation ne fait que désactiver
+    l'ordre, retiré du tas quand il arrive au sommet.
+    """
+
+    def __init__(self, pool=None):
+        self.pool = pool or OrderPool()
+        self.market = []
+        self.sell_stops = []    # (-stop, seq, ordre) : le stop le plus haut d'abord
+        self.sell_limits = []   # (limite, seq, ordre) : la limite la plus basse d'abord
+        self.buy_limits = []    # (-limite, seq, ordre) : la limite la plus haute d'abord
+        self._seq = 0
+
+    def submit(self, kind, side, price, pct, order_type, rule=-1):
+        order = self.pool.acquire(kind, side, price, pct, order_type, rule)
+        self._seq += 1
+        order.seq = self._seq
+        if kind == MARKET:
+            self.market.append(order)
+        elif kind == STOP:
+            heapq.heappush(self.sell_stops, (-price, order.seq, order))
+        elif side == SELL:
+            heapq.heappush(self.sell_limits, (price, order.seq, order))
+        else:
+            heapq.heappush(self.buy_limits, (-price, order.seq, order))
+        return order
+
+    def cancel(self, order):
+        if order is not None and order.active:
+            order.active = False
+
+    def _top(self, heap):
+        """Sommet actif du tas (les ordres annulés sont recyclés au passage)"""
+        while heap:
+            _, seq, order = heap[0]
+            if order.seq == seq:
+                if order.active:
+                    return order
+                self.pool.release(order)
+            heapq.heappop(heap)
+        return None
+
+    def pop_triggered(self, low, high):
+        """
+        Prochain ordre déclenché par une barre de plus bas low et de plus haut
+        high, None sinon : stops d'abord (hypothèse prudente sur l'ordre des
+        prix dans la barre), puis limites de vente, puis limites d'achat
+        """
+        order = self._top(self.sell_stops)
+        if order is not None and low <= order.price:
+            heapq.heappop(self.sell_stops)
+            return order
+        order = self._top(self.sell_limits)
+        if order is not None and high >= order.price:
+            heapq.heappop(self.sell_limits)
+            return order
+        order = self._top(self.buy_limits)
+        if order is not None and low <= order.price:
+            heapq.heappop(self.buy_limits)
+            return order
+        return None
+
+    def has_resting(self):
+        return bool(self.sell_stops or self.sell_limits or self.buy_limits)
+
+
+def simulate_events(open_, high, low, close, decision_price, valid, entry, rules, capital,
+                    mode=SEQUENTIAL, sizing=SIZING_FLOOR, reset_on_exit=False, start=0, costs=DEFAULT_COSTS,
+                    entry_limit=None, state=None):
+    """
+    Backtest événementiel d'une stratégie décrite par ses conditions
+
+    Args:
+        open_, high, low, close: barres OHLC
+        decision_price: prix observé par la stratégie à la décision (taille de
+            l'ordre d'achat, prix de l'ordre limite)
+        valid: barres où la stratégie est active (indicateurs définis) ; les
+            autres barres ne font que valoriser la position
+        entry: signal d'achat par barre
+        rules: règles de sortie (type RULE_*, niveau, pourcentage de la
+            position vendu, type d'ordre, signal par barre pour RULE_SIGNAL) ;
+            les règles RULE_SIGNAL deviennent des ordres au marché, les
+            autres des ordres en attente
+        capital: capital de départ
+        mode: SEQUENTIAL ou EXCLUSIVE (voir engine.py)
+        sizing: SIZING_FLOOR ou SIZING_TRUNCATE
+        reset_on_exit: oublie le dernier achat et le plus haut après une vente
+        start: première barre simulée (les précédentes ne font que fournir
+            les valeurs précédentes des conditions)
+        costs: frais d'exécution (Costs)
+        entry_limit: achats en ordre limite à decision_price * entry_limit,
+            valable une barre, au lieu d'ordres au marché
+        state: état de fin d'une simulation précédente pour poursuivre
+            (ordres au marché et ordres d'achat limites du jour en attente compris)
+
+    Returns:
+        engine.Simulation : valeur du portefeuille à la clôture de chaque
+        barre ; state contient aussi les commissions et le glissement payés
+    """
+    n = len(close)
+    opens = np.asarray(open_, dtype=np.float64).tolist()
+    highs = np.asarray(high, dtype=np.float64).tolist()
+    lows = np.asarray(low, dtype=np.float64).tolist()
+    prices = np.asarray(decision_price, dtype=np.float64).tolist()
+    entry = np.asarray(entry, dtype=np.bool_) & np.asarray(valid, dtype=np.bool_)
+
+    signal_rules = [(r, rule) for r, rule in enumerate(rules) if rule[0] == RULE_SIGNAL]
+    exits = np.zeros(n, dtype=np.bool_)
+    for _, rule in signal_rules:
+        exits |= np.asarray(rule[4], dtype=np.bool_)
+    exits &= np.asarray(valid, dtype=np.bool_)
+    signals = [np.asarray(rule[4], dtype=np.bool_).tolist() for _, rule in signal_rules]
+    decide = (entry | exits).tolist()
+    protective = [(r, rule[0], float(rule[1]), float(rule[2]), int(rule[3]))
+                  for r, rule in enumerate(rules) if rule[0] != RULE_SIGNAL]
+
+    commission = costs.commission
+    slippage = costs.slippage_bps / 10000.0
+    exclusive = mode == EXCLUSIVE
+
+    state = state or {}
+    cash = float(state.get('cash', capital))
+    position = float(state.get('position', 0.0))
+    last_buy_price = float(state.get('last_buy_price', 0.0))
+    highest_price = float(state.get('highest_price', 0.0))
+    total_commission = float(state.get('commission', 0.0))
+    total_slippage = float(state.get('slippage', 0.0))
+
+    book = OrderBook()
+    day_orders = []   # ordres d'achat limites valables une barre
+    for kind, side, price, pct, order_type in state.get('pending', ()):
+        order = book.submit(kind, side, price, pct, order_type)
+        if kind == LIMIT and side == BUY:
+            day_orders.append(order)
+    armed = {}   # règle -> ordre de protection en attente
+
+    trades = []
+    fill_buy_price = np.zeros(n, dtype=np.float64)
+    fill_sell_price = np.zeros(n, dtype=np.float64)
+    fill_quantity = np.zeros(n, dtype=np.int64)
+    # Barres où la trésorerie / la position changent (valeur du portefeuille reconstituée à la fin)
+    change_index = [0]
+    change_cash = [cash]
+    change_position = [position]
+
+    def buy(i, reference, price):
+        nonlocal cash, position, last_buy_price, highest_price, total_commission, total_slippage
+        # Quantité estimée sur la commission de toute la trésorerie, ramenée à une quantité payable
+        budget = max(cash - commission(cash), 0.0)
+        if sizing == SIZING_FLOOR:
+            qty = budget // price
+        else:
+            qty = float(int(budget / price))
+        qty = commission.affordable(cash, price, qty)
+        if qty <= 0:
+            return False
+        fee = commission(qty * price)
+        cash -= qty * price + fee
+        position += qty
+        total_commission += fee
+        total_slippage += qty * (price - reference)
+        last_buy_price = highest_price = price
+        fill_buy_price[i] = price
+        fill_quantity[i] += int(qty)
+        trades.append((i, ACHAT, qty, price, cash))
+        return True
+
+    def sell(i, reference, price, pct, order_type):
+        nonlocal cash, position, last_buy_price, highest_price, total_commission, total_slippage
+        qty = float(int(position * pct / 100.0))
+        if qty <= 0:
+            return False
+        fee = commission(qty * price)
+        cash += qty * price - fee
+        position -= qty
+        total_commission += fee
+        total_slippage += qty * (reference - price)
+        if reset_on_exit:
+            last_buy_price = highest_price = 0.0
+        if order_type == VENTE:
+            fill_sell_price[i] = price
+        trades.append((i, order_type, qty, price, cash))
+        return True
+
+    def arm():
+        """Place, déplace ou annule les ordres de protection selon la position"""
+        for r, kind, level, pct, order_type in protective:
+            if position <= 0:
+                target = 0.0
+            elif kind == RULE_TRAILING_STOP:
+                target = highest_price * level
+            else:
+                target = last_buy_price * level
+            order = armed.get(r)
+            if order is not None and order.active and order.price == target:
+                continue
+            book.cancel(order)
+            if target > 0.0:
+                armed[r] = book.submit(LIMIT if kind == RULE_TAKE_PROFIT else STOP, SELL, target, pct,
+                                       order_type, rule=r)
+            else:
+                armed.pop(r, None)
+
+    # Barres d'achat possibles : sans position ni ordre en attente, on saute de l'une à la suivante
+    entries = np.flatnonzero(entry).tolist()
+    entry = entry.tolist()
+
+    i = max(int(start), 0) - 1
+    dirty = True   # ordres de protection à recalculer
+    while True:
+        i += 1
+        if position <= 0 and not (book.market or day_orders or book.sell_stops or book.sell_limits
+                                  or book.buy_limits):
+            k = bisect_left(entries, i)
+            if k == len(entries):
+                break
+            i = entries[k]
+        if i >= n:
+            break
+        traded = False
+
+        # ---- Ordres au marché décidés sur la barre précédente : ouverture ----
+        if book.market:
+            o = opens[i]
+            for order in book.market:
+                if order.side == BUY:
+                    traded |= buy(i, o, o * (1.0 + slippage))
+                else:
+                    traded |= sell(i, o, o * (1.0 - slippage), order.pct, order.order_type)
+                book.pool.release(order)
+            book.market.clear()
+
+        # ---- Ordres en attente déclenchés dans la barre ----
+        if protective and (traded or dirty):
+            arm()
+            dirty = False
+        if book.sell_stops or book.sell_limits or book.buy_limits:
+            lo, hi, o = lows[i], highs[i], opens[i]
+            fired = []
+            order = book.pop_triggered(lo, hi)
+            while order is not None:
+                if order.kind == STOP:
+                    reference = min(o, order.price)
+                    done = sell(i, reference, reference * (1.0 - slippage), order.pct, order.order_type)
+                elif order.side == SELL:
+                    done = sell(i, max(o, order.price), max(o, order.price), order.pct, order.order_type)
+                else:
+                    done = buy(i, min(o, order.price), min(o, order.price))
+                traded |= done
+                if order.rule >= 0:
+                    # Une exécution de protection par barre : réarmée à la barre suivante
+                    armed.pop(order.rule, None)
+                    fired.append(order)
+                    dirty = True
+                else:
+                    book.pool.release(order)
+                if done and protective and (position <= 0 or reset_on_exit):
+                    arm()
+                order = book.pop_triggered(lo, hi)
+            for order in fired:
+                book.pool.release(order)
+        if day_orders:
+            for order in day_orders:
+                book.cancel(order)
+            day_orders.clear()
+
+        # ---- Plus haut depuis l'achat (trailing stop des barres suivantes) ----
+        if position > 0:
+            if highs[i] > highest_price:
+                highest_price = highs[i]
+                dirty = True
+
+        # ---- Décisions de la barre : ordres pour la barre suivante ----
+        if decide[i]:
+            entered = False
+            if entry[i]:
+                entered = exclusive
+                p = prices[i]
+                if cash >= p:
+                    if entry_limit is None:
+                        book.submit(MARKET, BUY, 0.0, 100.0, ACHAT)
+                    else:
+                        day_orders.append(book.submit(LIMIT, BUY, p * entry_limit, 100.0, ACHAT))
+            if not entered and position > 0:
+                chosen = None
+                for (r, rule), signal in zip(signal_rules, signals):
+                    if signal[i]:
+                        chosen = rule
+                        if exclusive:
+                            break
+                if chosen is not None:
+                    book.submit(MARKET, SELL, 0.0, float(chosen[2]), int(chosen[3]))
+
+        if traded:
+            dirty = True
+            change_index.append(i)
+            change_cash.append(cash)
+            change_position.append(position)
+
+    # Valeur du portefeuille à la clôture : trésorerie et position propagées depuis le dernier changement
+    steps = np.searchsorted(np.asarray(change_index), np.arange(n), side='right') - 1
+    equity = (np.asarray(change_cash)[steps] +
+              np.asarray(change_position)[steps] * np.asarray(close, dtype=np.float64))
+
+    packed = np.empty(len(trades), dtype=TRADE_DTYPE)
+    if trades:
+        packed['index'], packed['order'], packed['quantity'], packed['price'], packed['cash'] = zip(*trades)
+    fills = np.empty(n, dtype=FILL_DTYPE)
+    fills['buy_price'] = fill_buy_price
+    fills['sell_price'] = fill_sell_price
+    fills['quantity'] = fill_quantity
+
+    end_state = {
+        'cash': cash, 'position': position, 'last_buy_price': last_buy_price,
+        'highest_price': highest_price, 'commission': total_commission, 'slippage': total_slippage,
+        'pending': [(o.kind, o.side, o.price, o.pct, o.order_type)
+                    for o in book.market + [order for order in day_orders if order.active]]
+    }
+    return Simulation(packed, equity, fills, cash, position, end_state)
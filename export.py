@@ -0,0 +1,104 @@
+"""
+Export des transactions en fichiers CSV, Parquet ou Excel
+
+Les fichiers sont produits par morceaux pour être envoyés en flux : le CSV
+est écrit bloc par bloc à partir des colonnes du journal, Parquet et Excel
+(openpyxl en mode écriture seule) passent par un fichier temporaire relu par
+blocs, sans jamais construire le fichier entier en mémoire.
+"""
+
+import tempfile
+
+from ledger import EXPORT_COLUMNS
+
+# Format -> (type MIME, extension) ; Flask ajoute le charset utf-8 aux types text/*
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx')
+}
+
+# Lignes par morceau (CSV, feuille Excel) et taille des blocs relus (Parquet, Excel)
+CHUNK_ROWS = 50000
+BLOCK_SIZE = 64 * 1024
+
+# Au-delà, le fichier temporaire passe de la mémoire au disque
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+
+def check_format(fmt):
+    """
+    Vérifie que le format est connu et que sa dépendance est installée
+
+    Raises:
+        ValueError: format inconnu ou indisponible
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Format d'export inconnu: {fmt} (formats: {', '.join(EXPORT_FORMATS)})")
+    try:
+        if fmt == 'parquet':
+            import pyarrow  # noqa: F401
+        elif fmt == 'xlsx':
+            import openpyxl  # noqa: F401
+    except ImportError:
+        package = 'pyarrow' if fmt == 'parquet' else 'openpyxl'
+        raise ValueError(f"Export {fmt} indisponible: {package} n'est pas installé")
+
+
+def _write_parquet(ledger, fileobj):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for start in range(0, max(len(ledger), 1), CHUNK_ROWS):
+            table = pa.Table.from_pandas(ledger.export_frame(start, start + CHUNK_ROWS), preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(fileobj, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _write_xlsx(ledger, fileobj):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Transactions')
+    sheet.append(EXPORT_COLUMNS)
+    for start in range(0, len(ledger), CHUNK_ROWS):
+        frame = ledger.export_frame(start, start + CHUNK_ROWS)
+        for row in zip(*(frame[column].tolist() for column in EXPORT_COLUMNS)):
+            sheet.append(row)
+    workbook.save(fileobj)
+
+
+def _iter_file(write, ledger):
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as fileobj:
+        write(ledger, fileobj)
+        fileobj.seek(0)
+        while True:
+            block = fileobj.read(BLOCK_SIZE)
+            if not block:
+                break
+            yield block
+
+
+def iter_export(ledger, fmt='csv'):
+    """
+    Contenu du fichier exporté, en morceaux d'octets
+
+    Args:
+        ledger: TradeLedger à exporter
+        fmt: 'csv', 'parquet' ou 'xlsx' (voir check_format)
+    """
+    if fmt == 'csv':
+        for text in ledger.iter_csv(chunk_rows=CHUNK_ROWS):
+            yield text.encode('utf-8')
+    elif fmt == 'parquet':
+        yield from _iter_file(_write_parquet, ledger)
+    elif fmt == 'xlsx':
+        yield from _iter_file(_write_xlsx, ledger)
+    else:
+        raise ValueError(f"Format d'export inconnu: {fmt}")
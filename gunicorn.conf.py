@@ -0,0 +1,54 @@
+"""
+Configuration gunicorn de l'API PyTrader (mode production)
+
+    pip install -r requirements-prod.txt
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Variables d'environnement :
+    PYTRADER_BIND      adresse d'écoute (0.0.0.0:5000)
+    PYTRADER_WORKERS   nombre de processus workers (1, voir ci-dessous)
+    PYTRADER_THREADS   threads par worker (4 par cœur, 8 au minimum)
+    PYTRADER_TIMEOUT   durée maximale d'une requête en secondes (120)
+
+Un seul worker par défaut : les tâches asynchrones (/api/jobs, export par
+jobId) et le cache des résultats (avec ses invalidations) sont en mémoire du
+processus. Avec plusieurs workers, une tâche n'est visible que du worker qui
+l'a créée et une invalidation ne touche pas les caches des autres. Les
+calculs lourds (balayages, walk-forward, Monte Carlo, screener) passent déjà
+par le pool de processus, qui occupe tous les cœurs ; les threads servent
+les requêtes concurrentes. Ne monter PYTRADER_WORKERS que derrière un
+répartiteur à affinité de session, en acceptant des résultats en cache
+périmés jusqu'à leur expiration dans les autres workers.
+"""
+
+import os
+
+cpu_count = os.cpu_count() or 1
+
+bind = os.environ.get('PYTRADER_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('PYTRADER_WORKERS', 1))
+threads = int(os.environ.get('PYTRADER_THREADS', max(8, 4 * cpu_count)))
+worker_class = 'gthread'
+timeout = int(os.environ.get('PYTRADER_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+# Import des modules (pandas, matplotlib, stratégies) une seule fois avant le fork
+preload_app = True
+
+# Chaque worker a son propre pool de processus de calcul : on partage les
+# cœurs entre workers plutôt que d'en lancer cpu_count par worker
+os.environ.setdefault('PYTRADER_MAX_WORKERS', str(max(1, cpu_count // max(1, workers))))
+
+accesslog = '-'
+errorlog = '-'
+
+
+def worker_exit(server, worker):
+    """Arrêt d'un worker : termine les analyses en cours et vide les caches"""
+    from api_server import shutdown_services
+    shutdown_services()
+
+
+def on_exit(server):
+    server.log.info("PyTrader API arrêtée")
@@ -0,0 +1,340 @@
+"""
+Bibliothèque d'indicateurs techniques et graphe de calcul mémoïsé
+
+Chaque indicateur (SMA, EMA, RSI, MACD, bandes de Bollinger) est identifié
+par une clé (nom, colonne source, paramètres). Un indicateur peut dépendre
+d'autres indicateurs : la ligne MACD des deux EMA, son signal de la ligne
+MACD, les bandes de Bollinger de la SMA et de l'écart-type glissant. Un
+IndicatorGraph résout les clés demandées en un graphe sans doublon et ne
+calcule chaque nœud qu'une fois : les stratégies composées et les balayages
+de paramètres partagent leurs fenêtres communes.
+
+Les formules sont celles de la bibliothèque ta (EMA et RSI de Wilder en
+lissage exponentiel non ajusté, écart-type de population pour Bollinger),
+réécrites en pandas / NumPy sans la dépendance.
+"""
+
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+
+from price_store import COLUMNS, add_update_listener
+
+# Clé d'un indicateur : params est un tuple trié de paires (nom, valeur)
+IndicatorKey = namedtuple('IndicatorKey', ['name', 'source', 'params'])
+
+# Définition : fonction de calcul, dépendances, paramètres par défaut et
+# historique propre nécessaire (fonction des paramètres, en barres)
+IndicatorSpec = namedtuple('IndicatorSpec', ['name', 'compute', 'depends', 'defaults', 'warmup'])
+
+INDICATORS = {}
+
+# Graphes conservés par symbole (voir indicator_graph)
+GRAPH_CACHE_SIZE = 32
+
+# Lissages exponentiels : au bout de EWM_WARMUP * span barres, le poids des
+# valeurs antérieures est négligeable ((1 - 2 / (span + 1)) ** (10 * span) < 1e-8)
+EWM_WARMUP = 10
+
+
+def register(name, defaults, depends=None, warmup=None):
+    """
+    Enregistre un indicateur
+
+    Args:
+        defaults: paramètres par défaut {nom: valeur}
+        depends: fonction (source, params) -> liste de clés dont les valeurs
+            sont passées à la fonction de calcul après la série source
+        warmup: fonction params -> barres d'historique dont l'indicateur a
+            besoin en plus de celles de ses dépendances (0 par défaut)
+
+    La fonction décorée reçoit (source, *dépendances, **params) et retourne
+    un tableau float64 de même longueur que la source.
+    """
+    def decorator(func):
+        INDICATORS[name] = IndicatorSpec(name, func, depends, dict(defaults), warmup)
+        return func
+    return decorator
+
+
+def indicator(name, source, **params):
+    """Clé canonique d'un indicateur (paramètres complétés par les défauts)"""
+    if name not in INDICATORS:
+        raise ValueError(f"Indicateur inconnu: {name} ({', '.join(sorted(INDICATORS))})")
+    spec = INDICATORS[name]
+    unknown = set(params) - set(spec.defaults)
+    if unknown:
+        raise ValueError(f"Paramètres inconnus pour {name}: {', '.join(sorted(unknown))}")
+    values = dict(spec.defaults, **params)
+    return IndicatorKey(name, source, tuple(sorted(values.items())))
+
+
+def sma(source, window):
+    return indicator('sma', source, window=int(window))
+
+
+def ema(source, span):
+    return indicator('ema', source, span=int(span))
+
+
+def rsi(source, window=14):
+    return indicator('rsi', source, window=int(window))
+
+
+def macd(source, fast=12, slow=26, signal=9, line='macd'):
+    """Clé de la ligne MACD ('macd'), de son signal ('signal') ou de l'histogramme ('hist')"""
+    names = {'macd': 'macd', 'signal': 'macd_signal', 'hist': 'macd_hist'}
+    return indicator(names[line], source, fast=int(fast), slow=int(slow), signal=int(signal))
+
+
+def bollinger(source, window=20, k=2.0, band='upper'):
+    """Clé de la bande haute ('upper'), basse ('lower') ou centrale ('mid', la SMA)"""
+    if band == 'mid':
+        return sma(source, window)
+    return indicator(f'bb_{band}', source, window=int(window), k=float(k))
+
+
+# ---------------------------------------------------------------------------
+# Indicateurs
+# ---------------------------------------------------------------------------
+
+def _series(values):
+    return pd.Series(values, copy=False)
+
+
+@register('sma', {'window': 20}, warmup=lambda params: params['window'])
+def _sma(source, window):
+    return _series(source).rolling(window=window).mean().to_numpy()
+
+
+@register('ema', {'span': 12}, warmup=lambda params: EWM_WARMUP * params['span'])
+def _ema(source, span):
+    return _series(source).ewm(span=span, min_periods=span, adjust=False).mean().to_numpy()
+
+
+@register('rolling_std', {'window': 20}, warmup=lambda params: params['window'])
+def _rolling_std(source, window):
+    return _series(source).rolling(window=window).std(ddof=0).to_numpy()
+
+
+@register('rsi', {'window': 14}, warmup=lambda params: EWM_WARMUP * params['window'] + 1)
+def _rsi(source, window):
+    diff = _series(source).diff()
+    up = diff.where(diff > 0, 0.0).ewm(alpha=1.0 / window, min_periods=window, adjust=False).mean().to_numpy()
+    down = (-diff.where(diff < 0, 0.0)).ewm(alpha=1.0 / window, min_periods=window, adjust=False).mean().to_numpy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        values = 100.0 - 100.0 / (1.0 + up / down)
+    return np.where(down == 0.0, 100.0, values)
+
+
+def _macd_params(params):
+    return params['fast'], params['slow'], params['signal']
+
+
+@register('macd', {'fast': 12, 'slow': 26, 'signal': 9},
+          depends=lambda source, params: [ema(source, params['fast']), ema(source, params['slow'])])
+def _macd(source, ema_fast, ema_slow, fast, slow, signal):
+    return ema_fast - ema_slow
+
+
+@register('macd_signal', {'fast': 12, 'slow': 26, 'signal': 9},
+          depends=lambda source, params: [macd(source, *_macd_params(params))],
+          warmup=lambda params: EWM_WARMUP * params['signal'])
+def _macd_signal(source, line, fast, slow, signal):
+    return _series(line).ewm(span=signal, min_periods=signal, adjust=False).mean().to_numpy()
+
+
+@register('macd_hist', {'fast': 12, 'slow': 26, 'signal': 9},
+          depends=lambda source, params: [macd(source, *_macd_params(params)),
+                                          macd(source, *_macd_params(params), line='signal')])
+def _macd_hist(source, line, signal_line, fast, slow, signal):
+    return line - signal_line
+
+
+def _bollinger_depends(source, params):
+    return [sma(source, params['window']), indicator('rolling_std', source, window=params['window'])]
+
+
+@register('bb_upper', {'window': 20, 'k': 2.0}, depends=_bollinger_depends)
+def _bb_upper(source, mid, std, window, k):
+    return mid + k * std
+
+
+@register('bb_lower', {'window': 20, 'k': 2.0}, depends=_bollinger_depends)
+def _bb_lower(source, mid, std, window, k):
+    return mid - k * std
+
+
+# ---------------------------------------------------------------------------
+# Graphe de calcul
+# ---------------------------------------------------------------------------
+
+def dependencies(key):
+    """Clés dont dépend le calcul de key"""
+    spec = INDICATORS[key.name]
+    return spec.depends(key.source, dict(key.params)) if spec.depends else []
+
+
+def plan(keys):
+    """Nœuds à calculer pour obtenir keys, sans doublon, dépendances en premier"""
+    order = []
+    seen = set()
+
+    def visit(key):
+        if key in seen:
+            return
+        seen.add(key)
+        for dependency in dependencies(key):
+            visit(dependency)
+        order.append(key)
+
+    for key in keys:
+        visit(key)
+    return order
+
+
+def warmup(key):
+    """
+    Barres d'historique nécessaires pour que la valeur de key sur une barre
+    soit celle d'un calcul sur toute la série (à la précision des lissages
+    exponentiels près, voir EWM_WARMUP)
+    """
+    spec = INDICATORS[key.name]
+    own = spec.warmup(dict(key.params)) if spec.warmup else 0
+    return own + max((warmup(dependency) for dependency in dependencies(key)), default=0)
+
+
+class IndicatorGraph:
+    """
+    Indicateurs calculés à la demande sur un ensemble de séries, chacun une seule fois
+
+    Args:
+        columns: {nom de colonne: valeurs} (DataFrame accepté)
+        values: indicateurs déjà calculés {clé: valeurs} (ex : publiés dans un
+            segment partagé par le processus parent)
+    """
+
+    def __init__(self, columns, values=None):
+        self._columns = columns
+        self._sources = {}
+        self._values = dict(values or {})
+        self._lock = threading.Lock()
+        self.computed = 0
+
+    def __len__(self):
+        return len(self._values)
+
+    def source(self, name):
+        """Série source name en float64"""
+        values = self._sources.get(name)
+        if values is None:
+            values = self._sources[name] = np.asarray(self._columns[name], dtype=np.float64)
+        return values
+
+    def get(self, key):
+        """Valeurs de l'indicateur key (calculé avec ses dépendances s'il ne l'a pas déjà été)"""
+        values = self._values.get(key)
+        if values is not None:
+            return values
+        with self._lock:
+            for node in plan([key]):
+                if node not in self._values:
+                    spec = INDICATORS[node.name]
+                    inputs = [self._values[dependency] for dependency in dependencies(node)]
+                    values = spec.compute(self.source(node.source), *inputs, **dict(node.params))
+                    # Partagé entre appelants : en lecture seule
+                    values.setflags(write=False)
+                    self._values[node] = values
+                    self.computed += 1
+        return self._values[key]
+
+    def compute(self, requests):
+        """
+        Résout un ensemble d'indicateurs
+
+        Args:
+            requests: {nom: clé} (ex : déclaration d'une stratégie)
+
+        Returns:
+            {nom: valeurs}
+        """
+        return {name: self.get(key) for name, key in requests.items()}
+
+    def window(self, start, stop):
+        """Tranche [start, stop) du graphe (voir GraphWindow)"""
+        return GraphWindow(self, start, stop)
+
+
+class GraphWindow:
+    """
+    Tranche d'un IndicatorGraph : sources et indicateurs sont calculés (et
+    mémoïsés) sur toute la série puis découpés, sans copie ; les indicateurs
+    de la tranche profitent ainsi de l'historique qui la précède
+    """
+
+    def __init__(self, graph, start, stop):
+        self._graph = graph
+        self._slice = slice(start, stop)
+
+    def source(self, name):
+        return self._graph.source(name)[self._slice]
+
+    def get(self, key):
+        return self._graph.get(key)[self._slice]
+
+    def compute(self, requests):
+        return {name: self.get(key) for name, key in requests.items()}
+
+    def window(self, start, stop):
+        offset = self._slice.start
+        return GraphWindow(self._graph, offset + start, offset + stop)
+
+
+def _frozen(series):
+    """Valeurs de series en float64 : vue sur le segment partagé, copie si le tableau est modifiable"""
+    values = series.to_numpy(dtype=np.float64)
+    return values.copy() if values.flags.writeable else values
+
+
+class GraphCache:
+    """Graphes d'indicateurs des derniers symboles analysés, invalidés à l'arrivée de nouvelles barres"""
+
+    def __init__(self, max_entries=GRAPH_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._graphs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, symbol, interval, frame):
+        """
+        Graphe des colonnes de frame (barres de symbol renvoyées par load_prices),
+        réutilisé tant que la même plage de barres est demandée
+        """
+        dates = frame['Date']
+        key = (symbol, interval, len(frame),
+               dates.iloc[0] if len(frame) else None, dates.iloc[-1] if len(frame) else None)
+        with self._lock:
+            graph = self._graphs.get(key)
+            if graph is not None:
+                self._graphs.move_to_end(key)
+                return graph
+            graph = IndicatorGraph({column: _frozen(frame[column]) for column in COLUMNS})
+            self._graphs[key] = graph
+            while len(self._graphs) > self.max_entries:
+                self._graphs.popitem(last=False)
+            return graph
+
+    def invalidate_symbol(self, symbol, interval=None):
+        with self._lock:
+            for key in [k for k in self._graphs if k[0] == symbol and interval in (None, k[1])]:
+                del self._graphs[key]
+
+
+graph_cache = GraphCache()
+add_update_listener(graph_cache.invalidate_symbol)
+
+
+def indicator_graph(symbol, interval, frame):
+    """Graphe d'indicateurs partagé des barres de symbol (voir GraphCache)"""
+    return graph_cache.get(symbol, interval, frame)
@@ -0,0 +1,371 @@
+"""
+Barres intraday (1m, 5m...) sur disque et backtests en flux
+
+Un historique intraday compte des millions de barres par symbole. Les barres
+sont rangées par mois, une colonne .npy par champ (float32 ou float64) lue en
+mémoire mappée. Elles sont complétées tranche par tranche auprès du
+fournisseur (voir price_store.FETCH_SPANS) ou importées depuis des fichiers
+CSV locaux, ce qui permet de travailler hors ligne.
+
+Les backtests parcourent les partitions une à une. Les indicateurs sont
+prolongés à partir des dernières barres des partitions précédentes (voir
+StrategySpec.warmup) et l'état du moteur événementiel (liquidités, position,
+dernier achat, ordres en attente, frais payés) passe d'une partition à la
+suivante : l'historique n'est jamais chargé en entier dans un DataFrame.
+
+    python intraday.py import AAPL AAPL_1m.csv --interval 1m
+    python intraday.py run AAPL 2024-01-01 2024-07-01 --strategy USA --interval 1m --offline
+"""
+
+import argparse
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from downsample import downsample_indices
+from ledger import TradeLedger
+from indicators import IndicatorGraph
+from price_store import (COLUMNS, DEFAULT_CACHE_DIR, YahooProvider, _merge_ranges, _missing_ranges,
+                         normalize_bars, split_range)
+from strategies import available_strategies, get_strategy
+
+DEFAULT_INTRADAY_DIR = os.environ.get('PYTRADER_INTRADAY_DIR', os.path.join(DEFAULT_CACHE_DIR, 'intraday'))
+
+# Type des colonnes de prix sur disque : float32 divise la taille par deux
+DEFAULT_DTYPE = os.environ.get('PYTRADER_INTRADAY_DTYPE', 'float64')
+
+# Hors ligne : seules les barres déjà présentes sur disque sont utilisées
+OFFLINE = os.environ.get('PYTRADER_OFFLINE', '0') == '1'
+
+INTERVALS = ('1m', '2m', '5m', '15m', '30m', '60m', '90m', '1h')
+
+# Points de la courbe de valeur conservés par partition (mois)
+CURVE_POINTS_PER_PARTITION = 64
+
+
+def check_interval(interval):
+    """
+    Raises:
+        ValueError: intervalle non intraday
+    """
+    if interval not in INTERVALS:
+        raise ValueError(f"Intervalle intraday inconnu: {interval} (intervalles: {', '.join(INTERVALS)})")
+
+
+class BarStore:
+    """
+    Barres intraday d'un répertoire, une partition par (intervalle, symbole, mois) :
+    <interval>/<symbole>/<AAAA-MM>/dates.npy (datetime64[ns]) et une colonne
+    .npy par champ OHLCV ; <interval>/<symbole>/meta.json liste les plages
+    couvertes et les partitions.
+
+    Args:
+        root: répertoire des barres
+        provider: source des barres manquantes (YahooProvider par défaut)
+        dtype: 'float32' ou 'float64', pour les nouveaux symboles
+        offline: ne jamais interroger le fournisseur
+    """
+
+    def __init__(self, root=DEFAULT_INTRADAY_DIR, provider=None, dtype=DEFAULT_DTYPE, offline=OFFLINE):
+        self.root = root
+        self.provider = provider
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.float32, np.float64):
+            raise ValueError(f"Type de colonne non supporté: {dtype} (float32 ou float64)")
+        self.offline = offline
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {'root': self.root, 'provider': self.provider, 'dtype': self.dtype.name,
+                'offline': self.offline}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _symbol_dir(self, symbol, interval):
+        safe_symbol = symbol.replace('/', '_').replace('\\', '_')
+        return os.path.join(self.root, interval, safe_symbol)
+
+    def _read_meta(self, symbol, interval):
+        meta_path = os.path.join(self._symbol_dir(symbol, interval), 'meta.json')
+        if not os.path.exists(meta_path):
+            return {'dtype': self.dtype.name, 'coverage': [], 'partitions': []}
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        meta['coverage'] = [(pd.Timestamp(a), pd.Timestamp(b)) for a, b in meta['coverage']]
+        return meta
+
+    def _write_meta(self, symbol, interval, meta):
+        directory = self._symbol_dir(symbol, interval)
+        os.makedirs(directory, exist_ok=True)
+        content = {
+            'symbol': symbol,
+            'interval': interval,
+            'dtype': meta['dtype'],
+            'coverage': [[a.isoformat(), b.isoformat()] for a, b in meta['coverage']],
+            'partitions': sorted(meta['partitions'])
+        }
+        tmp_path = os.path.join(directory, 'meta.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(content, f)
+        os.replace(tmp_path, os.path.join(directory, 'meta.json'))
+
+    def _read_partition(self, symbol, interval, month, columns=COLUMNS, mmap_mode='r'):
+        directory = os.path.join(self._symbol_dir(symbol, interval), month)
+        dates = np.load(os.path.join(directory, 'dates.npy'), mmap_mode=mmap_mode)
+        return dates, {column: np.load(os.path.join(directory, f'{column}.npy'), mmap_mode=mmap_mode)
+                       for column in columns}
+
+    def _write_partition(self, symbol, interval, month, frame, dtype):
+        directory = os.path.join(self._symbol_dir(symbol, interval), month)
+        os.makedirs(directory, exist_ok=True)
+
+        # Écriture dans des fichiers temporaires puis remplacement atomique
+        arrays = {'dates': frame.index.values.astype('datetime64[ns]')}
+        arrays.update({column: frame[column].to_numpy(dtype=dtype) for column in COLUMNS})
+        for name, values in arrays.items():
+            tmp_path = os.path.join(directory, f'{name}.tmp.npy')
+            np.save(tmp_path, values)
+            os.replace(tmp_path, os.path.join(directory, f'{name}.npy'))
+
+    def _merge(self, symbol, interval, meta, bars):
+        """Fusionne des barres normalisées dans les seules partitions mensuelles qu'elles touchent"""
+        if bars.empty:
+            return
+        bars = bars[~bars.index.duplicated(keep='last')]
+        months = bars.index.values.astype('datetime64[M]')
+        bounds = np.flatnonzero(np.r_[True, months[1:] != months[:-1], True])
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            month = str(months[lo])
+            group = bars.iloc[lo:hi]
+            if month in meta['partitions']:
+                dates, columns = self._read_partition(symbol, interval, month, mmap_mode=None)
+                existing = pd.DataFrame(columns, index=pd.DatetimeIndex(dates, name='Date'))
+                group = pd.concat([existing.astype('float64'), group])
+                group = group[~group.index.duplicated(keep='last')].sort_index()
+            else:
+                meta['partitions'].append(month)
+            self._write_partition(symbol, interval, month, group, meta['dtype'])
+
+    def ensure(self, symbol, start_date, end_date, interval='5m'):
+        """
+        Complète le stockage pour [start_date, end_date), tranche par tranche ;
+        les métadonnées sont enregistrées après chaque tranche, si bien qu'un
+        téléchargement interrompu reprend là où il s'est arrêté
+
+        Returns:
+            list: plages restées absentes (mode hors ligne)
+        """
+        check_interval(interval)
+        start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+
+        with self._lock:
+            meta = self._read_meta(symbol, interval)
+            missing = _missing_ranges(meta['coverage'], start, end)
+            if not missing or self.offline:
+                return missing
+
+            provider = self.provider if self.provider is not None else YahooProvider()
+            # La journée en cours n'est jamais marquée comme couverte : ses barres ne sont pas définitives
+            horizon = pd.Timestamp.today().normalize()
+            for range_start, range_end in missing:
+                for chunk_start, chunk_end in split_range(range_start, range_end, interval):
+                    bars = normalize_bars(provider.fetch(symbol, chunk_start, chunk_end, interval))
+                    # Tranche vide (erreur réseau, limite de débit) : non couverte, redemandée plus tard
+                    if bars.empty:
+                        continue
+                    self._merge(symbol, interval, meta, bars.sort_index())
+                    covered_end = min(chunk_end, horizon)
+                    if covered_end > chunk_start:
+                        meta['coverage'] = _merge_ranges(meta['coverage'] + [(chunk_start, covered_end)])
+                    self._write_meta(symbol, interval, meta)
+        return []
+
+    def import_frame(self, symbol, frame, interval='5m'):
+        """
+        Ajoute des barres locales (colonne Date ou Datetime et colonnes OHLCV)
+
+        Returns:
+            int: nombre de barres importées
+        """
+        check_interval(interval)
+        bars = normalize_bars(frame)
+        if bars.empty:
+            return 0
+        with self._lock:
+            meta = self._read_meta(symbol, interval)
+            self._merge(symbol, interval, meta, bars)
+            covered = (bars.index[0], bars.index[-1] + pd.Timedelta(interval))
+            meta['coverage'] = _merge_ranges(meta['coverage'] + [covered])
+            self._write_meta(symbol, interval, meta)
+        return len(bars)
+
+    def import_csv(self, symbol, path, interval='5m', chunksize=500000):
+        """Importe un fichier CSV de barres par morceaux de chunksize lignes"""
+        total = 0
+        for frame in pd.read_csv(path, chunksize=chunksize):
+            total += self.import_frame(symbol, frame, interval)
+        return total
+
+    def iter_chunks(self, symbol, start_date, end_date, interval='5m', columns=COLUMNS):
+        """
+        Parcourt les barres de [start_date, end_date) partition par partition
+
+        Yields:
+            (dates, {colonne: valeurs}) : vues en mémoire mappée, non recopiées
+        """
+        start = np.datetime64(pd.Timestamp(start_date), 'ns')
+        end = np.datetime64(pd.Timestamp(end_date), 'ns')
+        first_month, last_month = start.astype('datetime64[M]'), end.astype('datetime64[M]')
+        meta = self._read_meta(symbol, interval)
+        for month in sorted(meta['partitions']):
+            if not first_month <= np.datetime64(month, 'M') <= last_month:
+                continue
+            dates, values = self._read_partition(symbol, interval, month, columns)
+            lo, hi = np.searchsorted(dates, start), np.searchsorted(dates, end)
+            if hi > lo:
+                yield dates[lo:hi], {column: column_values[lo:hi] for column, column_values in values.items()}
+
+    def count(self, symbol, start_date, end_date, interval='5m'):
+        """Nombre de barres stockées dans [start_date, end_date)"""
+        return sum(len(dates) for dates, _ in self.iter_chunks(symbol, start_date, end_date, interval, ()))
+
+
+_default_store = None
+
+
+def get_bar_store():
+    """Retourne le stockage intraday partagé par le processus"""
+    global _default_store
+    if _default_store is None:
+        _default_store = BarStore()
+    return _default_store
+
+
+def set_bar_store(store):
+    """Remplace le stockage partagé (ex : BarStore hors ligne sur un répertoire de fixtures)"""
+    global _default_store
+    _default_store = store
+
+
+def run_intraday(symbol, start_date, end_date, strategy, interval='5m', params=None, store=None):
+    """
+    Backtest d'une stratégie sur des barres intraday, partition par partition,
+    avec le moteur événementiel de /api/analyze (StrategySpec.backtest)
+
+    Args:
+        strategy: nom d'une stratégie enregistrée (voir strategies.available_strategies)
+        params: paramètres remplaçant ceux de la stratégie
+        store: BarStore (stockage partagé par défaut)
+
+    Returns:
+        dict: résultats (capital, actions restantes, journal, drawdown) et
+        courbe de valeur réduite à CURVE_POINTS_PER_PARTITION points par mois
+    """
+    spec = get_strategy(strategy)
+    check_interval(interval)
+    params = spec.params(params)
+    capital = spec.capital
+    # Barres précédentes qui prolongent les indicateurs et les conditions d'une partition à la suivante
+    history = spec.warmup(params)
+
+    store = store if store is not None else get_bar_store()
+    store.ensure(symbol, start_date, end_date, interval)
+
+    ledger = TradeLedger(symbol)
+    state = None
+    tail = {column: np.empty(0, dtype=np.float64) for column in COLUMNS}
+    peak, worst = np.nan, 0.0
+    n_bars = 0
+    curve_dates, curve_equity = [], []
+
+    for dates, columns in store.iter_chunks(symbol, start_date, end_date, interval, COLUMNS):
+        # Les dernières barres des partitions précédentes servent d'historique ;
+        # la simulation reprend à la première barre de la partition
+        extended = {column: np.concatenate([tail[column], np.asarray(columns[column], dtype=np.float64)])
+                    for column in COLUMNS}
+        offset = len(tail['Close'])
+        simulation = spec.backtest(IndicatorGraph(extended), params, state=state,
+                                   start=None if state is None else offset)
+
+        trades = simulation.trades
+        if len(trades):
+            ledger.extend(dates[trades['index'] - offset], trades['order'], trades['quantity'],
+                          trades['price'], trades['cash'])
+
+        equity = simulation.equity[offset:]
+        running_peak = np.fmax.accumulate(np.r_[peak, equity])[1:]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            drawdown = 1.0 - equity / running_peak
+        if np.any(~np.isnan(drawdown)):
+            worst = max(worst, float(np.nanmax(drawdown)))
+        peak = running_peak[-1]
+
+        keep = (downsample_indices(equity, CURVE_POINTS_PER_PARTITION)
+                if len(equity) > CURVE_POINTS_PER_PARTITION else np.arange(len(equity)))
+        curve_dates.append(np.asarray(dates[keep]))
+        curve_equity.append(equity[keep])
+
+        state = simulation.state
+        tail = {column: values[len(values) - min(history, len(values)):] for column, values in extended.items()}
+        n_bars += len(dates)
+
+    if state is None:
+        raise ValueError(f"Aucune barre {interval} trouvée pour {symbol}")
+
+    equity = np.concatenate(curve_equity)
+    return {
+        'symbol': symbol,
+        'interval': interval,
+        'final_capital': int(state['cash']),
+        'shares_remaining': int(state['position']),
+        'initial_capital': capital,
+        'final_equity': float(equity[-1]),
+        'max_drawdown': worst,
+        'number_of_bars': n_bars,
+        'ledger': ledger,
+        'equity_dates': np.concatenate(curve_dates),
+        'equity': equity
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Barres intraday : import de fichiers locaux et backtests")
+    parser.add_argument('--root', default=DEFAULT_INTRADAY_DIR, help="répertoire des barres")
+    parser.add_argument('--dtype', default=DEFAULT_DTYPE, choices=['float32', 'float64'])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = commands.add_parser('import', help="importer un fichier CSV (Date/Datetime + OHLCV)")
+    import_parser.add_argument('symbol')
+    import_parser.add_argument('path')
+    import_parser.add_argument('--interval', default='5m', choices=INTERVALS)
+
+    run_parser = commands.add_parser('run', help="backtest d'une stratégie")
+    run_parser.add_argument('symbol')
+    run_parser.add_argument('start')
+    run_parser.add_argument('end')
+    run_parser.add_argument('--strategy', default='USA', choices=available_strategies())
+    run_parser.add_argument('--interval', default='5m', choices=INTERVALS)
+    run_parser.add_argument('--offline', action='store_true', help="n'utiliser que les barres locales")
+
+    args = parser.parse_args(argv)
+    if args.command == 'import':
+        store = BarStore(args.root, dtype=args.dtype)
+        count = store.import_csv(args.symbol, args.path, args.interval)
+        print(f"📥 {count} barres {args.interval} importées pour {args.symbol}")
+    else:
+        store = BarStore(args.root, dtype=args.dtype, offline=args.offline or OFFLINE)
+        result = run_intraday(args.symbol, args.start, args.end, args.strategy, args.interval, store=store)
+        capital = result['initial_capital']
+        print(f"📊 {args.symbol} {args.interval} ({args.strategy}) : {result['number_of_bars']} barres, "
+              f"{len(result['ledger'])} transactions")
+        print(f"   Valeur finale: {result['final_equity']:.2f} "
+              f"({(result['final_equity'] - capital) / capital * 100:.1f}%), "
+              f"drawdown max: {result['max_drawdown'] * 100:.1f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""
+File de tâches asynchrones pour les analyses longues
+
+Une analyse soumise reçoit un identifiant et s'exécute dans un pool de
+threads borné ; le client interroge ensuite son état puis récupère le
+résultat. Les demandes identiques déjà en cours sont regroupées sur une
+seule tâche, et la file refuse les nouvelles soumissions lorsqu'elle est
+pleine (contre-pression).
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+ERROR = 'error'
+CANCELLED = 'cancelled'
+
+FINISHED_STATES = (DONE, ERROR, CANCELLED)
+
+
+class JobQueueFull(Exception):
+    """La file a atteint sa capacité : le client doit réessayer plus tard"""
+
+
+class Job:
+    """Une analyse soumise à la file"""
+
+    def __init__(self, key, params):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.params = params
+        self.status = PENDING
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+
+    def to_dict(self):
+        return {
+            'jobId': self.id,
+            'status': self.status,
+            'params': self.params,
+            'error': self.error,
+            'submittedAt': self.submitted_at,
+            'startedAt': self.started_at,
+            'finishedAt': self.finished_at
+        }
+
+
+class JobManager:
+    """
+    Exécute les tâches dans un pool de threads borné
+
+    Args:
+        runner: fonction appelée avec les paramètres de la tâche (**params)
+        max_workers: nombre d'analyses simultanées
+        max_pending: nombre maximal de tâches en attente ou en cours
+        retention: durée de conservation des tâches terminées (secondes)
+    """
+
+    def __init__(self, runner, max_workers=4, max_pending=32, retention=600):
+        self.runner = runner
+        self.max_pending = max_pending
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pytrader-job')
+        self._jobs = {}
+        self._inflight = {}   # clé de la demande -> tâche en attente ou en cours
+        self._lock = threading.Lock()
+
+    def _purge(self):
+        limit = time.time() - self.retention
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.status in FINISHED_STATES and job.finished_at < limit]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def submit(self, key, params):
+        """
+        Soumet une analyse, ou rattache la demande à une tâche identique en cours
+
+        Returns:
+            tuple: (tâche, True si une tâche existante a été réutilisée)
+
+        Raises:
+            JobQueueFull: trop de tâches en attente ou en cours
+        """
+        with self._lock:
+            self._purge()
+
+            existing = self._inflight.get(key)
+            if existing is not None:
+                return existing, True
+
+            if len(self._inflight) >= self.max_pending:
+                raise JobQueueFull(f"File pleine ({self.max_pending} analyses en cours)")
+
+            job = Job(key, params)
+            self._jobs[job.id] = job
+            self._inflight[key] = job
+            job.future = self._executor.submit(self._run, job)
+            return job, False
+
+    def _run(self, job):
+        with self._lock:
+            if job.status == CANCELLED:
+                return
+            job.status = RUNNING
+            job.started_at = time.time()
+
+        try:
+            result = self.runner(**job.params)
+            status, error = DONE, None
+        except Exception as e:
+            result, status, error = None, ERROR, str(e)
+
+        with self._lock:
+            job.result = result
+            job.status = status
+            job.error = error
+            job.finished_at = time.time()
+            self._inflight.pop(job.key, None)
+
+    def get(self, job_id):
+        """Retourne la tâche job_id, ou None si elle est inconnue ou expirée"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """
+        Annule une tâche qui n'a pas encore démarré
+
+        Returns:
+            bool: True si la tâche est (ou était déjà) annulée
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            if job.status == CANCELLED:
+                return True
+            if job.status != PENDING:
+                return False
+            job.future.cancel()
+            job.status = CANCELLED
+            job.finished_at = time.time()
+            self._inflight.pop(job.key, None)
+            return True
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {'inflight': len(self._inflight), 'capacity': self.max_pending, 'jobs': counts}
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,243 @@
+"""
+Journal des transactions en colonnes typées
+
+Chaque champ (date, type d'ordre, symbole, quantité, prix, solde) est un
+tableau NumPy agrandi par doublement : un ajout coûte O(1) amorti, sans
+DataFrame recopié ni dict par ligne. Les exports (DataFrame, Arrow, JSON du
+frontend, CSV) travaillent directement sur les colonnes.
+"""
+
+import io
+from enum import IntEnum
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow est optionnel : seul to_arrow() en dépend
+    pa = None
+
+
+class OrderType(IntEnum):
+    """Type d'ordre (stocké sur un octet dans le journal)"""
+    ACHAT = 0
+    VENTE = 1
+    STOP_LOSS = 2
+    TAKE_PROFIT = 3
+
+    @property
+    def label(self):
+        return ORDER_LABELS[self]
+
+
+ORDER_LABELS = ('Achat', 'Vente', 'StopLoss', 'TakeProfit')
+
+# Colonnes historiques du fichier Excel
+LEDGER_COLUMNS = ['Date', 'Ordre', 'Valeur', 'Quantite', 'Prix', 'Solde restant']
+
+# Colonnes des fichiers exportés (CSV, Parquet, Excel)
+EXPORT_COLUMNS = ['Date', 'Action', 'Prix', 'Quantité', 'Capital']
+CSV_HEADER = ','.join(EXPORT_COLUMNS) + '\n'
+
+_FIELDS = (
+    ('date', 'datetime64[ns]'),
+    ('order', np.int8),
+    ('symbol', np.int32),     # indice dans TradeLedger.symbols
+    ('quantity', np.int64),
+    ('price', np.float64),
+    ('cash', np.float64)      # solde restant après l'ordre
+)
+
+
+class TradeLedger:
+    """
+    Journal des transactions d'une analyse
+
+    Args:
+        symbols: symbole unique (str) ou liste des symboles du journal
+        capacity: taille initiale des colonnes
+    """
+
+    def __init__(self, symbols=(), capacity=16):
+        self.symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+        self._size = 0
+        self._columns = {name: np.empty(max(1, capacity), dtype=dtype) for name, dtype in _FIELDS}
+
+    @classmethod
+    def from_trades(cls, trades, dates, symbol):
+        """Journal construit en bloc à partir des tableaux TRADE_DTYPE des moteurs (voir engine.py)"""
+        ledger = cls(symbol, capacity=len(trades))
+        ledger.extend(np.asarray(dates, dtype='datetime64[ns]')[trades['index']], trades['order'],
+                      trades['quantity'], trades['price'], trades['cash'])
+        return ledger
+
+    @classmethod
+    def from_records(cls, records, symbol=''):
+        """Journal reconstruit à partir des transactions au format du frontend (voir to_records)"""
+        records = list(records)
+        ledger = cls(symbol, capacity=len(records))
+        if records:
+            ledger.extend(
+                np.array([r['date'] for r in records], dtype='datetime64[ns]'),
+                np.array([OrderType.ACHAT if r['action'] == 'Achat' else OrderType.VENTE
+                          for r in records], dtype=np.int8),
+                np.array([r['quantity'] for r in records], dtype=np.int64),
+                np.array([r['price'] for r in records], dtype=np.float64),
+                np.array([r['capital'] for r in records], dtype=np.float64)
+            )
+        return ledger
+
+    def __len__(self):
+        return self._size
+
+    def __getstate__(self):
+        # Seule la partie remplie des colonnes est sérialisée (cache, processus)
+        return {'symbols': self.symbols, 'columns': self.columns()}
+
+    def __setstate__(self, state):
+        self.symbols = state['symbols']
+        self._columns = {name: np.array(values) for name, values in state['columns'].items()}
+        self._size = len(self._columns['order'])
+        if self._size == 0:
+            self._columns = {name: np.empty(1, dtype=dtype) for name, dtype in _FIELDS}
+
+    def _reserve(self, extra):
+        needed = self._size + extra
+        capacity = len(self._columns['order'])
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name, column in self._columns.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._columns[name] = grown
+
+    def _symbol_code(self, symbol):
+        if symbol is None:
+            if len(self.symbols) != 1:
+                raise ValueError("Symbole obligatoire pour un journal multi-symboles")
+            return 0
+        if symbol not in self.symbols:
+            self.symbols.append(symbol)
+        return self.symbols.index(symbol)
+
+    def append(self, date, order, quantity, price, cash, symbol=None):
+        """Ajoute une transaction (O(1) amorti)"""
+        self._reserve(1)
+        k = self._size
+        columns = self._columns
+        columns['date'][k] = np.datetime64(pd.Timestamp(date), 'ns')
+        columns['order'][k] = int(order)
+        columns['symbol'][k] = self._symbol_code(symbol)
+        columns['quantity'][k] = quantity
+        columns['price'][k] = price
+        columns['cash'][k] = cash
+        self._size += 1
+
+    def extend(self, dates, orders, quantities, prices, cash, symbols=None):
+        """
+        Ajoute un bloc de transactions
+
+        Args:
+            symbols: codes (indices dans self.symbols) par transaction ; le
+                symbole unique du journal si absent
+        """
+        n = len(orders)
+        self._reserve(n)
+        k = self._size
+        columns = self._columns
+        columns['date'][k:k + n] = dates
+        columns['order'][k:k + n] = orders
+        columns['symbol'][k:k + n] = self._symbol_code(None) if symbols is None else symbols
+        columns['quantity'][k:k + n] = quantities
+        columns['price'][k:k + n] = prices
+        columns['cash'][k:k + n] = cash
+        self._size += n
+
+    def column(self, name):
+        """Vue (sans copie) de la partie remplie d'une colonne"""
+        return self._columns[name][:self._size]
+
+    def columns(self):
+        return {name: self.column(name) for name, _ in _FIELDS}
+
+    # ------------------------------------------------------------------
+    # Exports
+    # ------------------------------------------------------------------
+
+    def _categorical(self, codes, categories):
+        return pd.Categorical.from_codes(codes, categories=categories, validate=False)
+
+    def to_frame(self, start=0, stop=None):
+        """
+        DataFrame aux colonnes historiques (Date, Ordre, Valeur, Quantite, Prix,
+        Solde restant) ; les colonnes numériques ne sont pas recopiées
+        """
+        stop = self._size if stop is None else min(stop, self._size)
+        columns = {name: column[start:stop] for name, column in self.columns().items()}
+        return pd.DataFrame({
+            'Date': columns['date'],
+            'Ordre': self._categorical(columns['order'], ORDER_LABELS),
+            'Valeur': self._categorical(columns['symbol'], self.symbols),
+            'Quantite': columns['quantity'],
+            'Prix': columns['price'],
+            'Solde restant': columns['cash']
+        }, columns=LEDGER_COLUMNS, copy=False)
+
+    def to_arrow(self):
+        """Table Arrow (ordre et symbole en colonnes dictionnaire)"""
+        if pa is None:
+            raise ImportError("pyarrow n'est pas installé (pip install pyarrow)")
+        columns = self.columns()
+        return pa.table({
+            'Date': pa.array(columns['date']),
+            'Ordre': pa.DictionaryArray.from_arrays(pa.array(columns['order']), pa.array(ORDER_LABELS)),
+            'Valeur': pa.DictionaryArray.from_arrays(pa.array(columns['symbol']), pa.array(self.symbols, pa.string())),
+            'Quantite': pa.array(columns['quantity']),
+            'Prix': pa.array(columns['price']),
+            'Solde restant': pa.array(columns['cash'])
+        })
+
+    def to_records(self, with_symbol=False):
+        """
+        Transactions au format du frontend : {'date', 'action', 'price',
+        'quantity', 'capital'} (StopLoss et TakeProfit sont des ventes)
+        """
+        columns = self.columns()
+        dates = np.datetime_as_string(columns['date'], unit='D').tolist()
+        actions = np.where(columns['order'] == OrderType.ACHAT, 'Achat', 'Vente').tolist()
+        prices = columns['price'].tolist()
+        quantities = columns['quantity'].tolist()
+        capital = columns['cash'].astype(np.int64).tolist()
+        if with_symbol:
+            symbols = np.array(self.symbols, dtype=object)[columns['symbol']].tolist()
+            return [{'date': d, 'symbol': s, 'action': a, 'price': p, 'quantity': q, 'capital': c}
+                    for d, s, a, p, q, c in zip(dates, symbols, actions, prices, quantities, capital)]
+        return [{'date': d, 'action': a, 'price': p, 'quantity': q, 'capital': c}
+                for d, a, p, q, c in zip(dates, actions, prices, quantities, capital)]
+
+    def export_frame(self, start=0, stop=None):
+        """Colonnes de l'export (Date, Action, Prix, Quantité, Capital), comme les transactions du frontend"""
+        stop = self._size if stop is None else min(stop, self._size)
+        return pd.DataFrame({
+            'Date': np.datetime_as_string(self.column('date')[start:stop], unit='D'),
+            'Action': np.where(self.column('order')[start:stop] == OrderType.ACHAT, 'Achat', 'Vente'),
+            'Prix': self.column('price')[start:stop],
+            'Quantité': self.column('quantity')[start:stop],
+            'Capital': self.column('cash')[start:stop].astype(np.int64)
+        }, columns=EXPORT_COLUMNS)
+
+    def iter_csv(self, chunk_rows=50000, header=True):
+        """CSV de l'export par morceaux de chunk_rows lignes"""
+        if header:
+            yield CSV_HEADER
+        for start in range(0, self._size, chunk_rows):
+            buffer = io.StringIO()
+            self.export_frame(start, start + chunk_rows).to_csv(buffer, header=False, index=False,
+                                                                lineterminator='\n')
+            yield buffer.getvalue()
+
+    def to_csv(self):
+        return ''.join(self.iter_csv())
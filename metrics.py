@@ -0,0 +1,237 @@
+"""
+Instrumentation du pipeline d'analyse
+
+Chaque étape (téléchargement, indicateurs, boucle de décision, journal des
+transactions, formatage, encodage JSON) est chronométrée et enregistrée dans
+des histogrammes exposés au format texte de Prometheus (GET /api/metrics).
+Le profilage complet d'une requête (cProfile, ou pyinstrument s'il est
+installé) se demande au cas par cas.
+"""
+
+import cProfile
+import io
+import math
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    from pyinstrument import Profiler as _Pyinstrument
+except ImportError:
+    _Pyinstrument = None
+
+# Bornes des paquets (secondes) : de la milliseconde à la minute
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+PROFILE_DIR = os.environ.get(
+    'PYTRADER_PROFILE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles')
+)
+
+# Rapports gardés dans PROFILE_DIR (les plus anciens sont supprimés au-delà)
+PROFILE_MAX_FILES = int(os.environ.get('PYTRADER_PROFILE_MAX_FILES', 20))
+
+_profile_lock = threading.Lock()
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+class Gauge:
+    """Valeur instantanée lue au moment de l'export (fonction sans argument)"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, function):
+        self.name = name
+        self.documentation = documentation
+        self.function = function
+
+    def samples(self):
+        return [(self.name, '', float(self.function()))]
+
+
+class Histogram:
+    """
+    Histogramme cumulatif (paquets le, somme et nombre d'observations)
+
+    Args:
+        name: nom de la métrique
+        documentation: description (ligne HELP)
+        labelnames: noms des étiquettes
+        buckets: bornes supérieures des paquets, croissantes
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series = {}   # étiquettes -> [comptes par paquet, somme, nombre]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for k, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][k] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        lines = []
+        for key, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append((f'{self.name}_bucket',
+                              _format_labels(self.labelnames, key, ('le', _format_value(bound))), cumulative))
+            lines.append((f'{self.name}_sum', _format_labels(self.labelnames, key), total))
+            lines.append((f'{self.name}_count', _format_labels(self.labelnames, key), count))
+        return lines
+
+
+class Registry:
+    """Ensemble des métriques exportées"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Métrique déjà enregistrée: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        """Export au format texte de Prometheus (version 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'pytrader_stage_seconds',
+    "Durée des étapes du pipeline d'analyse (secondes)",
+    labelnames=('strategy', 'stage')
+))
+
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'pytrader_request_seconds',
+    'Durée de traitement des requêtes HTTP (secondes)',
+    labelnames=('endpoint', 'status')
+))
+
+
+@contextmanager
+def stage_timer(strategy, stage):
+    """Chronomètre le bloc et l'enregistre dans pytrader_stage_seconds"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, strategy=strategy, stage=stage)
+
+
+def available_profilers():
+    return ['cprofile'] + (['pyinstrument'] if _Pyinstrument is not None else [])
+
+
+def profile_call(func, *args, engine='cprofile', **kwargs):
+    """
+    Exécute func sous profileur et écrit le rapport dans PROFILE_DIR, qui
+    garde les PROFILE_MAX_FILES derniers rapports
+
+    Args:
+        engine: 'cprofile' (fichier .prof lisible par pstats/snakeviz) ou
+            'pyinstrument' (rapport HTML), si installé
+
+    Returns:
+        tuple: (résultat de func, {'engine', 'path', 'summary'})
+    """
+    if engine not in available_profilers():
+        raise ValueError(f"Profileur indisponible: {engine}")
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    # Un seul profileur actif à la fois dans l'interpréteur
+    with _profile_lock:
+        result = _profile(func, args, kwargs, engine)
+        _rotate_profiles()
+        return result
+
+
+def _rotate_profiles():
+    """Supprime les rapports les plus anciens au-delà de PROFILE_MAX_FILES"""
+    reports = [entry for entry in os.scandir(PROFILE_DIR)
+               if entry.is_file() and entry.name.startswith('analyze_')]
+    reports.sort(key=lambda entry: entry.stat().st_mtime_ns)
+    for entry in reports[:max(len(reports) - PROFILE_MAX_FILES, 0)]:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+
+def _profile(func, args, kwargs, engine):
+    stamp = time.strftime('%Y%m%d_%H%M%S') + f'_{threading.get_ident()}'
+
+    if engine == 'pyinstrument':
+        profiler = _Pyinstrument()
+        profiler.start()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            profiler.stop()
+        path = os.path.join(PROFILE_DIR, f'analyze_{stamp}.html')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(profiler.output_html())
+        summary = profiler.output_text(unicode=True, color=False)
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            profiler.disable()
+        path = os.path.join(PROFILE_DIR, f'analyze_{stamp}.prof')
+        profiler.dump_stats(path)
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(25)
+        summary = stream.getvalue()
+
+    return result, {'engine': engine, 'path': path, 'summary': summary}
@@ -0,0 +1,257 @@
+"""
+Robustesse des stratégies par Monte Carlo sur des trajectoires rééchantillonnées
+
+Les barres de l'historique d'un symbole (rendement de clôture à clôture et
+forme ouverture / plus haut / plus bas) sont tirées avec remise (bootstrap
+simple, ou par blocs pour conserver les tendances dont vivent les SMA) afin
+de construire des milliers de trajectoires OHLC. Chaque trajectoire est
+backtestée par le moteur événementiel de /api/analyze (StrategySpec.backtest :
+exécution à la barre suivante, stops en ordres en attente, frais), si bien
+que la distribution se compare au résultat de l'analyse. Les trajectoires
+sont réparties par paquets sur le pool de processus ; chaque paquet est
+généré dans son processus à partir de sa propre graine, si bien que le
+résultat ne dépend pas du nombre de cœurs.
+"""
+
+import numpy as np
+
+from engine import max_drawdown
+from indicators import IndicatorGraph, indicator_graph
+from price_store import COLUMNS, load_prices
+from process_pool import DEFAULT_MAX_WORKERS, run_bounded
+from strategies import get_strategy
+
+METHODS = ('bootstrap', 'block')
+
+# Trajectoires backtestées par tâche du pool (une matrice de 250 trajectoires
+# x 2 500 barres occupe 5 Mo par colonne)
+CHUNK_PATHS = 250
+
+PERCENTILES = (5, 25, 50, 75, 95)
+HISTOGRAM_BINS = 40
+
+
+def log_returns(prices):
+    """Rendements logarithmiques d'une série de prix (les barres non finies sont ignorées)"""
+    prices = np.asarray(prices, dtype=np.float64)
+    prices = prices[np.isfinite(prices) & (prices > 0)]
+    return np.diff(np.log(prices))
+
+
+def _draw(n_returns, n_paths, n_steps, method, block_size, rng):
+    """Indices des rendements tirés : matrice n_steps x n_paths"""
+    if method == 'bootstrap':
+        return rng.integers(0, n_returns, size=(n_steps, n_paths))
+    block_size = max(1, min(int(block_size), n_returns))
+    n_blocks = -(-n_steps // block_size)
+    starts = rng.integers(0, n_returns - block_size + 1, size=(n_blocks, 1, n_paths))
+    return (starts + np.arange(block_size)[None, :, None]).reshape(n_blocks * block_size, n_paths)[:n_steps]
+
+
+def resample_paths(returns, n_paths, n_bars, s0, method='block', block_size=20, rng=None):
+    """
+    Trajectoires de prix rééchantillonnées à partir de rendements historiques
+
+    Args:
+        returns: rendements logarithmiques
+        method: 'bootstrap' (tirages indépendants) ou 'block' (blocs contigus
+            de block_size rendements, qui gardent l'autocorrélation)
+        s0: prix de départ de toutes les trajectoires
+
+    Returns:
+        matrice n_bars x n_paths (chaque barre est une ligne contiguë)
+    """
+    if method not in METHODS:
+        raise ValueError(f"Méthode de rééchantillonnage inconnue: {method} ({', '.join(METHODS)})")
+    returns = np.asarray(returns, dtype=np.float64)
+    if len(returns) < 2:
+        raise ValueError("Historique trop court pour le rééchantillonnage")
+    rng = rng if rng is not None else np.random.default_rng()
+    idx = _draw(len(returns), n_paths, n_bars - 1, method, block_size, rng)
+
+    paths = np.empty((n_bars, n_paths), dtype=np.float64)
+    paths[0] = s0
+    np.cumsum(returns[idx], axis=0, out=paths[1:])
+    np.exp(paths[1:], out=paths[1:])
+    paths[1:] *= s0
+    return paths
+
+
+def bar_shapes(frame):
+    """
+    Forme de chaque barre relativement à sa clôture : ouverture, plus haut et
+    plus bas divisés par la clôture (barres non finies ignorées, comme dans
+    log_returns)
+
+    Returns:
+        matrice (barres - 1) x 3 alignée sur log_returns(frame['Close'])
+    """
+    close = frame['Close'].to_numpy(dtype=np.float64)
+    keep = np.isfinite(close) & (close > 0)
+    ohl = frame[['Open', 'High', 'Low']].to_numpy(dtype=np.float64)[keep]
+    shapes = ohl / close[keep][:, None]
+    # Barre incomplète : ouverture à la clôture, extrêmes ramenés à l'ouverture et la clôture
+    shapes[:, 0] = np.where(np.isfinite(shapes[:, 0]), shapes[:, 0], 1.0)
+    shapes[:, 1] = np.fmax(np.where(np.isfinite(shapes[:, 1]), shapes[:, 1], 1.0), np.fmax(shapes[:, 0], 1.0))
+    shapes[:, 2] = np.fmin(np.where(np.isfinite(shapes[:, 2]), shapes[:, 2], 1.0), np.fmin(shapes[:, 0], 1.0))
+    return shapes[1:]
+
+
+def resample_bars(returns, shapes, n_paths, n_bars, s0, method='block', block_size=20, rng=None):
+    """
+    Trajectoires de barres OHLC rééchantillonnées : chaque barre tirée garde
+    son rendement de clôture à clôture et sa forme (voir bar_shapes), si
+    bien que les écarts d'ouverture et les extrêmes qui déclenchent les stops
+    suivent ceux de l'historique
+
+    Returns:
+        {colonne: matrice n_paths x n_bars} (chaque trajectoire est une ligne
+        contiguë) ; la première barre vaut s0
+    """
+    if method not in METHODS:
+        raise ValueError(f"Méthode de rééchantillonnage inconnue: {method} ({', '.join(METHODS)})")
+    returns = np.asarray(returns, dtype=np.float64)
+    if len(returns) < 2:
+        raise ValueError("Historique trop court pour le rééchantillonnage")
+    rng = rng if rng is not None else np.random.default_rng()
+    idx = _draw(len(returns), n_paths, n_bars - 1, method, block_size, rng).T
+
+    close = np.empty((n_paths, n_bars), dtype=np.float64)
+    close[:, 0] = s0
+    np.cumsum(returns[idx], axis=1, out=close[:, 1:])
+    np.exp(close[:, 1:], out=close[:, 1:])
+    close[:, 1:] *= s0
+
+    bars = {'Close': close, 'Volume': np.zeros((n_paths, n_bars))}
+    for k, column in enumerate(('Open', 'High', 'Low')):
+        values = np.empty_like(close)
+        values[:, 0] = s0
+        np.multiply(close[:, 1:], shapes[idx, k], out=values[:, 1:])
+        bars[column] = values
+    return bars
+
+
+def simulate_bars(spec, bars, params=None):
+    """
+    Backteste une stratégie sur chaque trajectoire de bars (voir
+    resample_bars) avec le moteur événementiel de /api/analyze
+
+    Returns:
+        (valeur finale, trésorerie finale, perte maximale depuis un plus haut,
+        nombre de transactions), un vecteur par grandeur
+    """
+    n_paths = len(bars['Close'])
+    equity = np.empty(n_paths)
+    cash = np.empty(n_paths)
+    worst = np.empty(n_paths)
+    trades = np.empty(n_paths, dtype=np.int64)
+    for k in range(n_paths):
+        simulation = spec.backtest(IndicatorGraph({column: bars[column][k] for column in COLUMNS}), params)
+        equity[k] = simulation.equity[-1]
+        cash[k] = simulation.cash
+        worst[k] = max_drawdown(simulation.equity)
+        trades[k] = len(simulation.trades)
+    return equity, cash, worst, trades
+
+
+def _run_chunk(spec, returns, shapes, n_paths, n_bars, s0, method, block_size, params, seed):
+    """Génère et backteste un paquet de trajectoires (exécuté dans un processus du pool)"""
+    bars = resample_bars(returns, shapes, n_paths, n_bars, s0, method, block_size, np.random.default_rng(seed))
+    return simulate_bars(spec, bars, params)
+
+
+def monte_carlo_frame(strategy, frame, n_paths=1000, n_bars=None, method='block', block_size=20,
+                      params=None, seed=None, max_workers=None):
+    """
+    Monte Carlo d'une stratégie à partir de barres historiques
+
+    Args:
+        strategy: nom enregistré ou StrategySpec
+        frame: barres OHLC (colonnes de price_store.COLUMNS)
+        n_bars: longueur des trajectoires (celle de l'historique par défaut)
+        seed: graine (résultats reproductibles quel que soit max_workers)
+
+    Returns:
+        dict de vecteurs de n_paths valeurs : final_equity, final_capital,
+        max_drawdown, number_of_trades
+    """
+    spec = get_strategy(strategy) if isinstance(strategy, str) else strategy
+    if n_paths < 1:
+        raise ValueError("n_paths doit être au moins 1")
+    prices = frame['Close'].to_numpy(dtype=np.float64)
+    returns = log_returns(prices)
+    shapes = bar_shapes(frame)
+    n_bars = int(n_bars or len(returns) + 1)
+    if n_bars < 2:
+        raise ValueError("Les trajectoires doivent compter au moins 2 barres")
+    s0 = float(prices[np.isfinite(prices) & (prices > 0)][0])
+
+    sizes = [min(CHUNK_PATHS, n_paths - start) for start in range(0, n_paths, CHUNK_PATHS)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(spec, returns, shapes, size, n_bars, s0, method, block_size, params, chunk_seed)
+             for size, chunk_seed in zip(sizes, seeds)]
+
+    max_workers = max_workers or DEFAULT_MAX_WORKERS
+    if max_workers <= 1 or len(tasks) == 1:
+        results = [_run_chunk(*task) for task in tasks]
+    else:
+        results = run_bounded(_run_chunk, tasks, max_workers)
+
+    equity, cash, drawdown, trades = (np.concatenate(values) for values in zip(*results))
+    return {'final_equity': equity, 'final_capital': cash, 'max_drawdown': drawdown, 'number_of_trades': trades}
+
+
+def distribution(values, bins=HISTOGRAM_BINS):
+    """Synthèse d'une distribution : moyenne, écart-type, percentiles et histogramme"""
+    values = np.asarray(values, dtype=np.float64)
+    counts, edges = np.histogram(values, bins=bins)
+    percentiles = np.percentile(values, PERCENTILES)
+    return {
+        'mean': float(values.mean()),
+        'std': float(values.std()),
+        'min': float(values.min()),
+        'max': float(values.max()),
+        'percentiles': {f'p{q}': float(v) for q, v in zip(PERCENTILES, percentiles)},
+        'histogram': {'edges': edges.tolist(), 'counts': counts.tolist()}
+    }
+
+
+def run_monte_carlo(symbol, start_date, end_date, strategy, n_paths=1000, n_bars=None, method='block',
+                    block_size=20, params=None, seed=None, max_workers=None):
+    """
+    Monte Carlo d'une stratégie sur les rendements historiques d'un symbole
+
+    Returns:
+        dict: distributions de la valeur finale, du capital final, de la
+        perte maximale et du nombre de transactions, et résultat sur
+        l'historique réel pour comparaison
+    """
+    spec = get_strategy(strategy)
+
+    stock_data = load_prices(symbol, start_date, end_date, interval='1d')
+    if stock_data.empty:
+        raise ValueError(f"Aucune donnée trouvée pour {symbol}")
+    prices = stock_data['Close'].to_numpy(dtype=np.float64)
+
+    results = monte_carlo_frame(spec, stock_data, n_paths, n_bars, method, block_size, params, seed, max_workers)
+    # Historique réel : le backtest de /api/analyze
+    historical = spec.backtest(indicator_graph(symbol, '1d', stock_data), params)
+
+    capital = spec.capital
+    equity = results['final_equity']
+    return {
+        'paths': len(equity),
+        'bars': int(n_bars or np.isfinite(prices).sum()),
+        'method': method,
+        'initialCapital': capital,
+        'probabilityOfLoss': float(np.mean(equity < capital)),
+        'historical': {
+            'finalEquity': round(float(historical.equity[-1]), 2),
+            'maxDrawdown': max_drawdown(historical.equity),
+            'numberOfTrades': len(historical.trades)
+        },
+        'finalEquity': distribution(equity),
+        'finalCapital': distribution(results['final_capital']),
+        'maxDrawdown': distribution(results['max_drawdown']),
+        'numberOfTrades': distribution(results['number_of_trades'])
+    }
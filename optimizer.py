@@ -0,0 +1,158 @@
+"""
+Optimisation des paramètres des stratégies enregistrées par balayage de grille
+
+Chaque combinaison est évaluée par le backtest événementiel de la stratégie
+(StrategySpec.backtest), celui de /api/analyze : la combinaison par défaut
+donne le même résultat que l'analyse. Chaque indicateur n'est calculé qu'une
+fois par jeu de paramètres distinct puis partagé par toutes les combinaisons ;
+les backtests sont répartis par paquets sur le pool de processus.
+"""
+
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from analytics import performance
+from indicators import IndicatorGraph, indicator_graph
+from price_store import COLUMNS, load_prices
+from process_pool import DEFAULT_MAX_WORKERS, run_bounded, split_chunks
+from segments import SharedArrays
+from strategies import get_strategy
+
+# En dessous de ce nombre de combinaisons, le coût du pool dépasse le gain
+MIN_PARALLEL_COMBINATIONS = 64
+
+
+def expand_grid(strategy, grid=None):
+    """
+    Développe une grille {paramètre: [valeurs]} en liste de combinaisons
+
+    Args:
+        strategy: nom enregistré ou StrategySpec
+        grid: grille à balayer (spec.grid par défaut)
+
+    Les paramètres absents de la grille gardent leur valeur par défaut ; les
+    combinaisons dont les fenêtres spec.ordered ne sont pas strictement
+    croissantes et positives sont écartées.
+    """
+    spec = get_strategy(strategy) if isinstance(strategy, str) else strategy
+    grid = spec.grid if grid is None else grid
+
+    unknown = set(grid) - set(spec.defaults)
+    if unknown:
+        raise ValueError(f"Paramètres inconnus pour {spec.name}: {', '.join(sorted(unknown))}")
+
+    names = list(spec.defaults)
+    values = [list(grid.get(name, [spec.defaults[name]])) for name in names]
+
+    combinations = []
+    for combo in itertools.product(*values):
+        params = dict(zip(names, combo))
+        windows = [int(params[name]) for name in spec.ordered]
+        if all(a < b for a, b in zip(windows, windows[1:])) and all(w > 0 for w in windows):
+            combinations.append(params)
+    return combinations
+
+
+def indicator_keys(spec, combinations):
+    """Indicateurs distincts de toutes les combinaisons"""
+    keys = {}
+    for params in combinations:
+        for key in spec.indicator_columns(params).values():
+            keys.setdefault(key, None)
+    return list(keys)
+
+
+def _run_chunk(spec, graph, combinations):
+    """Backteste un paquet de combinaisons (exécuté dans un processus du pool)"""
+    rows = []
+    for params in combinations:
+        simulation = spec.backtest(graph, params)
+        row = dict(params)
+        row['final_capital'] = int(simulation.cash)
+        row['final_equity'] = float(simulation.equity[-1]) if len(simulation.equity) else float(spec.capital)
+        row['number_of_trades'] = len(simulation.trades)
+        row.update(performance(simulation, spec.capital))
+        rows.append(row)
+    return rows
+
+
+def attach_graph(handle):
+    """IndicatorGraph des cours et indicateurs d'un segment partagé (voir shared_graph ; exécuté dans un processus du pool)"""
+    arrays = handle.attach()
+    columns = {column: arrays.pop(column) for column in COLUMNS}
+    return IndicatorGraph(columns, arrays)
+
+
+def shared_graph(graph, keys):
+    """
+    Publie les cours de graph et les indicateurs keys, calculés une seule fois
+    par le processus courant, dans un segment partagé (voir segments.SharedArrays)
+    """
+    arrays = {column: graph.source(column) for column in COLUMNS}
+    arrays.update(graph.compute({key: key for key in keys}))
+    return SharedArrays(arrays)
+
+
+def _run_shared_chunk(spec, handle, combinations):
+    """_run_chunk sur les cours et indicateurs d'un segment partagé"""
+    return _run_chunk(spec, attach_graph(handle), combinations)
+
+
+def sweep_graph(strategy, graph, combinations, max_workers=None):
+    """
+    Évalue toutes les combinaisons par le backtest événementiel de la stratégie
+    (spec.backtest : exécution à la barre suivante, frais de la spécification),
+    comme /api/analyze
+
+    Args:
+        strategy: nom enregistré ou StrategySpec
+        graph: IndicatorGraph (ou tranche, voir IndicatorGraph.window) des cours
+        combinations: liste de dicts de paramètres (voir expand_grid)
+        max_workers: nombre maximal de paquets calculés en même temps sur le pool
+            (1 = exécution dans le processus courant)
+
+    Returns:
+        DataFrame classé par valeur finale du portefeuille décroissante
+    """
+    spec = get_strategy(strategy) if isinstance(strategy, str) else strategy
+
+    max_workers = max_workers or DEFAULT_MAX_WORKERS
+    if max_workers <= 1 or len(combinations) < MIN_PARALLEL_COMBINATIONS:
+        rows = _run_chunk(spec, graph, combinations)
+    else:
+        # Cours et indicateurs publiés une fois dans un segment partagé au lieu d'être copiés dans chaque paquet
+        with shared_graph(graph, indicator_keys(spec, combinations)) as shared:
+            tasks = [(spec, shared.handle, chunk) for chunk in split_chunks(combinations, 4 * max_workers)]
+            rows = [row for chunk_rows in run_bounded(_run_shared_chunk, tasks, max_workers)
+                    for row in chunk_rows]
+
+    ranking = pd.DataFrame(rows)
+    if ranking.empty:
+        return ranking
+    ranking = ranking.sort_values(['final_equity', 'max_drawdown'], ascending=[False, True],
+                                  kind='mergesort').reset_index(drop=True)
+    ranking.insert(0, 'rank', np.arange(1, len(ranking) + 1))
+    return ranking
+
+
+def run_sweep(symbol, start_date, end_date, strategy, grid=None, max_workers=None):
+    """
+    Balaye une grille de paramètres pour une stratégie sur un symbole
+
+    Returns:
+        DataFrame classé : paramètres, final_capital, final_equity,
+        number_of_trades et indicateurs de analytics.performance
+    """
+    combinations = expand_grid(strategy, grid)
+    if not combinations:
+        raise ValueError("Aucune combinaison de paramètres valide")
+
+    stock_data = load_prices(symbol, start_date, end_date, interval='1d')
+    if stock_data.empty:
+        raise ValueError(f"Aucune donnée trouvée pour {symbol}")
+
+    # Indicateurs partagés avec les analyses et balayages précédents du même symbole
+    return sweep_graph(strategy, indicator_graph(symbol, '1d', stock_data), combinations,
+                       max_workers=max_workers)
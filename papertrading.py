@@ -0,0 +1,308 @@
+"""
+Paper trading : stratégies exécutées en temps réel sur un flux de barres
+
+Un flux asynchrone (fichier rejoué ou socket NDJSON) alimente des instances
+des stratégies enregistrées (streaming.StrategyState), mises à jour barre
+par barre par le moteur événementiel de /api/analyze. Les exécutions
+partent dans la file d'un courtier simulé qui tient le journal et les
+positions par instance. Tout tourne dans une seule boucle
+asyncio : la mise à jour d'une barre ne fait aucune attente, et le courtier
+traite sa file entre deux paquets de barres.
+
+    python papertrading.py replay bars.csv --strategies FRA USA
+    python papertrading.py serve bars.csv --port 9100 --speed 60
+    python papertrading.py socket 127.0.0.1:9100 --strategies USA
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import math
+import time
+from collections import namedtuple
+
+import pandas as pd
+
+from ledger import ORDER_LABELS, OrderType, TradeLedger
+from metrics import REGISTRY, Histogram
+from strategies import available_strategies
+from streaming import StateStore, new_state
+
+Bar = namedtuple('Bar', ['date', 'symbol', 'open', 'high', 'low', 'close', 'volume'])
+
+# Colonnes d'un fichier de barres rejoué (une ligne par barre et par symbole)
+FEED_COLUMNS = ['Date', 'Symbol', 'Open', 'High', 'Low', 'Close', 'Volume']
+
+# Durée de traitement d'une barre, de la réception à l'envoi des ordres au courtier
+BAR_SECONDS = REGISTRY.register(Histogram(
+    'pytrader_paper_bar_seconds', "Traitement d'une barre par les instances de paper trading",
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01)
+))
+
+
+def parse_bar(record):
+    """Barre à partir d'un dict (ligne CSV ou NDJSON, clés FEED_COLUMNS, casse indifférente)"""
+    fields = {key.lower(): value for key, value in record.items()}
+    return Bar(str(fields['date']), str(fields['symbol']), float(fields['open']),
+               float(fields.get('high', math.nan)), float(fields.get('low', math.nan)),
+               float(fields['close']), float(fields.get('volume', 0.0)))
+
+
+def _read_bars(path):
+    """Barres d'un fichier CSV (FEED_COLUMNS) ou NDJSON (.ndjson, .jsonl), dans l'ordre du fichier"""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.endswith(('.ndjson', '.jsonl')):
+            for line in f:
+                if line.strip():
+                    yield parse_bar(json.loads(line))
+        else:
+            for row in csv.DictReader(f):
+                yield parse_bar(row)
+
+
+class ReplayFeed:
+    """
+    Rejoue un fichier de barres trié par date
+
+    Args:
+        path: fichier CSV ou NDJSON
+        speed: facteur d'accélération du temps (60 : une minute de marché par
+            seconde) ; 0 rejoue aussi vite que possible
+    """
+
+    def __init__(self, path, speed=0.0):
+        self.path = path
+        self.speed = float(speed)
+
+    async def __aiter__(self):
+        loop = asyncio.get_running_loop()
+        first_time = wall_start = None
+        current = None
+        for bar in _read_bars(self.path):
+            if bar.date != current:
+                # Nouvel horodatage : on rend la main à la boucle (courtier), au rythme demandé
+                current = bar.date
+                delay = 0.0
+                if self.speed > 0:
+                    timestamp = pd.Timestamp(bar.date).timestamp()
+                    if first_time is None:
+                        first_time, wall_start = timestamp, loop.time()
+                    delay = wall_start + (timestamp - first_time) / self.speed - loop.time()
+                await asyncio.sleep(max(delay, 0.0))
+            yield bar
+
+
+class SocketFeed:
+    """Flux de barres NDJSON lu sur une connexion TCP (une barre par ligne)"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = int(port)
+
+    async def __aiter__(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    yield parse_bar(json.loads(line))
+        finally:
+            writer.close()
+            await writer.wait_closed()
+
+
+async def serve_replay(path, host='127.0.0.1', port=9100, speed=0.0):
+    """Diffuse un fichier de barres en NDJSON à chaque client TCP (source de test de SocketFeed)"""
+    async def handle(reader, writer):
+        try:
+            async for bar in ReplayFeed(path, speed):
+                writer.write((json.dumps(bar._asdict()) + '\n').encode('utf-8'))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+class SimulatedBroker:
+    """
+    Courtier simulé : enregistre les exécutions du moteur des instances
+    (ouverture suivante, stops en attente, glissement et commissions compris)
+
+    Les exécutions sont déposées sans attente (submit) et traitées par la
+    tâche run() ; le journal porte le nom de l'instance dans la colonne symbole.
+    """
+
+    def __init__(self):
+        self.queue = asyncio.Queue()
+        self.ledger = TradeLedger()
+        self.positions = {}
+        self.filled = 0
+
+    def submit(self, instance, order):
+        self.queue.put_nowait((instance, order))
+
+    def close(self):
+        self.queue.put_nowait(None)
+
+    def fill(self, instance, order):
+        code = ORDER_LABELS.index(order['order'])
+        self.ledger.append(order['date'], code, order['quantity'], order['price'], order['cash'],
+                           symbol=instance)
+        sign = 1 if code == OrderType.ACHAT else -1
+        self.positions[instance] = self.positions.get(instance, 0.0) + sign * order['quantity']
+        self.filled += 1
+
+    async def run(self):
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                break
+            self.fill(*item)
+
+
+class PaperTrader:
+    """
+    Instances de stratégies branchées sur un flux de barres
+
+    Args:
+        feed: itérable asynchrone de Bar (ReplayFeed, SocketFeed)
+        broker: SimulatedBroker (nouveau par défaut)
+        strategies: stratégies instanciées automatiquement pour chaque
+            nouveau symbole du flux (aucune par défaut : voir add)
+        state_store: StateStore pour reprendre et enregistrer l'état des instances
+    """
+
+    def __init__(self, feed, broker=None, strategies=(), state_store=None):
+        self.feed = feed
+        self.broker = broker if broker is not None else SimulatedBroker()
+        self.strategies = tuple(strategies)
+        self.state_store = state_store
+        self.instances = {}     # nom -> (symbole, automate)
+        self._by_symbol = {}    # symbole -> [(nom, automate)]
+        self.last_prices = {}   # symbole -> dernière clôture
+        self.bars = 0
+        self.busy_seconds = 0.0
+        self.max_bar_seconds = 0.0
+
+    def add(self, symbol, strategy, params=None, name=None):
+        """Ajoute une instance (nom par défaut 'STRATEGIE:SYMBOLE') ; retourne son nom"""
+        name = name or f'{strategy}:{symbol}'
+        if name in self.instances:
+            raise ValueError(f"Instance déjà présente: {name}")
+        state = None
+        if self.state_store is not None:
+            state = self.state_store.load(strategy, symbol, params)
+        state = state or new_state(strategy, params)
+        self.instances[name] = (symbol, state)
+        self._by_symbol.setdefault(symbol, []).append((name, state))
+        return name
+
+    def on_bar(self, bar):
+        """Applique une barre à toutes les instances de son symbole"""
+        started = time.perf_counter()
+        instances = self._by_symbol.get(bar.symbol)
+        if instances is None:
+            for strategy in self.strategies:
+                self.add(bar.symbol, strategy)
+            instances = self._by_symbol.get(bar.symbol, ())
+
+        submit = self.broker.submit
+        for name, state in instances:
+            for order in state.update(bar.date, bar.open, bar.high, bar.low, bar.close, bar.volume):
+                submit(name, order)
+
+        self.last_prices[bar.symbol] = bar.close
+        elapsed = time.perf_counter() - started
+        BAR_SECONDS.observe(elapsed)
+        self.bars += 1
+        self.busy_seconds += elapsed
+        if elapsed > self.max_bar_seconds:
+            self.max_bar_seconds = elapsed
+
+    async def run(self):
+        """Consomme le flux jusqu'à sa fin ; retourne les statistiques (voir stats)"""
+        broker_task = asyncio.create_task(self.broker.run())
+        try:
+            async for bar in self.feed:
+                self.on_bar(bar)
+        finally:
+            self.broker.close()
+            await broker_task
+            if self.state_store is not None:
+                self.save()
+        return self.stats()
+
+    def save(self):
+        for symbol, state in self.instances.values():
+            self.state_store.save(symbol, state)
+
+    def stats(self):
+        return {
+            'instances': len(self.instances),
+            'bars': self.bars,
+            'orders': self.broker.filled,
+            'meanBarMicroseconds': round(self.busy_seconds / self.bars * 1e6, 2) if self.bars else 0.0,
+            'maxBarMicroseconds': round(self.max_bar_seconds * 1e6, 2)
+        }
+
+    def summary(self):
+        """Valeur de chaque instance à la dernière clôture reçue"""
+        rows = []
+        for name, (symbol, state) in self.instances.items():
+            equity = state.cash + state.position * self.last_prices.get(symbol, 0.0)
+            rows.append({'instance': name, 'symbol': symbol, 'strategy': state.strategy, 'bars': state.bars,
+                         'cash': round(state.cash, 2), 'position': state.position, 'equity': round(equity, 2),
+                         'gains': round((equity - state.initial_capital) / state.initial_capital * 100, 2)})
+        return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Paper trading des stratégies enregistrées sur un flux de barres")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    for command, help_text in (('replay', "rejouer un fichier de barres"),
+                               ('socket', "lire un flux NDJSON host:port")):
+        sub = commands.add_parser(command, help=help_text)
+        sub.add_argument('source', help="fichier CSV / NDJSON" if command == 'replay' else "host:port")
+        sub.add_argument('--strategies', nargs='+', default=['FRA', 'USA'], choices=available_strategies())
+        sub.add_argument('--state-dir', help="reprendre et enregistrer l'état des instances")
+        if command == 'replay':
+            sub.add_argument('--speed', type=float, default=0.0, help="accélération du temps (0 : au plus vite)")
+
+    serve_parser = commands.add_parser('serve', help="diffuser un fichier de barres sur un socket (NDJSON)")
+    serve_parser.add_argument('source')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=9100)
+    serve_parser.add_argument('--speed', type=float, default=1.0)
+
+    args = parser.parse_args(argv)
+    if args.command == 'serve':
+        print(f"📡 Diffusion de {args.source} sur {args.host}:{args.port}")
+        asyncio.run(serve_replay(args.source, args.host, args.port, args.speed))
+        return
+
+    if args.command == 'replay':
+        feed = ReplayFeed(args.source, args.speed)
+    else:
+        host, _, port = args.source.rpartition(':')
+        feed = SocketFeed(host, port)
+    state_store = StateStore(args.state_dir) if args.state_dir else None
+    trader = PaperTrader(feed, strategies=args.strategies, state_store=state_store)
+
+    stats = asyncio.run(trader.run())
+    print(f"📈 {stats['bars']} barres, {stats['instances']} instances, {stats['orders']} ordres "
+          f"({stats['meanBarMicroseconds']} µs/barre en moyenne, {stats['maxBarMicroseconds']} µs max)")
+    for row in sorted(trader.summary(), key=lambda r: r['gains'], reverse=True)[:10]:
+        print(f"   {row['instance']}: {row['equity']} ({row['gains']}%)")
+
+
+if __name__ == '__main__':
+    main()
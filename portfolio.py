@@ -0,0 +1,371 @@
+"""
+Backtest de portefeuille : une stratégie sur N symboles avec une trésorerie commune
+
+Les conditions de la stratégie (StrategySpec.compile) sont calculées sur
+les barres de chaque symbole puis alignées sur l'union de leurs dates dans
+des matrices barres x symboles. À chaque barre, les exécutions puis les
+décisions de tous les symboles sont traitées en une fois par des opérations
+NumPy sur des vecteurs de longueur N ; seule la boucle sur les barres reste
+en Python. L'exécution suit le moteur événementiel de /api/analyze
+(execution.py) : ordres au marché à l'ouverture suivante, stops et
+take-profit en attente, glissement et commissions.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from engine import (ACHAT, EXCLUSIVE, RULE_SIGNAL, RULE_STOP_LOSS, RULE_TAKE_PROFIT, RULE_TRAILING_STOP,
+                    SIZING_FLOOR, max_drawdown)
+from execution import make_costs
+from indicators import indicator_graph
+from ledger import TradeLedger
+from price_store import get_price_store
+from strategies import get_strategy
+
+DEFAULT_CAPITAL = 1000000
+
+PORTFOLIO_TRADE_DTYPE = np.dtype([
+    ('index', np.int64),      # position de la barre dans l'index commun
+    ('symbol', np.int32),     # colonne du symbole dans la matrice
+    ('order', np.int8),       # ledger.OrderType
+    ('quantity', np.float64),
+    ('price', np.float64),
+    ('cash', np.float64)      # trésorerie commune après les ordres de la barre
+])
+
+# Résultat : index commun, symboles, valeur du portefeuille, trésorerie,
+# perte depuis le plus haut et exposition par barre, transactions
+# (PORTFOLIO_TRADE_DTYPE et journal), positions finales
+PortfolioResult = namedtuple('PortfolioResult', [
+    'dates', 'symbols', 'equity', 'cash', 'drawdown', 'exposure', 'trades', 'ledger', 'positions'
+])
+
+
+def align_prices(frames, column):
+    """
+    Matrice barres x symboles des prix column sur l'union des dates
+
+    Args:
+        frames: {symbole: DataFrame de load_prices}
+
+    Returns:
+        (index des dates, liste des symboles, matrice float64 avec NaN là où
+        le symbole n'a pas de barre)
+    """
+    symbols = list(frames)
+    series = [frames[s].set_index('Date')[column].rename(s) for s in symbols]
+    matrix = pd.concat(series, axis=1, join='outer').sort_index()
+    return matrix.index, symbols, matrix.to_numpy(dtype=np.float64)
+
+
+def _align(frames, index, values, fill):
+    """Matrice barres x symboles de valeurs calculées sur les barres de chaque symbole"""
+    columns = {s: pd.Series(v, index=pd.DatetimeIndex(frames[s]['Date'])) for s, v in values.items()}
+    return pd.DataFrame(columns).reindex(index).fillna(fill).to_numpy()
+
+
+def compile_portfolio(spec, frames, params=None):
+    """
+    Conditions de la stratégie pour chaque symbole, calculées sur ses propres
+    barres (graphe d'indicateurs partagé, voir indicators.indicator_graph)
+    puis alignées sur l'union des dates
+
+    Returns:
+        (dates, symboles, barres {colonne OHLC: matrice}, prix de décision,
+        achats, règles) : comme StrategySpec.compile, une colonne par symbole ;
+        les décisions sont nulles là où le symbole n'a pas de barre
+    """
+    params = spec.params(params)
+    dates, symbols, close = align_prices(frames, 'Close')
+    compiled = {s: spec.compile(indicator_graph(s, '1d', frames[s]), params) for s in symbols}
+
+    def decisions(select):
+        # Barres de décision : indicateurs valides, à partir de first_bar
+        return {s: select(s) & compiled[s][1] & (np.arange(len(frames[s])) >= spec.first_bar) for s in symbols}
+
+    bars = {'Close': close}
+    for column in ('Open', 'High', 'Low'):
+        bars[column] = align_prices(frames, column)[2]
+    price = _align(frames, dates, {s: compiled[s][0] for s in symbols}, np.nan).astype(np.float64)
+    entry = _align(frames, dates, decisions(lambda s: compiled[s][2]), False).astype(np.bool_)
+
+    rules = []
+    for r, rule in enumerate(compiled[symbols[0]][3]):
+        if rule[0] == RULE_SIGNAL:
+            signal = _align(frames, dates, decisions(lambda s: compiled[s][3][r][4]), False).astype(np.bool_)
+            rules.append(rule[:4] + (signal,))
+        else:
+            rules.append(rule)
+    return dates, symbols, bars, price, entry, rules
+
+
+def _record(trades, t, symbols_idx, order, quantity, price):
+    if len(symbols_idx):
+        trades.append((t, symbols_idx, order, quantity[symbols_idx], price[symbols_idx]))
+
+
+def _pack(trades, cash_curve):
+    count = sum(len(idx) for _, idx, _, _, _ in trades)
+    packed = np.empty(count, dtype=PORTFOLIO_TRADE_DTYPE)
+    k = 0
+    for t, idx, order, quantity, price in trades:
+        n = len(idx)
+        packed['index'][k:k + n] = t
+        packed['symbol'][k:k + n] = idx
+        packed['order'][k:k + n] = order
+        packed['quantity'][k:k + n] = quantity
+        packed['price'][k:k + n] = price
+        packed['cash'][k:k + n] = cash_curve[t]
+        k += n
+    return packed
+
+
+def simulate_portfolio(spec, bars, price, entry, rules, capital=DEFAULT_CAPITAL, params=None,
+                       max_positions=None, position_size=None, costs=None):
+    """
+    Simule une stratégie sur des matrices de barres avec une trésorerie commune
+
+    Mêmes règles d'exécution que le backtest de /api/analyze (execution.py),
+    appliquées symbole par symbole : les décisions prises à la clôture d'une
+    barre sont exécutées à l'ouverture suivante du symbole avec glissement,
+    les stops (le plus haut d'abord) puis les take-profit sont des ordres en
+    attente comparés au plus bas et au plus haut de la barre, et chaque
+    exécution paie la commission. Un symbole n'est acheté que s'il n'est pas
+    déjà en portefeuille, pour au plus position_size de la valeur du
+    portefeuille à l'ouverture ; si plus d'achats sont en attente que de
+    places libres (max_positions), les premiers dans l'ordre des colonnes
+    sont retenus et les autres annulés. Les ventes d'une barre sont exécutées
+    avant ses achats.
+
+    Args:
+        spec: StrategySpec
+        bars: {colonne OHLC: matrice barres x symboles} (NaN : pas de cotation)
+        price, entry, rules: conditions de la stratégie (voir compile_portfolio)
+        capital: trésorerie de départ commune
+        params: paramètres de la stratégie (prix limite d'achat, voir spec.entry_limit)
+        max_positions: nombre maximal de lignes simultanées (tous les symboles par défaut)
+        position_size: fraction de la valeur du portefeuille par ligne (1 / max_positions par défaut)
+        costs: frais d'exécution (spec.costs par défaut, voir execution.make_costs)
+
+    Returns:
+        (equity, cash, exposure, trades, positions)
+    """
+    params = spec.params(params)
+    opens, highs, lows, closes = (np.asarray(bars[c], dtype=np.float64) for c in ('Open', 'High', 'Low', 'Close'))
+    n_bars, n_symbols = closes.shape
+    max_positions = n_symbols if max_positions is None else int(max_positions)
+    position_size = 1.0 / max(1, max_positions) if position_size is None else float(position_size)
+    costs = spec.costs if costs is None else make_costs(costs)
+    commission = costs.commission
+    slippage = costs.slippage_bps / 10000.0
+    entry_limit = spec.entry_level(params)
+    exclusive = spec.mode == EXCLUSIVE
+
+    signal_rules = [rule for rule in rules if rule[0] == RULE_SIGNAL]
+    if exclusive:
+        # La première règle vérifiée l'emporte : appliquée en dernier
+        signal_rules = signal_rules[::-1]
+    stop_rules = [rule for rule in rules if rule[0] in (RULE_STOP_LOSS, RULE_TRAILING_STOP)]
+    limit_rules = [rule for rule in rules if rule[0] == RULE_TAKE_PROFIT]
+
+    tradable = np.isfinite(opens)
+    # Dernière clôture connue pour valoriser les lignes les jours sans cotation
+    marked = pd.DataFrame(closes).ffill().fillna(0.0).to_numpy()
+
+    cash = float(capital)
+    position = np.zeros(n_symbols)
+    last_buy_price = np.zeros(n_symbols)
+    highest_price = np.zeros(n_symbols)
+    # Ordres décidés à la clôture, exécutés à la prochaine barre du symbole
+    pending_buy = np.full(n_symbols, np.nan)       # limite d'achat (inf : au marché)
+    pending_sell = np.zeros(n_symbols)             # part vendue au marché (0 : aucun ordre)
+    pending_order = np.zeros(n_symbols, dtype=np.int8)
+    equity = np.empty(n_bars)
+    cash_curve = np.empty(n_bars)
+    exposure = np.empty(n_bars)
+    trades = []
+    columns = np.arange(n_symbols)
+
+    def sell(t, idx, pct, prices, order_type):
+        """Ventes de idx ; retourne les symboles effectivement vendus"""
+        nonlocal cash
+        qty = np.zeros(n_symbols)
+        qty[idx] = np.trunc(position[idx] * pct[idx] / 100.0)
+        idx = idx[qty[idx] > 0]
+        if not len(idx):
+            return idx
+        notional = qty[idx] * prices[idx]
+        cash += float(np.sum(notional - commission.many(notional)))
+        position[idx] -= qty[idx]
+        if spec.reset_on_exit:
+            last_buy_price[idx] = highest_price[idx] = 0.0
+        for order in np.unique(order_type[idx]):
+            _record(trades, t, idx[order_type[idx] == order], int(order), qty, prices)
+        return idx
+
+    def buy(t, candidates, prices, value):
+        """Achats de candidates (une place libre chacun) sur la trésorerie commune"""
+        nonlocal cash
+        budget = min(position_size * value, cash / len(candidates))
+        qty = np.zeros(n_symbols)
+        for s in candidates:
+            available = max(budget - commission(budget), 0.0)
+            limit = available // prices[s] if spec.sizing == SIZING_FLOOR else float(int(available / prices[s]))
+            qty[s] = commission.affordable(min(budget, cash), prices[s], limit)
+            notional = qty[s] * prices[s]
+            cash -= notional + commission(notional)
+        bought = candidates[qty[candidates] > 0]
+        position[bought] += qty[bought]
+        last_buy_price[bought] = highest_price[bought] = prices[bought]
+        _record(trades, t, bought, ACHAT, qty, prices)
+
+    def free_slots():
+        return max_positions - int(np.count_nonzero(position > 0))
+
+    for t in range(n_bars):
+        ok = tradable[t]
+        o = np.where(ok, opens[t], 0.0)
+
+        # ---- Ordres au marché de la clôture précédente : ventes puis achats à l'ouverture ----
+        selling = np.flatnonzero(ok & (pending_sell > 0))
+        if len(selling):
+            sell(t, selling, pending_sell, o * (1.0 - slippage), pending_order)
+            pending_sell[selling] = 0.0
+        if entry_limit is None:
+            buying = np.flatnonzero(ok & (pending_buy > 0))
+            if len(buying):
+                pending_buy[buying] = np.nan
+                candidates = buying[position[buying] <= 0][:max(free_slots(), 0)]
+                if len(candidates) and cash > 0:
+                    value = cash + float(np.dot(position, np.where(ok, o, marked[t - 1] if t else 0.0)))
+                    buy(t, candidates, o * (1.0 + slippage), value)
+
+        # ---- Ordres de protection : stops du plus haut au plus bas, puis take-profit ----
+        active = ok & (position > 0)
+        if active.any() and (stop_rules or limit_rules):
+            lo, hi = np.where(ok, lows[t], np.inf), np.where(ok, highs[t], -np.inf)
+            for family, triggered, fill in (
+                    (stop_rules, lambda target: lo <= target, lambda target: np.minimum(o, target)),
+                    (limit_rules, lambda target: hi >= target, lambda target: np.maximum(o, target))):
+                if not family:
+                    continue
+                targets = np.array([np.where(position > 0, (highest_price if kind == RULE_TRAILING_STOP
+                                                            else last_buy_price) * level, 0.0)
+                                    for kind, level, _, _ in family])
+                ranks = np.argsort(-targets if family is stop_rules else targets, axis=0, kind='stable')
+                for k in range(len(family)):
+                    r = ranks[k]
+                    target = targets[r, columns]
+                    fire = np.flatnonzero(active & (target > 0) & triggered(target))
+                    if not len(fire):
+                        continue
+                    pct = np.array([family[j][2] for j in r], dtype=np.float64)
+                    order_type = np.array([family[j][3] for j in r], dtype=np.int8)
+                    reference = fill(target)
+                    prices = reference * (1.0 - slippage) if family is stop_rules else reference
+                    done = sell(t, fire, pct, prices, order_type)
+                    # Position soldée (ou état remis à zéro) : les autres ordres du symbole sont annulés
+                    if len(done):
+                        closed = done[(position[done] <= 0) | spec.reset_on_exit]
+                        active[closed] = False
+
+        # ---- Achats limites valables une barre ----
+        if entry_limit is not None:
+            buying = np.flatnonzero(ok & np.isfinite(pending_buy))
+            if len(buying):
+                limits = pending_buy.copy()
+                pending_buy[buying] = np.nan
+                lo = np.where(ok, lows[t], np.inf)
+                candidates = buying[(position[buying] <= 0) & (lo[buying] <= limits[buying])]
+                candidates = candidates[:max(free_slots(), 0)]
+                if len(candidates) and cash > 0:
+                    value = cash + float(np.dot(position, np.where(ok, o, marked[t - 1] if t else 0.0)))
+                    buy(t, candidates, np.minimum(o, np.where(np.isfinite(limits), limits, 0.0)), value)
+
+        # ---- Plus haut depuis l'achat (trailing stop des barres suivantes) ----
+        holding = ok & (position > 0)
+        highest_price[holding] = np.fmax(highest_price[holding], highs[t][holding])
+
+        # ---- Décisions de la clôture : ordres pour la prochaine barre de chaque symbole ----
+        p = price[t]
+        buys = np.flatnonzero(entry[t] & (position <= 0) & (cash >= np.where(ok, p, np.inf)))
+        pending_buy[buys] = np.inf if entry_limit is None else p[buys] * entry_limit
+        pct = np.zeros(n_symbols)
+        order_type = np.zeros(n_symbols, dtype=np.int8)
+        for _, _, sell_pct, order, signal in signal_rules:
+            pct = np.where(signal[t], sell_pct, pct)
+            order_type = np.where(signal[t], order, order_type)
+        exits = (pct > 0) & (position > 0)
+        if exclusive:
+            exits &= ~entry[t]
+        pending_sell[exits] = pct[exits]
+        pending_order[exits] = order_type[exits]
+
+        invested = float(np.dot(position, marked[t]))
+        cash_curve[t] = cash
+        equity[t] = cash + invested
+        exposure[t] = invested / equity[t] if equity[t] > 0 else 0.0
+
+    return equity, cash_curve, exposure, _pack(trades, cash_curve), position
+
+
+def drawdown_curve(equity):
+    """Perte depuis le plus haut à chaque barre, en fraction (0.25 = -25 %)"""
+    equity = np.asarray(equity, dtype=np.float64)
+    if len(equity) == 0:
+        return equity
+    peak = np.fmax.accumulate(equity)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(peak > 0, 1.0 - equity / peak, 0.0)
+
+
+def run_portfolio(symbols, start_date, end_date, strategy, capital=DEFAULT_CAPITAL, params=None,
+                  max_positions=None, position_size=None):
+    """
+    Backtest de portefeuille sur un ensemble de symboles
+
+    Les symboles sans données sur la période sont écartés.
+
+    Returns:
+        PortfolioResult
+    """
+    spec = get_strategy(strategy)
+    params = spec.params(params)
+
+    store = get_price_store()
+    store.load_many(symbols, start_date, end_date, interval='1d')
+    frames = {}
+    for symbol in symbols:
+        frame = store.load(symbol, start_date, end_date, interval='1d')
+        if not frame.empty:
+            frames[symbol] = frame
+    if not frames:
+        raise ValueError("Aucune donnée trouvée pour les symboles demandés")
+
+    dates, kept, bars, price, entry, rules = compile_portfolio(spec, frames, params)
+
+    equity, cash, exposure, trades, positions = simulate_portfolio(
+        spec, bars, price, entry, rules, capital, params, max_positions=max_positions,
+        position_size=position_size
+    )
+    ledger = TradeLedger(kept, capacity=len(trades))
+    ledger.extend(dates.to_numpy()[trades['index']], trades['order'], trades['quantity'],
+                  trades['price'], trades['cash'], symbols=trades['symbol'])
+    return PortfolioResult(dates, kept, equity, cash, drawdown_curve(equity), exposure, trades, ledger, positions)
+
+
+def summarize_portfolio(result, capital=DEFAULT_CAPITAL):
+    """Indicateurs globaux du backtest de portefeuille"""
+    final_equity = float(result.equity[-1]) if len(result.equity) else float(capital)
+    return {
+        'initialCapital': capital,
+        'finalEquity': round(final_equity, 2),
+        'finalCash': round(float(result.cash[-1]), 2) if len(result.cash) else float(capital),
+        'gains': round((final_equity - capital) / capital * 100, 1),
+        'maxDrawdown': max_drawdown(result.equity),
+        'numberOfTrades': len(result.trades),
+        'averageExposure': round(float(np.mean(result.exposure)), 4) if len(result.exposure) else 0.0,
+        'openPositions': {s: int(q) for s, q in zip(result.symbols, result.positions) if q > 0}
+    }
@@ -0,0 +1,496 @@
+"""
+Cache local des cours OHLCV placé devant yf.download
+
+Les barres sont conservées sur disque, par intervalle et par symbole, dans
+un segment partagé (voir segments.py) : un fichier .npy mappé en mémoire
+dont chaque ligne est une série contiguë (dates puis OHLCV). Tous les
+processus qui lisent un symbole (workers du serveur, pool de calcul, lots)
+partagent les mêmes pages et reçoivent des vues sans copie. Seules les
+plages de dates absentes du cache sont demandées au fournisseur, puis
+fusionnées avec l'existant : les requêtes répétées ou qui se recouvrent sont
+servies depuis le disque. Les intervalles intraday, que Yahoo ne sert que par
+fenêtres limitées, sont demandés par tranches successives (voir FETCH_SPANS).
+"""
+
+import glob
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from segments import as_dates, attach_segment, forget_segment, write_segment
+
+try:
+    import fcntl
+except ImportError:  # Windows : verrous entre threads seulement
+    fcntl = None
+
+COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# Lignes d'un segment de cours : dates (datetime64[ns] bit à bit) puis OHLCV
+SEGMENT_ROWS = ['Date'] + COLUMNS
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    'PYTRADER_DATA_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data_cache')
+)
+
+# Durée maximale d'une requête au fournisseur par intervalle (limites de Yahoo
+# Finance pour l'intraday) ; les intervalles absents sont demandés d'un bloc
+FETCH_SPANS = {
+    '1m': pd.Timedelta(days=7),
+    '2m': pd.Timedelta(days=60),
+    '5m': pd.Timedelta(days=60),
+    '15m': pd.Timedelta(days=60),
+    '30m': pd.Timedelta(days=60),
+    '60m': pd.Timedelta(days=730),
+    '90m': pd.Timedelta(days=60),
+    '1h': pd.Timedelta(days=730)
+}
+
+
+# Fonctions appelées (symbol, interval) quand de nouvelles barres entrent dans un cache
+_update_listeners = []
+
+
+def add_update_listener(callback):
+    """Enregistre callback(symbol, interval), appelé quand les barres d'un symbole changent"""
+    _update_listeners.append(callback)
+
+
+def _notify_update(symbol, interval):
+    for callback in _update_listeners:
+        callback(symbol, interval)
+
+
+def _has_new_bars(frame, bars):
+    """True si bars contient des dates absentes de frame ou des valeurs différentes"""
+    known = frame.reindex(bars.index)
+    return not np.array_equal(known.to_numpy(), bars.to_numpy(), equal_nan=True)
+
+
+def normalize_bars(data):
+    """Ramène un DataFrame de cours au format du cache (index Date, colonnes COLUMNS en float64)"""
+    if data is None or data.empty:
+        return _empty_frame()
+
+    data = data.copy()
+    # yfinance renvoie des colonnes MultiIndex (champ, symbole) pour un seul symbole
+    if isinstance(data.columns, pd.MultiIndex):
+        data.columns = data.columns.get_level_values(0)
+
+    if 'Date' in data.columns:
+        data = data.set_index('Date')
+    elif 'Datetime' in data.columns:
+        data = data.set_index('Datetime')
+
+    index = pd.DatetimeIndex(data.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    data.index = index.astype('datetime64[ns]')
+    data.index.name = 'Date'
+
+    for column in COLUMNS:
+        if column not in data.columns:
+            data[column] = np.nan
+    return data[COLUMNS].astype('float64').sort_index()
+
+
+def _empty_frame():
+    index = pd.DatetimeIndex([], name='Date').astype('datetime64[ns]')
+    return pd.DataFrame({column: np.array([], dtype='float64') for column in COLUMNS}, index=index)
+
+
+def segment_columns(block, start=0, stop=None):
+    """{'Date': dates, colonne: valeurs} des barres [start, stop) d'un segment (vues sans copie)"""
+    columns = {'Date': as_dates(block[0, start:stop])}
+    columns.update({column: block[k, start:stop] for k, column in enumerate(COLUMNS, 1)})
+    return columns
+
+
+class PriceProvider:
+    """Interface d'une source de cours historiques"""
+
+    def fetch(self, symbol, start, end, interval='1d'):
+        """
+        Télécharge les barres de symbol dans l'intervalle [start, end)
+
+        Returns:
+            DataFrame indexé par date avec les colonnes COLUMNS
+        """
+        raise NotImplementedError
+
+    def fetch_many(self, symbols, start, end, interval='1d'):
+        """Télécharge plusieurs symboles ; retourne un dict symbole -> DataFrame"""
+        return {symbol: self.fetch(symbol, start, end, interval) for symbol in symbols}
+
+
+class YahooProvider(PriceProvider):
+    """Source Yahoo Finance (via yfinance)"""
+
+    def fetch(self, symbol, start, end, interval='1d'):
+        import yfinance as yf
+
+        data = yf.download(symbol, start=start, end=end, interval=interval,
+                           auto_adjust=True, progress=False)
+        return normalize_bars(data)
+
+    def fetch_many(self, symbols, start, end, interval='1d'):
+        """Un seul appel yf.download pour tous les symboles"""
+        import yfinance as yf
+
+        data = yf.download(list(symbols), start=start, end=end, interval=interval,
+                           auto_adjust=True, progress=False, group_by='ticker', threads=True)
+        frames = {}
+        for symbol in symbols:
+            if isinstance(data.columns, pd.MultiIndex) and symbol in data.columns.get_level_values(0):
+                bars = normalize_bars(data[symbol]).dropna(how='all')
+            else:
+                bars = _empty_frame()
+            frames[symbol] = bars
+        return frames
+
+
+class CsvProvider(PriceProvider):
+    """
+    Source locale : un fichier <SYMBOLE>.csv par symbole, avec une colonne Date
+    et les colonnes OHLCV. Sert de fixture pour les tests et de mode hors ligne.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def fetch(self, symbol, start, end, interval='1d'):
+        path = os.path.join(self.directory, f'{symbol}.csv')
+        if not os.path.exists(path):
+            return _empty_frame()
+        data = normalize_bars(pd.read_csv(path, parse_dates=['Date']))
+        return data[(data.index >= pd.Timestamp(start)) & (data.index < pd.Timestamp(end))]
+
+
+def _missing_ranges(coverage, start, end):
+    """Retourne les sous-plages de [start, end) non couvertes par coverage (liste triée de paires)"""
+    missing = []
+    cursor = start
+    for covered_start, covered_end in coverage:
+        if covered_end <= cursor:
+            continue
+        if covered_start >= end:
+            break
+        if covered_start > cursor:
+            missing.append((cursor, covered_start))
+        cursor = max(cursor, covered_end)
+        if cursor >= end:
+            break
+    if cursor < end:
+        missing.append((cursor, end))
+    return missing
+
+
+def _merge_ranges(ranges):
+    """Fusionne des plages [début, fin) qui se touchent ou se recouvrent"""
+    merged = []
+    for range_start, range_end in sorted(ranges):
+        if merged and range_start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], range_end))
+        else:
+            merged.append((range_start, range_end))
+    return merged
+
+
+def split_range(start, end, interval):
+    """Découpe [start, end) en tranches téléchargeables d'un seul appel pour interval"""
+    span = FETCH_SPANS.get(interval)
+    if span is None:
+        return [(start, end)]
+    chunks = []
+    cursor = start
+    while cursor < end:
+        chunk_end = min(cursor + span, end)
+        chunks.append((cursor, chunk_end))
+        cursor = chunk_end
+    return chunks
+
+
+class PriceStore:
+    """
+    Cache disque des cours, un répertoire par (intervalle, symbole) :
+    bars-<version>.npy (segment partagé, lignes SEGMENT_ROWS) et meta.json,
+    l'index qui désigne la version courante du segment (nombre de barres,
+    plages déjà téléchargées). Chaque écriture crée une nouvelle version au
+    lieu de remplacer un fichier peut-être mappé (interdit sous Windows) ;
+    les anciennes versions sont supprimées dès qu'aucun processus ne les
+    mappe plus. Les répertoires de l'ancien format (dates.npy et une colonne
+    .npy par champ) sont convertis à leur première lecture.
+
+    Les téléchargements se font sans verrou ; seule la fusion dans le cache
+    (relecture, fusion, écriture) est verrouillée, par symbole : verrou de
+    thread et verrou fcntl sur le fichier .lock du répertoire, partagé par
+    tous les processus qui écrivent dans le cache.
+    """
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, provider=None):
+        self.root = root
+        self.provider = provider if provider is not None else YahooProvider()
+        self._lock = threading.Lock()
+        self._symbol_locks = {}
+
+    def __getstate__(self):
+        # Transmissible aux processus du pool (le verrou est propre au processus)
+        return {'root': self.root, 'provider': self.provider}
+
+    def __setstate__(self, state):
+        self.__init__(state['root'], state['provider'])
+
+    def _symbol_dir(self, symbol, interval):
+        safe_symbol = symbol.replace('/', '_').replace('\\', '_')
+        return os.path.join(self.root, interval, safe_symbol)
+
+    @contextmanager
+    def _locked(self, symbol, interval):
+        """Verrou exclusif du répertoire de symbol, entre threads et entre processus"""
+        key = (symbol, interval)
+        with self._lock:
+            lock = self._symbol_locks.setdefault(key, threading.Lock())
+        directory = self._symbol_dir(symbol, interval)
+        with lock:
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, '.lock'), 'a') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_meta(self, directory):
+        meta_path = os.path.join(directory, 'meta.json')
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        meta['coverage'] = [(pd.Timestamp(a), pd.Timestamp(b)) for a, b in meta['coverage']]
+        return meta
+
+    def _read_legacy(self, symbol, interval, directory, coverage):
+        """Convertit un répertoire de l'ancien format (une colonne .npy par champ) en segment"""
+        dates = np.load(os.path.join(directory, 'dates.npy'))
+        columns = {column: np.load(os.path.join(directory, f'{column}.npy')) for column in COLUMNS}
+        frame = pd.DataFrame(columns, index=pd.DatetimeIndex(dates, name='Date'))
+        self._write(symbol, interval, frame, coverage)
+        for name in ['dates'] + COLUMNS:
+            os.remove(os.path.join(directory, f'{name}.npy'))
+
+    def _segment(self, symbol, interval):
+        """
+        Segment des barres de symbol (tableau (SEGMENT_ROWS, barres) mappé en
+        lecture seule) et plages couvertes ; (None, []) si rien n'est en cache
+        """
+        directory = self._symbol_dir(symbol, interval)
+        while True:
+            meta = self._read_meta(directory)
+            if meta is None:
+                return None, []
+            # Index antérieur aux versions : segment bars.npy ou colonnes séparées
+            path = os.path.join(directory, meta.get('segment', 'bars.npy'))
+            if 'segment' not in meta and not os.path.exists(path):
+                with self._locked(symbol, interval):
+                    meta = self._read_meta(directory)
+                    if 'segment' not in meta and not os.path.exists(path):
+                        self._read_legacy(symbol, interval, directory, meta['coverage'])
+                continue
+            try:
+                return attach_segment(path), meta['coverage']
+            except FileNotFoundError:
+                # Version supprimée par un écrivain entre la lecture de l'index et l'ouverture
+                continue
+
+    def _read(self, symbol, interval):
+        block, coverage = self._segment(symbol, interval)
+        if block is None:
+            return _empty_frame(), coverage
+        columns = segment_columns(block)
+        frame = pd.DataFrame(columns, index=pd.DatetimeIndex(columns.pop('Date'), name='Date'), copy=False)
+        return frame, coverage
+
+    def _write(self, symbol, interval, frame, coverage):
+        directory = self._symbol_dir(symbol, interval)
+        os.makedirs(directory, exist_ok=True)
+
+        # Nouvelle version du segment : les lecteurs gardent l'ancienne jusqu'à leur prochain accès
+        fd, segment_path = tempfile.mkstemp(prefix='bars-', suffix='.npy', dir=directory)
+        os.close(fd)
+        segment = os.path.basename(segment_path)
+        rows = [frame.index.values] + [frame[column].to_numpy(dtype='float64') for column in COLUMNS]
+        write_segment(segment_path, rows)
+
+        meta = {
+            'symbol': symbol,
+            'interval': interval,
+            'segment': segment,
+            'rows': SEGMENT_ROWS,
+            'bars': len(frame),
+            'coverage': [[a.isoformat(), b.isoformat()] for a, b in coverage]
+        }
+        # Index écrit après le segment : un lecteur qui voit le nouvel index voit le nouveau segment
+        fd, tmp_path = tempfile.mkstemp(prefix='.meta-', suffix='.json', dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+            os.replace(tmp_path, os.path.join(directory, 'meta.json'))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self._discard_segments(directory, segment)
+
+    def _discard_segments(self, directory, current):
+        """
+        Supprime les versions du segment autres que current ; sous Windows, une
+        version encore mappée par un processus est gardée et retentée à
+        l'écriture suivante
+        """
+        for path in glob.glob(os.path.join(directory, 'bars*.npy')):
+            if os.path.basename(path) == current:
+                continue
+            forget_segment(path)
+            try:
+                os.remove(path)
+            except (FileNotFoundError, PermissionError):
+                pass
+
+    def _store(self, symbol, interval, fetched):
+        """
+        Fusionne les barres téléchargées dans le cache et enregistre les plages
+        couvertes ; le cache est relu sous verrou, avec ce qu'y ont ajouté les
+        autres écrivains depuis la décision de télécharger
+        """
+        with self._locked(symbol, interval):
+            frame, coverage = self._read(symbol, interval)
+            return self._merge(symbol, interval, frame, coverage, fetched)
+
+    def _merge(self, symbol, interval, frame, coverage, fetched):
+        # La journée en cours n'est jamais marquée comme couverte : sa barre n'est pas définitive
+        horizon = pd.Timestamp.today().normalize()
+        if all(bars.empty for _, bars in fetched):
+            return frame
+        updated = False
+        for (range_start, range_end), bars in fetched:
+            # Réponse vide (erreur réseau, limite de débit, symbole absent d'un
+            # lot) : la plage n'est pas marquée couverte et sera redemandée
+            if bars.empty:
+                continue
+            updated = updated or _has_new_bars(frame, bars)
+            frame = pd.concat([frame, bars])
+            covered_end = min(range_end, horizon)
+            if covered_end > range_start:
+                coverage = coverage + [(range_start, covered_end)]
+
+        frame = frame[~frame.index.duplicated(keep='last')].sort_index()
+        coverage = _merge_ranges(coverage)
+        self._write(symbol, interval, frame, coverage)
+        if updated:
+            _notify_update(symbol, interval)
+        return frame
+
+    def arrays(self, symbol, start_date, end_date, interval='1d'):
+        """
+        Barres de symbol dans [start_date, end_date), en ne téléchargeant que
+        les plages absentes du cache
+
+        Returns:
+            dict: {'Date': dates, colonne OHLCV: valeurs}, vues en lecture
+            seule sur le segment partagé (aucune copie)
+        """
+        start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+
+        block, coverage = self._segment(symbol, interval)
+        missing = _missing_ranges(coverage, start, end)
+        if missing:
+            fetched = [((a, b), self.provider.fetch(symbol, a, b, interval))
+                       for range_start, range_end in missing
+                       for a, b in split_range(range_start, range_end, interval)]
+            self._store(symbol, interval, fetched)
+            block, _ = self._segment(symbol, interval)
+
+        if block is None:
+            return {'Date': _empty_frame().index.values, **{column: np.empty(0) for column in COLUMNS}}
+        dates = as_dates(block[0])
+        lo, hi = np.searchsorted(dates, [start.to_datetime64(), end.to_datetime64()])
+        return segment_columns(block, lo, hi)
+
+    def load(self, symbol, start_date, end_date, interval='1d'):
+        """
+        Retourne les barres de symbol dans [start_date, end_date), en ne
+        téléchargeant que les plages absentes du cache
+
+        Returns:
+            DataFrame avec une colonne Date et les colonnes OHLCV (colonnes en
+            lecture seule, vues sur le segment partagé)
+        """
+        return pd.DataFrame(self.arrays(symbol, start_date, end_date, interval), copy=False)
+
+    def load_many(self, symbols, start_date, end_date, interval='1d'):
+        """
+        Complète le cache pour plusieurs symboles avec un seul appel groupé au
+        fournisseur, couvrant l'union des plages manquantes
+
+        Returns:
+            list: symboles pour lesquels des données ont été téléchargées
+        """
+        start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+
+        missing = {}
+        for symbol in symbols:
+            _, coverage = self._segment(symbol, interval)
+            ranges = _missing_ranges(coverage, start, end)
+            if ranges:
+                missing[symbol] = ranges
+        if not missing:
+            return []
+
+        fetch_start = min(ranges[0][0] for ranges in missing.values())
+        fetch_end = max(ranges[-1][1] for ranges in missing.values())
+        chunks = [(chunk, self.provider.fetch_many(list(missing), *chunk, interval))
+                  for chunk in split_range(fetch_start, fetch_end, interval)]
+
+        loaded = []
+        for symbol in missing:
+            # Symbole absent de la réponse groupée : rien n'est enregistré, il sera redemandé
+            fetched = [(chunk, frames[symbol]) for chunk, frames in chunks
+                       if symbol in frames and not frames[symbol].empty]
+            if fetched:
+                self._store(symbol, interval, fetched)
+                loaded.append(symbol)
+        return loaded
+
+
+_default_store = None
+
+
+def get_price_store():
+    """Retourne le cache de cours partagé par le processus"""
+    global _default_store
+    if _default_store is None:
+        _default_store = PriceStore()
+    return _default_store
+
+
+def set_price_store(store):
+    """Remplace le cache partagé (ex : PriceStore branché sur un CsvProvider pour les tests)"""
+    global _default_store
+    _default_store = store
+
+
+def load_prices(symbol, start_date, end_date, interval='1d'):
+    """Charge les cours de symbol via le cache partagé"""
+    return get_price_store().load(symbol, start_date, end_date, interval)
+
+
+def price_arrays(symbol, start_date, end_date, interval='1d'):
+    """Séries de cours de symbol via le cache partagé, sans copie (voir PriceStore.arrays)"""
+    return get_price_store().arrays(symbol, start_date, end_date, interval)
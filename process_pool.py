@@ -0,0 +1,81 @@
+"""
+Pool de processus partagé par les calculs lourds (optimisation, lots de symboles...)
+
+Le pool est créé à la première demande puis réutilisé : démarrer des
+processus et importer pandas à chaque requête coûterait plus cher que les
+simulations elles-mêmes.
+"""
+
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+DEFAULT_MAX_WORKERS = int(os.environ.get('PYTRADER_MAX_WORKERS', os.cpu_count() or 1))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_process_pool():
+    """Retourne le pool de processus du serveur (créé à la demande)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=DEFAULT_MAX_WORKERS)
+        return _pool
+
+
+def shutdown_process_pool(wait=True):
+    """Arrête le pool (fin de processus, arrêt du serveur)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=wait, cancel_futures=True)
+            _pool = None
+
+
+def split_chunks(items, n_chunks):
+    """Découpe items en au plus n_chunks listes contiguës de tailles proches"""
+    n_chunks = max(1, min(n_chunks, len(items)))
+    size, extra = divmod(len(items), n_chunks)
+    chunks = []
+    start = 0
+    for k in range(n_chunks):
+        end = start + size + (1 if k < extra else 0)
+        chunks.append(items[start:end])
+        start = end
+    return chunks
+
+
+def run_bounded(func, tasks, max_workers):
+    """
+    Exécute func(*args) pour chaque args de tasks sur le pool partagé, avec au
+    plus max_workers tâches soumises à la fois : l'appelant limite ainsi son
+    parallélisme quelle que soit la taille du pool
+
+    Returns:
+        list: résultats dans l'ordre de tasks
+    """
+    pool = get_process_pool()
+    results = [None] * len(tasks)
+    queue = iter(enumerate(tasks))
+    pending = {}
+
+    def submit_next():
+        item = next(queue, None)
+        if item is not None:
+            pending[pool.submit(func, *item[1])] = item[0]
+
+    for _ in range(max(1, max_workers)):
+        submit_next()
+    try:
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[pending.pop(future)] = future.result()
+                submit_next()
+    except BaseException:
+        for future in pending:
+            future.cancel()
+        raise
+    return results
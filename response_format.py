@@ -0,0 +1,97 @@
+"""
+Encodage négocié des résultats d'analyse : JSON ou MessagePack en colonnes typées
+
+Le JSON reste le format par défaut. Un client qui envoie
+Accept: application/x-msgpack reçoit le même résultat en colonnes : chaque
+série du graphique et chaque colonne numérique des transactions devient un
+bloc float64 petit-boutiste (extension MessagePack FLOAT64_EXT, NaN pour les
+trous) que le navigateur lit directement en Float64Array, sans analyser une
+liste de nombres. Les deux formats sont compressés en gzip si le client
+l'accepte et que la réponse dépasse COMPRESSION_MIN_BYTES.
+"""
+
+import zlib
+
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:  # msgpack est optionnel : seul le format binaire en dépend
+    msgpack = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/x-msgpack'
+
+# Code d'extension MessagePack d'un tableau float64 petit-boutiste
+FLOAT64_EXT = 1
+
+# Colonnes numériques des transactions envoyées en tableaux typés
+TRANSACTION_NUMBERS = ('price', 'quantity', 'capital')
+TRANSACTION_FIELDS = ('date', 'action') + TRANSACTION_NUMBERS
+
+# En dessous, la compression coûte plus qu'elle ne fait gagner
+COMPRESSION_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+
+
+def available_mimetypes():
+    """Types de réponse servis, par ordre de préférence en cas d'égalité (JSON d'abord)"""
+    return [JSON_MIMETYPE] + ([MSGPACK_MIMETYPE] if msgpack is not None else [])
+
+
+def negotiate(accept_mimetypes):
+    """Type de réponse à partir de l'en-tête Accept (request.accept_mimetypes), JSON par défaut"""
+    return accept_mimetypes.best_match(available_mimetypes(), default=JSON_MIMETYPE)
+
+
+def _float_column(values):
+    """Liste de nombres (None pour les trous) en tableau float64 (NaN pour les trous)"""
+    return np.asarray(values, dtype=np.float64) if len(values) else np.empty(0, dtype=np.float64)
+
+
+def columnar(formatted):
+    """
+    Résultat formaté (format_results_for_frontend) en colonnes : séries du
+    graphique et colonnes numériques des transactions en tableaux float64
+    """
+    result = dict(formatted)
+    chart = formatted.get('chartData')
+    if chart is not None:
+        result['chartData'] = {name: values if name == 'labels' else _float_column(values)
+                               for name, values in chart.items()}
+    transactions = formatted.get('transactions')
+    if transactions is not None:
+        columns = {field: [row[field] for row in transactions] for field in TRANSACTION_FIELDS}
+        for field in TRANSACTION_NUMBERS:
+            columns[field] = _float_column(columns[field])
+        result['transactions'] = columns
+    return result
+
+
+def _msgpack_default(value):
+    if isinstance(value, np.ndarray):
+        return msgpack.ExtType(FLOAT64_EXT, np.ascontiguousarray(value, dtype='<f8').tobytes())
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Type non sérialisable: {type(value).__name__}")
+
+
+def encode_msgpack(formatted):
+    """Résultat formaté encodé en MessagePack, en colonnes (voir columnar)"""
+    if msgpack is None:
+        raise ValueError("Format MessagePack indisponible: msgpack n'est pas installé")
+    return msgpack.packb(columnar(formatted), default=_msgpack_default, use_bin_type=True)
+
+
+def compress(body, accept_encodings):
+    """
+    Compresse body en gzip si le client l'accepte (request.accept_encodings)
+
+    Returns:
+        (corps, valeur de Content-Encoding ou None)
+    """
+    if len(body) < COMPRESSION_MIN_BYTES or not accept_encodings['gzip']:
+        return body, None
+    # wbits=31 : en-tête et somme de contrôle gzip
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(body) + compressor.flush(), 'gzip'
@@ -0,0 +1,131 @@
+"""
+Cache des résultats d'analyse (LRU en mémoire, second niveau optionnel sur disque)
+
+Les entrées sont indexées par les paramètres de la demande et la version du
+code de la stratégie ; elles sont invalidées dès que de nouvelles barres
+arrivent pour le symbole (voir price_store.add_update_listener).
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+def make_key(symbol, start_date, end_date, strategy, version, *options):
+    """Clé de cache d'une analyse (options : paramètres de formatage qui changent le résultat)"""
+    return (symbol, start_date, end_date, strategy, str(version)) + options
+
+
+class ResultCache:
+    """
+    Cache LRU borné, thread-safe
+
+    Args:
+        max_entries: nombre d'entrées gardées en mémoire
+        disk_dir: répertoire du niveau disque (None pour le désactiver)
+    """
+
+    def __init__(self, max_entries=256, disk_dir=None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(json.dumps(key).encode('utf-8')).hexdigest()
+        safe_symbol = key[0].replace('/', '_').replace('\\', '_')
+        return os.path.join(self.disk_dir, f'{safe_symbol}__{digest}.pkl')
+
+    def _remember(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key):
+        """Retourne le résultat en cache, ou None"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+            if self.disk_dir:
+                path = self._disk_path(key)
+                try:
+                    with open(path, 'rb') as f:
+                        value = pickle.load(f)
+                except (OSError, pickle.UnpicklingError, EOFError):
+                    value = None
+                if value is not None:
+                    self._remember(key, value)
+                    self.disk_hits += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._remember(key, value)
+            if self.disk_dir:
+                # Fichier temporaire propre à l'écrivain : les processus qui partagent le répertoire
+                # (workers, CLI) ne remplacent jamais l'entrée par un fichier à moitié écrit
+                fd, tmp_path = tempfile.mkstemp(prefix='.entry-', suffix='.pkl', dir=self.disk_dir)
+                try:
+                    with os.fdopen(fd, 'wb') as f:
+                        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    os.replace(tmp_path, self._disk_path(key))
+                except BaseException:
+                    os.remove(tmp_path)
+                    raise
+
+    def invalidate_symbol(self, symbol, interval=None):
+        """Supprime toutes les entrées du symbole (nouvelles barres disponibles)"""
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == symbol]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+            if self.disk_dir:
+                safe_symbol = symbol.replace('/', '_').replace('\\', '_')
+                prefix = f'{safe_symbol}__'
+                for name in os.listdir(self.disk_dir):
+                    if name.startswith(prefix):
+                        try:
+                            os.remove(os.path.join(self.disk_dir, name))
+                        except FileNotFoundError:
+                            # Déjà supprimée par un autre processus
+                            pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'capacity': self.max_entries,
+                'hits': self.hits,
+                'diskHits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hitRate': round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+                'disk': bool(self.disk_dir)
+            }
@@ -0,0 +1,183 @@
+"""
+Segments partagés : séries float64 en mémoire mappée, communes à tous les processus
+
+Un segment est un fichier .npy à deux dimensions dont chaque ligne est une
+série contiguë (dates datetime64[ns] rangées bit à bit, colonnes OHLCV,
+SMA...). Les processus qui l'ouvrent (workers du serveur, pool de calcul,
+scripts de lot) mappent le même fichier : ses pages sont partagées par le
+cache du système, la mémoire reste stable quel que soit le nombre de
+processus et d'analyses simultanées, et les séries renvoyées sont des vues
+en lecture seule, sans copie.
+
+Un segment n'est jamais modifié en place : il est réécrit dans un nouveau
+fichier (voir PriceStore, qui en garde des versions successives) ; un
+processus qui lit l'ancienne version la garde jusqu'à son accès suivant.
+Windows refuse de remplacer ou de supprimer un fichier mappé : le mapping
+du processus courant est libéré avant, et une suppression refusée est
+ignorée.
+"""
+
+import os
+import tempfile
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+# Répertoire des segments temporaires (mémoire vive sous Linux)
+SHARED_DIR = os.environ.get(
+    'PYTRADER_SHARED_DIR',
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+)
+
+# Segments gardés mappés par processus (les pages restent dans le cache du système)
+MAX_MAPPED_SEGMENTS = int(os.environ.get('PYTRADER_MAX_SEGMENTS', 256))
+
+
+def _as_row(values):
+    """Série en float64 ; dates et entiers conservés bit à bit (voir as_dates)"""
+    values = np.asarray(values)
+    if values.dtype.kind == 'M':
+        return values.astype('datetime64[ns]').view(np.int64).view(np.float64)
+    if values.dtype.kind in 'iu':
+        return values.astype(np.int64).view(np.float64)
+    return values.astype(np.float64, copy=False)
+
+
+def as_dates(row):
+    """Ligne de dates d'un segment en datetime64[ns] (vue, sans copie)"""
+    return row.view(np.int64).view('datetime64[ns]')
+
+
+def write_segment(path, rows):
+    """
+    Écrit un segment (remplacement atomique)
+
+    Args:
+        path: fichier .npy
+        rows: séries de même longueur, une ligne chacune
+    """
+    n = len(rows[0]) if len(rows) else 0
+    block = np.empty((len(rows), n), dtype=np.float64)
+    for k, values in enumerate(rows):
+        block[k] = _as_row(values)
+    # Fichier temporaire propre à l'écrivain, dans le répertoire cible (même système de fichiers)
+    fd, tmp_path = tempfile.mkstemp(prefix='.segment-', suffix='.npy', dir=os.path.dirname(path) or '.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, block)
+        # Mapping de l'ancienne version libéré : Windows refuse de remplacer un fichier mappé
+        forget_segment(path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+class _MappedSegments:
+    """Mappings des segments ouverts par le processus, réutilisés tant que le fichier n'a pas été remplacé"""
+
+    def __init__(self, max_entries=MAX_MAPPED_SEGMENTS):
+        self.max_entries = max_entries
+        self._segments = OrderedDict()
+        self._lock = threading.Lock()
+
+    def attach(self, path):
+        stat = os.stat(path)
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._segments.get(path)
+            if entry is not None and entry[0] == signature:
+                self._segments.move_to_end(path)
+                return entry[1]
+        block = np.load(path, mmap_mode='r')
+        with self._lock:
+            self._segments[path] = (signature, block)
+            self._segments.move_to_end(path)
+            while len(self._segments) > self.max_entries:
+                self._segments.popitem(last=False)
+        return block
+
+    def forget(self, path):
+        with self._lock:
+            self._segments.pop(path, None)
+
+    def stats(self):
+        with self._lock:
+            blocks = [block for _, block in self._segments.values()]
+        return {'segments': len(blocks), 'bytes': int(sum(block.nbytes for block in blocks))}
+
+
+_mapped = _MappedSegments()
+
+
+def attach_segment(path):
+    """
+    Segment path mappé en lecture seule, tableau (lignes, barres) sans copie
+
+    Raises:
+        FileNotFoundError: segment absent
+    """
+    return _mapped.attach(path)
+
+
+def forget_segment(path):
+    """Libère le mapping de path dans ce processus (segment supprimé)"""
+    _mapped.forget(path)
+
+
+def mapped_stats():
+    """Segments mappés par ce processus et taille des données partagées"""
+    return _mapped.stats()
+
+
+class SegmentHandle(namedtuple('SegmentHandle', ['path', 'names'])):
+    """Référence à un segment transmise aux processus du pool à la place des tableaux"""
+
+    __slots__ = ()
+
+    def attach(self):
+        """{nom: série en lecture seule}, vues sur le segment mappé"""
+        # Mapping non conservé : il disparaît avec les séries à la fin de la tâche
+        block = np.load(self.path, mmap_mode='r')
+        return {name: block[k] for k, name in enumerate(self.names)}
+
+
+class SharedArrays:
+    """
+    Séries publiées dans un segment temporaire le temps d'un calcul réparti
+
+        with SharedArrays({'price': price, **smas}) as shared:
+            futures = [pool.submit(task, shared.handle, chunk) for chunk in chunks]
+            rows = [future.result() for future in futures]
+
+    Args:
+        arrays: {nom: série}, toutes de même longueur
+    """
+
+    def __init__(self, arrays, directory=SHARED_DIR):
+        fd, self.path = tempfile.mkstemp(prefix='pytrader-', suffix='.npy', dir=directory)
+        os.close(fd)
+        try:
+            write_segment(self.path, list(arrays.values()))
+        except BaseException:
+            self.close()
+            raise
+        self.handle = SegmentHandle(self.path, list(arrays))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Supprime le segment (les processus qui le lisent encore gardent leur mapping)"""
+        forget_segment(self.path)
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        except PermissionError:
+            # Windows : segment encore mappé par un processus du pool, laissé au répertoire temporaire
+            pass
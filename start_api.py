@@ -4,11 +4,23 @@ Script de démarrage pour l'API PyTrader
 Utilise directement FRA.py et USA.py
 """
 
+import argparse
+import re
 import subprocess
 import sys
 import os
+from importlib import metadata
 from pathlib import Path
 
+try:
+    from packaging.specifiers import InvalidSpecifier, SpecifierSet
+except ImportError:  # sans packaging, seule la présence des paquets est vérifiée
+    SpecifierSet = None
+
+# Dépendances de l'API, et celles du mode production en plus (serveur gunicorn, export Parquet)
+REQUIREMENTS = "requirements.txt"
+PRODUCTION_REQUIREMENTS = "requirements-prod.txt"
+
 def check_python_version():
     """Vérifier la version de Python"""
     if sys.version_info < (3, 8):
@@ -16,19 +28,43 @@ def check_python_version():
         sys.exit(1)
     print(f"✅ Python {sys.version.split()[0]} détecté")
 
-def install_dependencies():
-    """Installer les dépendances"""
-    print("📦 Installation des dépendances...")
+def read_requirements(path="requirements.txt"):
+    """Lignes de dépendances d'un fichier requirements (sans commentaires ni options -r)"""
+    if not Path(path).exists():
+        return []
+    lines = [line.split("#", 1)[0].strip() for line in Path(path).read_text(encoding="utf-8").splitlines()]
+    return [line for line in lines if line and not line.startswith("-")]
+
+def is_satisfied(requirement):
+    """Vrai si le paquet est installé dans une version compatible"""
+    match = re.match(r"^([A-Za-z0-9_.\-]+)(\[[^\]]*\])?\s*(.*)$", requirement)
+    if not match:
+        return False
+    name, specifier = match.group(1), match.group(3).split(";", 1)[0].strip()
     try:
-        # Installer flask et flask-cors pour l'API
-        subprocess.run([
-            sys.executable, "-m", "pip", "install", "flask", "flask-cors"
-        ], check=True)
-        
-        # Installer les dépendances existantes
-        subprocess.run([
-            sys.executable, "-m", "pip", "install", "-r", "requirements.txt"
-        ], check=True)
+        version = metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return False
+    if not specifier or SpecifierSet is None:
+        return True
+    try:
+        return SpecifierSet(specifier).contains(version, prereleases=True)
+    except InvalidSpecifier:
+        return True
+
+def install_dependencies(production=False):
+    """Installer les dépendances manquantes (rien à faire si tout est déjà installé)"""
+    requirements = read_requirements(REQUIREMENTS)
+    if production:
+        requirements += read_requirements(PRODUCTION_REQUIREMENTS)
+    missing = [requirement for requirement in requirements if not is_satisfied(requirement)]
+    if not missing:
+        print("✅ Dépendances déjà installées")
+        return
+    
+    print(f"📦 Installation des dépendances: {', '.join(missing)}")
+    try:
+        subprocess.run([sys.executable, "-m", "pip", "install", *missing], check=True)
         print("✅ Dépendances installées")
     except subprocess.CalledProcessError:
         print("❌ Erreur lors de l'installation des dépendances")
@@ -45,22 +81,35 @@ def check_scripts():
     print("✅ Scripts FRA.py et USA.py trouvés")
     return True
 
-def start_api():
-    """Démarrer l'API Flask"""
-    print("🚀 Démarrage de l'API PyTrader...")
+def start_api(production=False):
+    """Démarrer l'API Flask (serveur de développement, ou gunicorn en production)"""
+    print(f"🚀 Démarrage de l'API PyTrader{' (production)' if production else ''}...")
     print("📍 URL: http://localhost:5000")
     print("📊 Utilise directement:")
     print("   🇫🇷 FRA.py pour la stratégie France")
     print("   🇺🇸 USA.py pour la stratégie USA")
     print("📊 Endpoints:")
     print("   POST /api/analyze - Analyser avec FRA.py ou USA.py")
-    print("   POST /api/export - Exporter les transactions")
+    print("   POST /api/optimize - Optimiser les paramètres d'une stratégie")
+    print("   POST /api/walkforward - Backtest walk-forward (optimisation / validation)")
+    print("   POST /api/intraday - Backtest sur barres intraday (1m, 5m...)")
+    print("   POST /api/montecarlo - Robustesse Monte Carlo (trajectoires rééchantillonnées)")
+    print("   POST /api/batch - Analyser un univers de symboles")
+    print("   POST /api/portfolio - Backtest multi-symboles à trésorerie commune")
+    print("   POST /api/jobs - Soumettre une analyse asynchrone")
+    print("   POST /api/export - Exporter les transactions (CSV, Parquet, Excel)")
     print("   GET /api/health - Vérification de santé")
+    print("   GET /api/metrics - Métriques Prometheus")
     print("\n🔄 Pour arrêter l'API, appuyez sur Ctrl+C")
     print("-" * 50)
     
+    if production:
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"]
+    else:
+        command = [sys.executable, "api_server.py"]
+    
     try:
-        subprocess.run([sys.executable, "api_server.py"], check=True)
+        subprocess.run(command, check=True)
     except KeyboardInterrupt:
         print("\n🛑 API arrêtée par l'utilisateur")
     except subprocess.CalledProcessError as e:
@@ -69,6 +118,12 @@ def start_api():
 
 def main():
     """Fonction principale"""
+    parser = argparse.ArgumentParser(description="Démarrage de l'API PyTrader")
+    parser.add_argument("--prod", action="store_true",
+                        help="Mode production : gunicorn (workers préchargés, voir gunicorn.conf.py)")
+    parser.add_argument("--skip-install", action="store_true", help="Ne pas vérifier les dépendances")
+    args = parser.parse_args()
+    
     print("🐍 PyTrader API Starter")
     print("=" * 30)
     
@@ -84,11 +139,16 @@ def main():
         print("❌ api_server.py non trouvé")
         sys.exit(1)
     
-    # Installer les dépendances
-    install_dependencies()
+    if args.prod and os.name == "nt":
+        print("❌ gunicorn n'est pas disponible sous Windows : lancez sans --prod")
+        sys.exit(1)
+    
+    # Installer les dépendances manquantes
+    if not args.skip_install:
+        install_dependencies(production=args.prod)
     
     # Démarrer l'API
-    start_api()
+    start_api(production=args.prod)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,475 @@
+"""
+Stratégies déclaratives compilées vers le moteur de backtest commun
+
+Une stratégie est décrite par une spécification (dict Python ou fichier
+JSON) : indicateurs, règle d'achat, règles de sortie, stops et
+dimensionnement. Les conditions sont évaluées en bloc sur les tableaux du
+graphe d'indicateurs, puis le moteur événementiel (execution.py : exécution
+à la barre suivante, stops et limites en attente, frais) déroule la
+récursion trésorerie / position : une nouvelle stratégie tourne d'emblée
+dans le même moteur que les stratégies FRA et USA, et l'API la sert dès
+qu'elle est enregistrée.
+
+    {
+        "name": "MACD",
+        "label": "📈",
+        "version": 1,
+        "source": "Close",
+        "capital": 100000,
+        "params": {"fast": 12, "slow": 26, "stop_loss": 0.92},
+        "grid": {"fast": [8, 12, 16], "slow": [21, 26, 35], "stop_loss": [0.9, 0.95]},
+        "ordered": ["fast", "slow"],
+        "indicators": {
+            "MACD": {"type": "macd", "fast": "$fast", "slow": "$slow"},
+            "SIGNAL": {"type": "macd_signal", "fast": "$fast", "slow": "$slow"}
+        },
+        "entry": ["cross_above", "MACD", "SIGNAL"],
+        "exits": [
+            {"when": ["cross_below", "MACD", "SIGNAL"], "sell_pct": 100},
+            {"stop_loss": "$stop_loss"}
+        ],
+        "chart": {"sma5": "MACD", "sma35": "SIGNAL"}
+    }
+
+Expressions : listes [opérateur, opérandes...] (voir OPERATORS) ; un
+opérande est 'price' (colonne source de la stratégie), une colonne de cours
+('Open', 'Close'...), un indicateur déclaré, un nombre ou un paramètre
+'$nom'. Les spécifications JSON du répertoire PYTRADER_STRATEGY_DIR sont
+enregistrées au premier accès au registre.
+"""
+
+import glob
+import json
+import os
+import threading
+
+import numpy as np
+
+from analytics import performance
+from engine import (EXCLUSIVE, RULE_SIGNAL, RULE_STOP_LOSS, RULE_TAKE_PROFIT, RULE_TRAILING_STOP,
+                    SEQUENTIAL, SIZING_FLOOR, SIZING_TRUNCATE)
+from execution import make_costs, simulate_events
+from indicators import INDICATORS, indicator, indicator_graph, warmup
+from ledger import OrderType, TradeLedger
+from metrics import stage_timer
+from price_store import COLUMNS, load_prices
+
+DEFAULT_STRATEGY_DIR = os.environ.get('PYTRADER_STRATEGY_DIR')
+
+MODES = {'sequential': SEQUENTIAL, 'exclusive': EXCLUSIVE}
+SIZINGS = {'floor': SIZING_FLOOR, 'truncate': SIZING_TRUNCATE}
+
+# Clé d'une règle de sortie -> type de règle du moteur
+EXIT_KINDS = {
+    'when': RULE_SIGNAL,
+    'stop_loss': RULE_STOP_LOSS,
+    'take_profit': RULE_TAKE_PROFIT,
+    'trailing_stop': RULE_TRAILING_STOP
+}
+
+# Courbes du graphique du frontend (format_results_for_frontend)
+CHART_SLOTS = ('sma5', 'sma35', 'sma65')
+
+
+def _shift(values, periods):
+    shifted = np.full(len(values), np.nan)
+    if periods < len(values):
+        shifted[periods:] = values[:len(values) - periods]
+    return shifted
+
+
+def _compare(op):
+    def apply(a, b):
+        with np.errstate(invalid='ignore'):
+            return op(a, b)
+    return apply
+
+
+def _cross_above(a, b):
+    with np.errstate(invalid='ignore'):
+        return (a > b) & (_shift(a, 1) <= _shift(b, 1))
+
+
+def _cross_below(a, b):
+    with np.errstate(invalid='ignore'):
+        return (a < b) & (_shift(a, 1) >= _shift(b, 1))
+
+
+def _all(*values):
+    return np.logical_and.reduce(values)
+
+
+def _any(*values):
+    return np.logical_or.reduce(values)
+
+
+# Opérateur -> (nombre d'opérandes, None si variable ; fonction sur tableaux)
+OPERATORS = {
+    '>': (2, _compare(np.greater)),
+    '<': (2, _compare(np.less)),
+    '>=': (2, _compare(np.greater_equal)),
+    '<=': (2, _compare(np.less_equal)),
+    '+': (2, np.add),
+    '-': (2, np.subtract),
+    '*': (2, np.multiply),
+    '/': (2, _compare(np.divide)),
+    'and': (None, _all),
+    'or': (None, _any),
+    'not': (1, np.logical_not),
+    'prev': (None, lambda values, periods=1: _shift(values, int(periods))),
+    'cross_above': (2, _cross_above),
+    'cross_below': (2, _cross_below)
+}
+
+
+class StrategySpec:
+    """
+    Spécification validée d'une stratégie
+
+    Args:
+        spec: dict (voir l'exemple en tête de module) ; les clés optionnelles
+            sont mode ('sequential' : achat puis sorties sur la même barre, la
+            dernière règle vérifiée l'emporte ; 'exclusive' : achat, sinon la
+            première règle vérifiée), sizing ('floor' / 'truncate'),
+            reset_on_exit, require_indicators (barres ignorées tant qu'un
+            indicateur vaut NaN), first_bar, chart ({courbe: indicateur}),
+            costs (frais du moteur événementiel, voir execution.make_costs :
+            false pour aucun frais), entry_limit (achats en ordre limite à
+            prix de décision * entry_limit au lieu d'ordres au marché), grid
+            (valeurs balayées par défaut par l'optimiseur, {paramètre:
+            [valeurs]}) et ordered (fenêtres à garder strictement croissantes
+            dans un balayage, ex : SMA courte < moyenne < longue)
+    """
+
+    def __init__(self, spec):
+        try:
+            self.name = str(spec['name'])
+            self.source = spec['source']
+            self.capital = spec['capital']
+            self.entry = spec['entry']
+        except KeyError as e:
+            raise ValueError(f"Spécification incomplète: champ {e.args[0]} manquant") from None
+        self.label = spec.get('label', '📈')
+        self.description = spec.get('description', '')
+        self.version = int(spec.get('version', 1))
+        self.defaults = dict(spec.get('params', {}))
+        self.indicators = dict(spec.get('indicators', {}))
+        self.exits = list(spec.get('exits', []))
+        self.mode = self._choice(spec.get('mode', 'sequential'), MODES, 'mode')
+        self.sizing = self._choice(spec.get('sizing', 'floor'), SIZINGS, 'sizing')
+        self.reset_on_exit = bool(spec.get('reset_on_exit', False))
+        self.require_indicators = bool(spec.get('require_indicators', False))
+        self.first_bar = int(spec.get('first_bar', 0))
+        self.chart = dict(spec.get('chart', {}))
+        self.costs = make_costs(spec.get('costs'))
+        self.entry_limit = spec.get('entry_limit')
+        self.grid = {name: list(values) for name, values in spec.get('grid', {}).items()}
+        self.ordered = list(spec.get('ordered', []))
+        self.spec = spec
+        self._validate()
+
+    def __repr__(self):
+        return f'StrategySpec({self.name!r}, version={self.version})'
+
+    @staticmethod
+    def _choice(value, choices, field):
+        if value not in choices:
+            raise ValueError(f"{field} invalide: {value} ({', '.join(choices)})")
+        return choices[value]
+
+    def _validate(self):
+        if self.source not in COLUMNS:
+            raise ValueError(f"Colonne source inconnue: {self.source}")
+        for column, declaration in self.indicators.items():
+            if declaration.get('type') not in INDICATORS:
+                raise ValueError(f"Indicateur {column}: type inconnu {declaration.get('type')}")
+            self._check_operand(declaration.get('source', self.source), allow_numbers=False)
+        self._check_expression(self.entry)
+        for rule in self.exits:
+            kinds = [key for key in EXIT_KINDS if key in rule]
+            if len(kinds) != 1:
+                raise ValueError(f"Règle de sortie invalide: {rule} (une clé parmi {', '.join(EXIT_KINDS)})")
+            if kinds[0] == 'when':
+                self._check_expression(rule['when'])
+            if rule.get('order', 'VENTE') not in OrderType.__members__ or rule.get('order') == 'ACHAT':
+                raise ValueError(f"Type d'ordre de sortie invalide: {rule.get('order')}")
+        if self.entry_limit is not None:
+            self._check_operand(self.entry_limit)
+        for name in list(self.grid) + self.ordered:
+            if name not in self.defaults:
+                raise ValueError(f"Paramètre non déclaré: {name}")
+        for slot, column in self.chart.items():
+            if slot not in CHART_SLOTS:
+                raise ValueError(f"Courbe inconnue: {slot} ({', '.join(CHART_SLOTS)})")
+            if column not in self.indicators:
+                raise ValueError(f"Courbe {slot}: indicateur non déclaré {column}")
+
+    def _check_operand(self, operand, allow_numbers=True):
+        if isinstance(operand, bool) or (isinstance(operand, (int, float)) and not allow_numbers):
+            raise ValueError(f"Opérande invalide: {operand!r}")
+        if isinstance(operand, (int, float)):
+            return
+        if isinstance(operand, str) and operand.startswith('$'):
+            if operand[1:] not in self.defaults:
+                raise ValueError(f"Paramètre non déclaré: {operand}")
+        elif operand not in self.indicators and operand not in COLUMNS and operand != 'price':
+            raise ValueError(f"Opérande inconnu: {operand!r}")
+
+    def _check_expression(self, expression):
+        if not isinstance(expression, list):
+            self._check_operand(expression)
+            return
+        if not expression or expression[0] not in OPERATORS:
+            raise ValueError(f"Opérateur inconnu: {expression[:1]} ({', '.join(OPERATORS)})")
+        arity = OPERATORS[expression[0]][0]
+        if arity is not None and len(expression) - 1 != arity:
+            raise ValueError(f"{expression[0]} attend {arity} opérande(s): {expression}")
+        for operand in expression[1:]:
+            self._check_expression(operand)
+
+    # ------------------------------------------------------------------
+    # Compilation
+    # ------------------------------------------------------------------
+
+    def params(self, overrides=None):
+        """Paramètres par défaut complétés par overrides"""
+        overrides = overrides or {}
+        unknown = set(overrides) - set(self.defaults)
+        if unknown:
+            raise ValueError(f"Paramètres inconnus pour {self.name}: {', '.join(sorted(unknown))}")
+        return dict(self.defaults, **overrides)
+
+    @staticmethod
+    def _resolve(value, params):
+        if isinstance(value, str) and value.startswith('$'):
+            return params[value[1:]]
+        return value
+
+    def indicator_columns(self, params=None):
+        """Indicateurs de la stratégie, par colonne ajoutée au tableau de cours"""
+        params = self.params(params)
+        columns = {}
+        for column, declaration in self.indicators.items():
+            defaults = INDICATORS[declaration['type']].defaults
+            values = {name: type(defaults[name])(self._resolve(value, params))
+                      for name, value in declaration.items() if name not in ('type', 'source')}
+            columns[column] = indicator(declaration['type'], declaration.get('source', self.source), **values)
+        return columns
+
+    def entry_level(self, params=None):
+        """Prix limite d'achat en fraction du prix de décision (None : achats au marché)"""
+        if self.entry_limit is None:
+            return None
+        return float(self._resolve(self.entry_limit, self.params(params)))
+
+    def _shift(self, expression, params):
+        """Décalage maximal (en barres) des valeurs passées lues par une expression"""
+        if not isinstance(expression, list):
+            return 0
+        own = 0
+        if expression[0] == 'prev':
+            own = int(self._resolve(expression[2], params)) if len(expression) > 2 else 1
+        elif expression[0] in ('cross_above', 'cross_below'):
+            own = 1
+        return own + max((self._shift(operand, params) for operand in expression[1:]), default=0)
+
+    def shift(self, params=None):
+        """Barres précédentes lues par les conditions (prev, croisements) en plus de la barre courante"""
+        params = self.params(params)
+        expressions = [self.entry] + [rule['when'] for rule in self.exits if 'when' in rule]
+        return max(self._shift(expression, params) for expression in expressions)
+
+    def warmup(self, params=None):
+        """
+        Barres d'historique à fournir avant une barre pour que ses conditions
+        soient celles d'un calcul sur toute la série (voir indicators.warmup)
+        """
+        columns = self.indicator_columns(params)
+        return max((warmup(key) for key in columns.values()), default=0) + self.shift(params)
+
+    def _evaluate(self, expression, arrays, params):
+        if isinstance(expression, list):
+            func = OPERATORS[expression[0]][1]
+            return func(*[self._evaluate(operand, arrays, params) for operand in expression[1:]])
+        if isinstance(expression, str):
+            if expression.startswith('$'):
+                return float(params[expression[1:]])
+            return arrays[expression]
+        return float(expression)
+
+    def _condition(self, expression, arrays, params, n):
+        return np.broadcast_to(np.asarray(self._evaluate(expression, arrays, params), dtype=np.bool_), (n,))
+
+    def compile(self, graph, params=None):
+        """
+        Conditions de la stratégie sur les séries de graph (IndicatorGraph)
+
+        Returns:
+            (price, valid, entry, rules) : arguments de execution.simulate_events
+        """
+        params = self.params(params)
+        arrays = graph.compute(self.indicator_columns(params))
+        for column in COLUMNS:
+            arrays[column] = graph.source(column)
+        price = arrays['price'] = graph.source(self.source)
+        n = len(price)
+
+        valid = np.ones(n, dtype=np.bool_)
+        if self.require_indicators:
+            for column in self.indicators:
+                valid &= ~np.isnan(arrays[column])
+        entry = self._condition(self.entry, arrays, params, n)
+
+        rules = []
+        for rule in self.exits:
+            kind = next(key for key in EXIT_KINDS if key in rule)
+            order = int(OrderType[rule.get('order', 'VENTE')])
+            sell_pct = float(self._resolve(rule.get('sell_pct', 100.0), params))
+            if kind == 'when':
+                rules.append((RULE_SIGNAL, 0.0, sell_pct, order, self._condition(rule['when'], arrays, params, n)))
+            else:
+                rules.append((EXIT_KINDS[kind], float(self._resolve(rule[kind], params)), sell_pct, order))
+        return price, valid, entry, rules
+
+    def backtest(self, graph, params=None, capital=None, costs=None, state=None, start=None):
+        """
+        Backtest événementiel sur les barres OHLC de graph : décisions exécutées
+        à la barre suivante, stops et take-profit en ordres en attente, frais
+        costs (Costs ou déclaration, voir execution.make_costs ; self.costs par défaut)
+
+        state : état de fin d'une simulation précédente pour poursuivre ; la
+        première barre, qui doit chevaucher la dernière barre déjà simulée, ne
+        sert alors qu'aux valeurs précédentes des conditions. start (première
+        barre simulée) remplace cette barre de reprise quand graph commence par
+        plusieurs barres d'historique
+
+        Returns:
+            engine.Simulation (state : commissions et glissement payés)
+        """
+        params = self.params(params)
+        price, valid, entry, rules = self.compile(graph, params)
+        if start is None:
+            start = self.first_bar if state is None else max(self.first_bar, 1)
+        return simulate_events(
+            graph.source('Open'), graph.source('High'), graph.source('Low'), graph.source('Close'),
+            price, valid, entry, rules, self.capital if capital is None else capital,
+            self.mode, self.sizing, self.reset_on_exit, start=start,
+            costs=self.costs if costs is None else make_costs(costs), entry_limit=self.entry_level(params),
+            state=state
+        )
+
+
+# ---------------------------------------------------------------------------
+# Registre
+# ---------------------------------------------------------------------------
+
+STRATEGY_SPECS = {}
+_registry_lock = threading.Lock()
+_builtins_loaded = False
+
+
+def register_strategy(spec):
+    """Enregistre une stratégie (dict ou StrategySpec) ; retourne la StrategySpec"""
+    if not isinstance(spec, StrategySpec):
+        spec = StrategySpec(spec)
+    STRATEGY_SPECS[spec.name] = spec
+    return spec
+
+
+def load_strategy_dir(directory):
+    """Enregistre les spécifications *.json de directory ; retourne leurs noms"""
+    names = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.json'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            names.append(register_strategy(json.load(f)).name)
+    return names
+
+
+def _load_builtins():
+    global _builtins_loaded
+    if _builtins_loaded:
+        return
+    with _registry_lock:
+        if not _builtins_loaded:
+            # FRA.py et USA.py enregistrent leur spécification à l'import
+            import FRA  # noqa: F401
+            import USA  # noqa: F401
+            if DEFAULT_STRATEGY_DIR:
+                load_strategy_dir(DEFAULT_STRATEGY_DIR)
+            _builtins_loaded = True
+
+
+def get_strategy(name):
+    _load_builtins()
+    if name not in STRATEGY_SPECS:
+        raise ValueError(f"Stratégie inconnue: {name}")
+    return STRATEGY_SPECS[name]
+
+
+def available_strategies():
+    _load_builtins()
+    return list(STRATEGY_SPECS)
+
+
+# ---------------------------------------------------------------------------
+# Analyse d'un symbole
+# ---------------------------------------------------------------------------
+
+def run_strategy(strategy, symbol, start_date, end_date, interval='1d', params=None, costs=None,
+                 keep_frame=False):
+    """
+    Analyse un symbole avec une stratégie enregistrée
+
+    Args:
+        strategy: nom enregistré ou StrategySpec
+        interval: intervalle des barres ('1d', '1h', '5m'...)
+        params: paramètres remplaçant ceux de la spécification
+        costs: frais d'exécution remplaçant ceux de la spécification (False :
+            aucun frais, voir execution.make_costs)
+        keep_frame: ajoute 'frame' (cours et indicateurs) et 'fills'
+            (exécutions par barre) au résultat, pour les graphiques des scripts
+
+    Returns:
+        dict: symbol, final_capital, shares_remaining, initial_capital,
+        ledger, costs (commissions et glissement payés), performance
+        (analytics.performance), chart_data (dates, prices et courbes de
+        spec.chart)
+    """
+    spec = get_strategy(strategy) if isinstance(strategy, str) else strategy
+
+    with stage_timer(spec.name, 'download'):
+        stock_data = load_prices(symbol, start_date, end_date, interval=interval)
+    if stock_data.empty:
+        raise ValueError(f"Aucune donnée trouvée pour {symbol}")
+
+    with stage_timer(spec.name, 'indicators'):
+        graph = indicator_graph(symbol, interval, stock_data)
+        for column, values in graph.compute(spec.indicator_columns(params)).items():
+            stock_data[column] = values
+
+    with stage_timer(spec.name, 'decision_loop'):
+        simulation = spec.backtest(graph, params, costs=costs)
+    with stage_timer(spec.name, 'trade_log'):
+        ledger = TradeLedger.from_trades(simulation.trades, stock_data['Date'], symbol)
+    with stage_timer(spec.name, 'analytics'):
+        metrics = performance(simulation, spec.capital, stock_data['Date'].to_numpy())
+
+    chart_data = {'dates': stock_data['Date'].to_numpy(), 'prices': stock_data[spec.source].to_numpy()}
+    for slot, column in spec.chart.items():
+        chart_data[slot] = stock_data[column].to_numpy()
+
+    result = {
+        'symbol': symbol,
+        'final_capital': int(simulation.cash),
+        'shares_remaining': int(simulation.position),
+        'initial_capital': spec.capital,
+        'ledger': ledger,
+        'costs': {'commission': round(simulation.state['commission'], 2),
+                  'slippage': round(simulation.state['slippage'], 2)},
+        'performance': metrics,
+        'chart_data': chart_data
+    }
+    if keep_frame:
+        result['frame'] = stock_data
+        result['fills'] = simulation.fills
+    return result
@@ -0,0 +1,438 @@
+"""
+Moteur incrémental : indicateurs et stratégies mis à jour barre par barre
+
+Les indicateurs sont tenus par des états incrémentaux (sommes glissantes,
+moyennes exponentielles : O(1) par nouvelle barre) et chaque barre est
+exécutée par le moteur événementiel de /api/analyze (StrategySpec.backtest),
+qui reprend l'état de la barre précédente : un automate produit les mêmes
+ordres, frais compris, que l'analyse de l'historique. L'état complet
+(indicateurs, dernières valeurs, trésorerie, position, ordres en attente...)
+est sérialisable et persisté entre deux appels : ajouter la barre du jour à
+un historique de 20 ans ne relance pas toute la simulation.
+"""
+
+import hashlib
+import json
+import math
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from indicators import IndicatorGraph, dependencies, plan
+from ledger import ORDER_LABELS
+from price_store import COLUMNS, load_prices
+from strategies import get_strategy
+
+DEFAULT_STATE_DIR = os.environ.get(
+    'PYTRADER_STATE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'strategy_state')
+)
+
+
+class RollingMean:
+    """
+    Moyenne mobile simple sur window valeurs, en O(1) par mise à jour
+
+    Comme rolling(window).mean() de pandas : NaN tant que la fenêtre n'est pas
+    pleine ou qu'elle contient un NaN. La somme est recalculée à chaque tour
+    complet du tampon pour éviter la dérive des arrondis.
+    """
+
+    def __init__(self, window):
+        self.window = int(window)
+        self.buffer = [0.0] * self.window
+        self.position = 0
+        self.count = 0
+        self.nan_count = 0
+        self.total = 0.0
+        self.value = math.nan
+
+    def update(self, x):
+        old = self.buffer[self.position]
+        if self.count >= self.window:
+            if math.isnan(old):
+                self.nan_count -= 1
+            else:
+                self.total -= old
+        else:
+            self.count += 1
+
+        self.buffer[self.position] = x
+        if math.isnan(x):
+            self.nan_count += 1
+        else:
+            self.total += x
+
+        self.position += 1
+        if self.position == self.window:
+            self.position = 0
+            self.total = math.fsum(v for v in self.buffer if not math.isnan(v))
+
+        if self.count < self.window or self.nan_count:
+            self.value = math.nan
+        else:
+            self.value = self.total / self.window
+        return self.value
+
+    def to_dict(self):
+        return {'window': self.window, 'buffer': self.buffer, 'position': self.position,
+                'count': self.count, 'nan_count': self.nan_count, 'total': self.total,
+                'value': self.value}
+
+    @classmethod
+    def from_dict(cls, data):
+        rolling = cls(data['window'])
+        rolling.buffer = list(data['buffer'])
+        rolling.position = data['position']
+        rolling.count = data['count']
+        rolling.nan_count = data['nan_count']
+        rolling.total = data['total']
+        rolling.value = data['value']
+        return rolling
+
+
+class RollingStd(RollingMean):
+    """
+    Écart-type de population glissant sur window valeurs, en O(1) par mise à
+    jour (comme rolling(window).std(ddof=0) de pandas)
+    """
+
+    def __init__(self, window):
+        super().__init__(window)
+        self.squares = 0.0
+
+    def update(self, x):
+        old = self.buffer[self.position]
+        if self.count >= self.window and not math.isnan(old):
+            self.squares -= old * old
+        if not math.isnan(x):
+            self.squares += x * x
+        mean = super().update(x)
+        if self.position == 0:
+            self.squares = math.fsum(v * v for v in self.buffer if not math.isnan(v))
+        if math.isnan(mean):
+            return math.nan
+        self.value = math.sqrt(max(self.squares / self.window - mean * mean, 0.0))
+        return self.value
+
+    def to_dict(self):
+        return dict(super().to_dict(), squares=self.squares)
+
+    @classmethod
+    def from_dict(cls, data):
+        rolling = super().from_dict(data)
+        rolling.squares = data['squares']
+        return rolling
+
+
+class ExpMean:
+    """
+    Moyenne exponentielle non ajustée, en O(1) par mise à jour
+
+    Même récurrence que ewm(alpha=alpha, min_periods=min_periods,
+    adjust=False).mean() de pandas, valeurs manquantes comprises.
+    """
+
+    def __init__(self, alpha, min_periods):
+        self.alpha = float(alpha)
+        self.min_periods = int(min_periods)
+        self.weighted = math.nan
+        self.old_weight = 1.0
+        self.observations = 0
+        self.value = math.nan
+
+    def update(self, x):
+        observed = not math.isnan(x)
+        self.observations += observed
+        if not math.isnan(self.weighted):
+            self.old_weight *= 1.0 - self.alpha
+            if observed:
+                if self.weighted != x:
+                    self.weighted = (self.old_weight * self.weighted + self.alpha * x) / (self.old_weight + self.alpha)
+                self.old_weight = 1.0
+        elif observed:
+            self.weighted = x
+        self.value = self.weighted if self.observations >= max(self.min_periods, 1) else math.nan
+        return self.value
+
+    def to_dict(self):
+        return {'alpha': self.alpha, 'min_periods': self.min_periods, 'weighted': self.weighted,
+                'old_weight': self.old_weight, 'observations': self.observations, 'value': self.value}
+
+    @classmethod
+    def from_dict(cls, data):
+        mean = cls(data['alpha'], data['min_periods'])
+        mean.weighted = data['weighted']
+        mean.old_weight = data['old_weight']
+        mean.observations = data['observations']
+        mean.value = data['value']
+        return mean
+
+
+class Rsi:
+    """RSI de Wilder en O(1) par mise à jour (voir indicators._rsi)"""
+
+    def __init__(self, window):
+        self.window = int(window)
+        self.previous = math.nan
+        self.up = ExpMean(1.0 / self.window, self.window)
+        self.down = ExpMean(1.0 / self.window, self.window)
+        self.value = math.nan
+
+    def update(self, x):
+        diff = x - self.previous
+        self.previous = x
+        up = self.up.update(diff if diff > 0 else 0.0)
+        down = self.down.update(-diff if diff < 0 else 0.0)
+        if down == 0.0:
+            self.value = 100.0
+        elif math.isnan(up) or math.isnan(down):
+            self.value = math.nan
+        else:
+            self.value = 100.0 - 100.0 / (1.0 + up / down)
+        return self.value
+
+    def to_dict(self):
+        return {'window': self.window, 'previous': self.previous, 'up': self.up.to_dict(),
+                'down': self.down.to_dict(), 'value': self.value}
+
+    @classmethod
+    def from_dict(cls, data):
+        rsi = cls(data['window'])
+        rsi.previous = data['previous']
+        rsi.up = ExpMean.from_dict(data['up'])
+        rsi.down = ExpMean.from_dict(data['down'])
+        rsi.value = data['value']
+        return rsi
+
+
+def _update_source(node, x, dependencies, params):
+    return node.update(x)
+
+
+# Indicateur -> (fabrique params -> état incrémental, None si sans état ;
+# mise à jour (état, valeur source, valeurs des dépendances, params) -> valeur)
+STREAMING_INDICATORS = {
+    'sma': (lambda p: RollingMean(p['window']), _update_source),
+    'rolling_std': (lambda p: RollingStd(p['window']), _update_source),
+    'ema': (lambda p: ExpMean(2.0 / (p['span'] + 1.0), p['span']), _update_source),
+    'rsi': (lambda p: Rsi(p['window']), _update_source),
+    'macd': (None, lambda node, x, deps, p: deps[0] - deps[1]),
+    'macd_signal': (lambda p: ExpMean(2.0 / (p['signal'] + 1.0), p['signal']),
+                    lambda node, x, deps, p: node.update(deps[0])),
+    'macd_hist': (None, lambda node, x, deps, p: deps[0] - deps[1]),
+    'bb_upper': (None, lambda node, x, deps, p: deps[0] + p['k'] * deps[1]),
+    'bb_lower': (None, lambda node, x, deps, p: deps[0] - p['k'] * deps[1])
+}
+
+
+class _BarWindow:
+    """Dernières barres et valeurs d'indicateurs d'un automate, vues comme un IndicatorGraph"""
+
+    def __init__(self, history, columns):
+        self._history = history
+        self._columns = columns
+
+    def source(self, name):
+        return np.asarray(self._history[name], dtype=np.float64)
+
+    def compute(self, requests):
+        names = {key: column for column, key in self._columns.items()}
+        return {name: self.source(names[key]) for name, key in requests.items()}
+
+
+class StrategyState:
+    """
+    Automate d'une stratégie enregistrée (voir strategies.py), mis à jour barre par barre
+
+    Les indicateurs de la stratégie sont tenus par des états incrémentaux
+    (STREAMING_INDICATORS) et seules les dernières valeurs lues par les
+    conditions (StrategySpec.shift) sont gardées ; chaque barre est exécutée
+    par le moteur événementiel de /api/analyze (StrategySpec.backtest : ordres
+    à l'ouverture suivante, stops en attente, frais), qui reprend l'état de la
+    barre précédente.
+    """
+
+    def __init__(self, strategy, params=None, capital=None):
+        self.spec = get_strategy(strategy)
+        self.strategy = self.spec.name
+        self.params = self.spec.params(params)
+        self.initial_capital = self.spec.capital if capital is None else capital
+        self.columns = self.spec.indicator_columns(self.params)
+        self.plan = plan(list(self.columns.values()))
+        self.nodes = []
+        for key in self.plan:
+            if key.name not in STREAMING_INDICATORS:
+                raise ValueError(f"Indicateur non disponible en flux: {key.name}")
+            factory = STREAMING_INDICATORS[key.name][0]
+            self.nodes.append(factory(dict(key.params)) if factory else None)
+        self.depth = self.spec.shift(self.params) + 1
+        self.history = {name: [] for name in list(COLUMNS) + list(self.columns)}
+        self.engine_state = None
+        self.bars = 0
+        self.last_date = None
+
+    @property
+    def cash(self):
+        return self.initial_capital if self.engine_state is None else self.engine_state['cash']
+
+    @property
+    def position(self):
+        return 0.0 if self.engine_state is None else self.engine_state['position']
+
+    def _push(self, bar):
+        """Met à jour les indicateurs et l'historique court avec une barre {colonne: valeur}"""
+        values = {}
+        for key, node in zip(self.plan, self.nodes):
+            params = dict(key.params)
+            inputs = [values[dependency] for dependency in dependencies(key)]
+            values[key] = STREAMING_INDICATORS[key.name][1](node, bar[key.source], inputs, params)
+        row = dict(bar, **{column: values[key] for column, key in self.columns.items()})
+        for name, recent in self.history.items():
+            recent.append(row[name])
+            if len(recent) > self.depth:
+                del recent[0]
+
+    def update(self, date, open_price, high=math.nan, low=math.nan, close=math.nan, volume=0.0):
+        """
+        Applique une nouvelle barre ; retourne la liste des ordres exécutés
+        sur cette barre (plus haut et plus bas absents : ceux de l'ouverture
+        et de la clôture)
+        """
+        open_price, close = float(open_price), float(close)
+        high = max(open_price, close) if math.isnan(float(high)) else float(high)
+        low = min(open_price, close) if math.isnan(float(low)) else float(low)
+        self._push({'Open': open_price, 'High': high, 'Low': low, 'Close': close, 'Volume': float(volume)})
+        bar = self.bars
+        self.bars += 1
+        self.last_date = date
+        if bar < self.spec.first_bar:
+            return []
+
+        window = _BarWindow(self.history, self.columns)
+        simulation = self.spec.backtest(window, self.params, capital=self.initial_capital,
+                                        state=self.engine_state, start=len(self.history['Close']) - 1)
+        self.engine_state = simulation.state
+        return [_order(date, int(trade['order']), float(trade['quantity']), float(trade['price']),
+                       float(trade['cash']))
+                for trade in simulation.trades]
+
+    def replay(self, dates, bars):
+        """
+        Applique un bloc de barres {colonne: valeurs} d'un automate neuf en un
+        seul backtest (premier appel : historique complet) ; retourne les ordres
+        """
+        if self.bars:
+            raise ValueError("replay n'est possible que sur un automate neuf")
+        columns = {column: np.asarray(bars[column], dtype=np.float64) for column in COLUMNS}
+        simulation = self.spec.backtest(IndicatorGraph(columns), self.params, capital=self.initial_capital)
+        for k in range(len(dates)):
+            self._push({column: float(values[k]) for column, values in columns.items()})
+        self.bars = len(dates)
+        self.last_date = dates[-1] if len(dates) else None
+        self.engine_state = simulation.state
+        return [_order(dates[int(trade['index'])], int(trade['order']), float(trade['quantity']),
+                       float(trade['price']), float(trade['cash']))
+                for trade in simulation.trades]
+
+    def to_dict(self):
+        return {
+            'strategy': self.strategy, 'params': self.params, 'initial_capital': self.initial_capital,
+            'nodes': [None if node is None else node.to_dict() for node in self.nodes],
+            'history': self.history, 'engine_state': self.engine_state,
+            'bars': self.bars, 'last_date': self.last_date
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls(data['strategy'], data['params'], data['initial_capital'])
+        state.nodes = [None if node is None else type(node).from_dict(saved)
+                       for node, saved in zip(state.nodes, data['nodes'])]
+        for name in ('history', 'engine_state', 'bars', 'last_date'):
+            setattr(state, name, data[name])
+        return state
+
+
+def _order(date, order, quantity, price, cash):
+    return {'date': date, 'order': ORDER_LABELS[order], 'quantity': quantity,
+            'price': price, 'cash': cash}
+
+
+def new_state(strategy, params=None):
+    return StrategyState(strategy, params)
+
+
+def params_key(strategy, params=None):
+    """Empreinte courte des paramètres d'un automate (None : paramètres par défaut)"""
+    params = get_strategy(strategy).params(params)
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+
+class StateStore:
+    """Persistance JSON des automates, un fichier par (stratégie, symbole, paramètres)"""
+
+    def __init__(self, root=DEFAULT_STATE_DIR):
+        self.root = root
+
+    def _path(self, strategy, symbol, params=None):
+        safe_symbol = symbol.replace('/', '_').replace('\\', '_')
+        return os.path.join(self.root, strategy, f'{safe_symbol}__{params_key(strategy, params)}.json')
+
+    def load(self, strategy, symbol, params=None):
+        path = self._path(strategy, symbol, params)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return StrategyState.from_dict(data)
+
+    def save(self, symbol, state):
+        path = self._path(state.strategy, symbol, state.params)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Fichier temporaire propre à l'écrivain : deux processus peuvent enregistrer en même temps
+        fd, tmp_path = tempfile.mkstemp(prefix='.state-', suffix='.json', dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(state.to_dict(), f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+
+def update_symbol(symbol, strategy, start_date, end_date, state_store=None, params=None):
+    """
+    Fait avancer l'automate de symbol jusqu'à end_date
+
+    Seules les barres postérieures à la dernière barre traitée sont lues et
+    appliquées ; au premier appel, l'historique depuis start_date est rejoué.
+    Un automate est tenu par jeu de paramètres (params, None : paramètres par
+    défaut).
+
+    Returns:
+        tuple: (automate mis à jour, ordres passés sur les nouvelles barres)
+    """
+    state_store = state_store or StateStore()
+    state = state_store.load(strategy, symbol, params) or new_state(strategy, params)
+
+    first_date = pd.Timestamp(start_date)
+    if state.last_date is not None:
+        first_date = max(first_date, pd.Timestamp(state.last_date) + pd.Timedelta(days=1))
+    if first_date >= pd.Timestamp(end_date):
+        return state, []
+    bars = load_prices(symbol, first_date, end_date, interval='1d')
+
+    dates = bars['Date'].dt.strftime('%Y-%m-%d').tolist()
+    if state.bars == 0:
+        orders = state.replay(dates, bars)
+    else:
+        orders = []
+        for date, *values in zip(dates, *(bars[column].tolist() for column in COLUMNS)):
+            orders.extend(state.update(date, *values))
+
+    if len(bars):
+        state_store.save(symbol, state)
+    return state, orders
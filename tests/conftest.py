@@ -0,0 +1,49 @@
+"""
+Fixtures communes : séries synthétiques (voir benchmark.gbm_frame) et cache
+de cours branché sur un CsvProvider, sans accès réseau
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+import price_store  # noqa: E402
+from benchmark import gbm_frame  # noqa: E402
+from indicators import IndicatorGraph  # noqa: E402
+from price_store import COLUMNS, CsvProvider, PriceStore  # noqa: E402
+
+START = '2000-01-01'
+
+
+def make_bars(n_bars, seed=0):
+    """Barres OHLCV synthétiques reproductibles, une par jour à partir de START"""
+    return gbm_frame(n_bars, seed=seed, start=START)
+
+
+def make_graph(frame):
+    """IndicatorGraph des colonnes OHLCV de frame"""
+    return IndicatorGraph({column: frame[column].to_numpy() for column in COLUMNS})
+
+
+@pytest.fixture
+def csv_dir(tmp_path):
+    """Répertoire de fichiers <SYMBOLE>.csv (AAA, BBB) lus par CsvProvider"""
+    directory = tmp_path / 'csv'
+    directory.mkdir()
+    for seed, symbol in enumerate(['AAA', 'BBB']):
+        make_bars(1500, seed=seed).reset_index().to_csv(directory / f'{symbol}.csv', index=False)
+    return str(directory)
+
+
+@pytest.fixture
+def store(tmp_path, csv_dir):
+    """PriceStore hors ligne installé comme cache partagé le temps du test"""
+    previous = price_store._default_store
+    price_store.set_price_store(PriceStore(str(tmp_path / 'cache'), CsvProvider(csv_dir)))
+    yield price_store.get_price_store()
+    price_store.set_price_store(previous)
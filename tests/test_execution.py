@@ -0,0 +1,215 @@
+import math
+
+import numpy as np
+import pytest
+
+from conftest import make_bars, make_graph
+from engine import (ACHAT, EXCLUSIVE, RULE_SIGNAL, RULE_STOP_LOSS, RULE_TAKE_PROFIT, RULE_TRAILING_STOP,
+                    SEQUENTIAL, SIZING_FLOOR, SIZING_TRUNCATE, VENTE)
+from execution import NO_COSTS, CommissionSchedule, Costs, make_costs, simulate_events
+from strategies import get_strategy
+
+
+def reference_events(open_, high, low, close, price, valid, entry, rules, capital, mode, sizing,
+                     reset_on_exit, start):
+    """
+    Backtest de référence sans frais, barre par barre et sans structure
+    d'ordres : la sémantique documentée de execution.simulate_events écrite
+    le plus directement possible
+    """
+    n = len(close)
+    cash, position, last_buy, highest = float(capital), 0.0, 0.0, 0.0
+    trades = []
+    equity = np.full(n, float(capital))
+    market = []
+    signal_rules = [rule for rule in rules if rule[0] == RULE_SIGNAL]
+    protective = [rule for rule in rules if rule[0] != RULE_SIGNAL]
+
+    def buy(i, p):
+        nonlocal cash, position, last_buy, highest
+        qty = cash // p if sizing == SIZING_FLOOR else float(int(cash / p))
+        if qty <= 0:
+            return
+        cash -= qty * p
+        position += qty
+        last_buy = highest = p
+        trades.append((i, ACHAT, qty, p, cash))
+
+    def sell(i, p, pct, order_type):
+        nonlocal cash, position, last_buy, highest
+        qty = float(int(position * pct / 100.0))
+        if qty <= 0:
+            return False
+        cash += qty * p
+        position -= qty
+        if reset_on_exit:
+            last_buy = highest = 0.0
+        trades.append((i, order_type, qty, p, cash))
+        return True
+
+    for i in range(start, n):
+        # Ordres au marché de la veille, à l'ouverture
+        for order in market:
+            if order is None:
+                buy(i, open_[i])
+            else:
+                sell(i, open_[i], *order)
+        market = []
+
+        # Stops (du plus haut au plus bas) puis take-profit, au niveau de début de barre
+        if position > 0:
+            stops, limits = [], []
+            for kind, level, pct, order_type in (rule[:4] for rule in protective):
+                if kind == RULE_TAKE_PROFIT:
+                    limits.append((last_buy * level, pct, order_type))
+                else:
+                    base = highest if kind == RULE_TRAILING_STOP else last_buy
+                    stops.append((base * level, pct, order_type))
+            # Niveau nul (dernier achat oublié après une vente, reset_on_exit) : pas d'ordre
+            triggered = ([(min(open_[i], level), pct, t) for level, pct, t in sorted(stops, reverse=True)
+                          if 0.0 < level and low[i] <= level] +
+                         [(max(open_[i], level), pct, t) for level, pct, t in sorted(limits)
+                          if 0.0 < level <= high[i]])
+            # Après une vente, plus d'ordre de protection si la position est soldée ou oubliée (reset_on_exit)
+            sold = False
+            for fill, pct, order_type in triggered:
+                if position <= 0 or (reset_on_exit and sold):
+                    break
+                sold = sell(i, fill, pct, order_type) or sold
+
+        if position > 0:
+            highest = max(highest, high[i])
+
+        # Décisions de la barre, exécutées à l'ouverture suivante
+        if valid[i] and entry[i]:
+            if cash >= price[i]:
+                market.append(None)
+            if mode == EXCLUSIVE:
+                equity[i] = cash + position * close[i]
+                continue
+        if valid[i] and position > 0:
+            chosen = None
+            for rule in signal_rules:
+                if rule[4][i]:
+                    chosen = rule
+                    if mode == EXCLUSIVE:
+                        break
+            if chosen is not None:
+                market.append((chosen[2], chosen[3]))
+        equity[i] = cash + position * close[i]
+    return trades, equity
+
+
+def compiled(strategy, frame, params=None):
+    spec = get_strategy(strategy)
+    graph = make_graph(frame)
+    price, valid, entry, rules = spec.compile(graph, params)
+    bars = [graph.source(column) for column in ('Open', 'High', 'Low', 'Close')]
+    return spec, bars, price, valid, entry, rules
+
+
+def as_rows(trades):
+    return [(int(t['index']), int(t['order']), float(t['quantity']), float(t['price']), float(t['cash']))
+            for t in trades]
+
+
+@pytest.mark.parametrize('strategy', ['FRA', 'USA'])
+@pytest.mark.parametrize('seed', [0, 1, 2, 3])
+def test_matches_reference_without_costs(strategy, seed):
+    spec, bars, price, valid, entry, rules = compiled(strategy, make_bars(2500, seed=seed))
+    simulation = simulate_events(*bars, price, valid, entry, rules, spec.capital, spec.mode, spec.sizing,
+                                 spec.reset_on_exit, start=spec.first_bar, costs=NO_COSTS)
+    trades, equity = reference_events(*bars, price, valid, entry, rules, spec.capital, spec.mode, spec.sizing,
+                                      spec.reset_on_exit, spec.first_bar)
+    assert len(trades) > 10
+    assert as_rows(simulation.trades) == pytest.approx(trades)
+    np.testing.assert_allclose(simulation.equity, equity, rtol=1e-12)
+
+
+@pytest.mark.parametrize('mode, sizing, reset_on_exit', [
+    (SEQUENTIAL, SIZING_FLOOR, False), (SEQUENTIAL, SIZING_TRUNCATE, True),
+    (EXCLUSIVE, SIZING_FLOOR, True), (EXCLUSIVE, SIZING_TRUNCATE, False),
+])
+def test_matches_reference_for_every_mode(mode, sizing, reset_on_exit):
+    frame = make_bars(2000, seed=11)
+    graph = make_graph(frame)
+    close = graph.source('Close')
+    fast = frame['Close'].rolling(10).mean().to_numpy()
+    slow = frame['Close'].rolling(30).mean().to_numpy()
+    valid = ~np.isnan(slow)
+    above = fast > slow
+    entry = above & ~np.roll(above, 1)
+    cross_down = ~above & np.roll(above, 1)
+    rules = [(RULE_SIGNAL, 0.0, 60.0, VENTE, cross_down),
+             (RULE_STOP_LOSS, 0.93, 100.0, VENTE),
+             (RULE_TRAILING_STOP, 0.95, 50.0, VENTE),
+             (RULE_TAKE_PROFIT, 1.12, 100.0, VENTE)]
+    bars = [graph.source(column) for column in ('Open', 'High', 'Low', 'Close')]
+    simulation = simulate_events(*bars, close, valid, entry, rules, 100000.0, mode, sizing, reset_on_exit,
+                                 start=1, costs=NO_COSTS)
+    trades, equity = reference_events(*bars, close, valid, entry, rules, 100000.0, mode, sizing,
+                                      reset_on_exit, 1)
+    assert len(trades) > 10
+    assert as_rows(simulation.trades) == pytest.approx(trades)
+    np.testing.assert_allclose(simulation.equity, equity, rtol=1e-12)
+
+
+@pytest.mark.parametrize('strategy', ['FRA', 'USA'])
+def test_costs_are_accounted_trade_by_trade(strategy):
+    spec, bars, price, valid, entry, rules = compiled(strategy, make_bars(2500, seed=5))
+    costs = make_costs(None)
+    simulation = simulate_events(*bars, price, valid, entry, rules, spec.capital, spec.mode, spec.sizing,
+                                 spec.reset_on_exit, start=spec.first_bar, costs=costs)
+    cash = float(spec.capital)
+    position = 0.0
+    paid = 0.0
+    for t in simulation.trades:
+        notional = t['quantity'] * t['price']
+        fee = costs.commission(notional)
+        if t['order'] == ACHAT:
+            cash -= notional + fee
+            position += t['quantity']
+        else:
+            cash += notional - fee
+            position -= t['quantity']
+        paid += fee
+        assert t['cash'] == pytest.approx(cash)
+        assert cash >= 0.0 and position >= 0.0
+    assert simulation.cash == pytest.approx(cash)
+    assert simulation.position == position
+    assert simulation.state['commission'] == pytest.approx(paid)
+    assert simulation.state['slippage'] > 0.0
+    assert simulation.equity[-1] == pytest.approx(cash + position * bars[3][-1])
+
+
+@pytest.mark.parametrize('strategy', ['FRA', 'USA'])
+def test_resuming_from_state_matches_one_run(strategy):
+    spec = get_strategy(strategy)
+    graph = make_graph(make_bars(2500, seed=9))
+    whole = spec.backtest(graph)
+    cut = 1700
+    head = spec.backtest(graph.window(0, cut))
+    tail = spec.backtest(graph, state=head.state, start=cut)
+    assert as_rows(head.trades) + as_rows(tail.trades) == pytest.approx(as_rows(whole.trades))
+    assert tail.cash == pytest.approx(whole.cash)
+    assert tail.state['commission'] == pytest.approx(whole.state['commission'])
+
+
+def test_affordable_quantity_is_the_largest_payable():
+    schedule = CommissionSchedule(rate=0.002, minimum=5.0, fixed=1.0,
+                                  tiers=[(10000.0, 0.001), (50000.0, 0.0005)])
+    for cash, price in [(100000.0, 37.3), (9999.0, 12.5), (50200.0, 100.0), (10.0, 3.0), (0.0, 1.0)]:
+        qty = schedule.affordable(cash, price, math.inf)
+        assert qty * price + schedule(qty * price) <= cash
+        assert (qty + 1) * price + schedule((qty + 1) * price) > cash
+    np.testing.assert_allclose(schedule.many([0.0, 5000.0, 20000.0, 80000.0]),
+                               [schedule(v) for v in (0.0, 5000.0, 20000.0, 80000.0)])
+
+
+def test_make_costs_declarations():
+    assert make_costs(False) is NO_COSTS
+    costs = make_costs({'commission_rate': 0.0005, 'slippage_bps': 2})
+    assert isinstance(costs, Costs)
+    assert (costs.commission.rate, costs.slippage_bps) == (0.0005, 2.0)
+    with pytest.raises(ValueError):
+        make_costs({'spread': 1})
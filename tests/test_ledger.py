@@ -0,0 +1,80 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from engine import TRADE_DTYPE
+from ledger import CSV_HEADER, EXPORT_COLUMNS, LEDGER_COLUMNS, OrderType, TradeLedger
+
+DATES = pd.date_range('2020-01-01', periods=10).to_numpy()
+
+
+def sample_ledger():
+    trades = np.zeros(4, dtype=TRADE_DTYPE)
+    trades['index'] = [1, 3, 5, 8]
+    trades['order'] = [OrderType.ACHAT, OrderType.VENTE, OrderType.ACHAT, OrderType.STOP_LOSS]
+    trades['quantity'] = [10, 10, 7, 7]
+    trades['price'] = [100.0, 110.5, 120.0, 95.25]
+    trades['cash'] = [9000.0, 10105.0, 9265.0, 9931.75]
+    return TradeLedger.from_trades(trades, DATES, 'AAA')
+
+
+def test_from_trades_columns():
+    ledger = sample_ledger()
+    assert len(ledger) == 4
+    assert (ledger.column('date') == DATES[[1, 3, 5, 8]]).all()
+    frame = ledger.to_frame()
+    assert list(frame.columns) == LEDGER_COLUMNS
+    assert list(frame['Ordre']) == ['Achat', 'Vente', 'Achat', 'StopLoss']
+    assert list(frame['Valeur']) == ['AAA'] * 4
+    assert frame['Solde restant'].iloc[-1] == 9931.75
+
+
+def test_records_round_trip():
+    ledger = sample_ledger()
+    records = ledger.to_records()
+    assert records[0] == {'date': '2020-01-02', 'action': 'Achat', 'price': 100.0,
+                          'quantity': 10, 'capital': 9000}
+    assert records[-1]['action'] == 'Vente'   # StopLoss exporté comme une vente
+    rebuilt = TradeLedger.from_records(records, 'AAA')
+    assert rebuilt.to_records() == records
+    assert len(TradeLedger.from_records([])) == 0
+
+
+def test_export_frame_and_csv():
+    ledger = sample_ledger()
+    frame = ledger.export_frame()
+    assert list(frame.columns) == EXPORT_COLUMNS
+    assert list(frame['Action']) == ['Achat', 'Vente', 'Achat', 'Vente']
+    assert list(frame['Capital']) == [9000, 10105, 9265, 9931]
+    csv = ledger.to_csv()
+    assert csv.startswith(CSV_HEADER)
+    assert csv.splitlines()[1] == '2020-01-02,Achat,100.0,10,9000'
+    # Un CSV par morceaux reste identique au CSV complet
+    assert ''.join(ledger.iter_csv(chunk_rows=3)) == csv
+
+
+def test_append_grows_columns():
+    ledger = TradeLedger(capacity=1)
+    for k in range(20):
+        ledger.append(DATES[k % 10], OrderType.ACHAT if k % 2 == 0 else OrderType.VENTE,
+                      k + 1, 100.0 + k, 1000.0 - k, symbol='AAA' if k < 10 else 'BBB')
+    assert len(ledger) == 20
+    assert ledger.symbols == ['AAA', 'BBB']
+    assert ledger.column('quantity').tolist() == list(range(1, 21))
+    records = ledger.to_records(with_symbol=True)
+    assert records[9]['symbol'] == 'AAA' and records[10]['symbol'] == 'BBB'
+
+
+def test_pickle_keeps_filled_rows():
+    ledger = sample_ledger()
+    restored = pickle.loads(pickle.dumps(ledger))
+    assert restored.to_records() == ledger.to_records()
+    assert len(restored._columns['order']) == 4
+    restored.append(DATES[9], OrderType.ACHAT, 1, 90.0, 9841.75)
+    assert len(restored) == 5
+
+    empty = pickle.loads(pickle.dumps(TradeLedger('AAA')))
+    assert len(empty) == 0
+    empty.append(DATES[0], OrderType.ACHAT, 1, 1.0, 1.0)
+    assert empty.to_records()[0]['quantity'] == 1
@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+
+from conftest import make_bars, make_graph
+from optimizer import expand_grid, run_sweep, sweep_graph
+from strategies import get_strategy, run_strategy
+
+
+@pytest.mark.parametrize('strategy, count', [('FRA', 720), ('USA', 1044)])
+def test_default_grids_come_from_the_spec(strategy, count):
+    spec = get_strategy(strategy)
+    combinations = expand_grid(strategy)
+    assert len(combinations) == count
+    assert all(set(params) == set(spec.defaults) for params in combinations)
+    for params in combinations:
+        windows = [params[name] for name in spec.ordered]
+        assert windows == sorted(set(windows))
+
+
+def test_missing_parameters_keep_their_defaults():
+    spec = get_strategy('USA')
+    combinations = expand_grid(spec, {'sma_fast': [5, 30, 40], 'sma_slow': [30]})
+    assert [params['sma_fast'] for params in combinations] == [5]
+    assert combinations[0]['stop_loss'] == spec.defaults['stop_loss']
+
+
+def test_unknown_parameter_is_rejected():
+    with pytest.raises(ValueError):
+        expand_grid('FRA', {'sma_fast': [5]})
+
+
+def test_default_combination_matches_the_analysis(store):
+    spec = get_strategy('FRA')
+    grid = {name: [value] for name, value in spec.defaults.items()}
+    grid['stop_loss'] = [0.85, spec.defaults['stop_loss']]
+    ranking = run_sweep('AAA', '2000-01-01', '2004-01-01', 'FRA', grid=grid, max_workers=1)
+    analysis = run_strategy('FRA', 'AAA', '2000-01-01', '2004-01-01')
+    row = ranking[ranking['stop_loss'] == spec.defaults['stop_loss']].iloc[0]
+    assert row['final_capital'] == analysis['final_capital']
+    assert row['number_of_trades'] == len(analysis['ledger'])
+    assert row['max_drawdown'] == pytest.approx(analysis['performance']['max_drawdown'])
+
+
+def test_ranking_is_sorted_by_final_equity():
+    graph = make_graph(make_bars(1500, seed=2))
+    ranking = sweep_graph('USA', graph, expand_grid('USA', {'sma_fast': [5, 10], 'sma_slow': [20, 40]}),
+                          max_workers=1)
+    assert list(ranking['rank']) == [1, 2, 3, 4]
+    assert ranking['final_equity'].is_monotonic_decreasing
+
+
+def test_pool_matches_serial_sweep():
+    graph = make_graph(make_bars(1200, seed=4))
+    combinations = expand_grid('USA', {'sma_fast': [5, 8, 10, 12], 'sma_slow': [20, 30, 40, 50],
+                                       'stop_loss': [0.9, 0.95], 'take_profit': [1.1, 1.2, 1.3]})
+    assert len(combinations) >= 64
+    serial = sweep_graph('USA', graph, combinations, max_workers=1)
+    pooled = sweep_graph('USA', graph, combinations, max_workers=2)
+    pd.testing.assert_frame_equal(serial, pooled)
@@ -0,0 +1,130 @@
+import pandas as pd
+import pytest
+
+import price_store
+from price_store import (CsvProvider, PriceProvider, PriceStore, _empty_frame, _merge_ranges,
+                         _missing_ranges, add_update_listener, split_range)
+
+T = pd.Timestamp
+
+
+class CountingProvider(PriceProvider):
+    """Délègue à un CsvProvider en notant les plages demandées ; fail : réponses vides"""
+
+    def __init__(self, directory):
+        self.csv = CsvProvider(directory)
+        self.calls = []
+        self.fail = False
+
+    def fetch(self, symbol, start, end, interval='1d'):
+        self.calls.append((symbol, start, end))
+        return _empty_frame() if self.fail else self.csv.fetch(symbol, start, end, interval)
+
+
+@pytest.fixture
+def provider(csv_dir):
+    return CountingProvider(csv_dir)
+
+
+@pytest.fixture
+def counted_store(tmp_path, provider):
+    return PriceStore(str(tmp_path / 'cache'), provider)
+
+
+@pytest.mark.parametrize('coverage, expected', [
+    ([], [('2020-01-01', '2020-12-31')]),
+    ([('2019-01-01', '2021-01-01')], []),
+    ([('2020-01-01', '2020-12-31')], []),
+    ([('2020-03-01', '2020-04-01')], [('2020-01-01', '2020-03-01'), ('2020-04-01', '2020-12-31')]),
+    ([('2019-01-01', '2020-03-01'), ('2020-06-01', '2022-01-01')], [('2020-03-01', '2020-06-01')]),
+    ([('2018-01-01', '2019-01-01'), ('2021-06-01', '2022-01-01')], [('2020-01-01', '2020-12-31')]),
+    ([('2020-12-31', '2021-06-01')], [('2020-01-01', '2020-12-31')]),
+    ([('2019-06-01', '2020-01-01')], [('2020-01-01', '2020-12-31')]),
+])
+def test_missing_ranges(coverage, expected):
+    coverage = [(T(a), T(b)) for a, b in coverage]
+    assert _missing_ranges(coverage, T('2020-01-01'), T('2020-12-31')) == [(T(a), T(b)) for a, b in expected]
+
+
+def test_missing_ranges_empty_request():
+    assert _missing_ranges([], T('2020-01-01'), T('2020-01-01')) == []
+
+
+@pytest.mark.parametrize('ranges, expected', [
+    ([], []),
+    ([('2020-01-01', '2020-02-01'), ('2020-02-01', '2020-03-01')], [('2020-01-01', '2020-03-01')]),
+    ([('2020-02-15', '2020-04-01'), ('2020-01-01', '2020-03-01')], [('2020-01-01', '2020-04-01')]),
+    ([('2020-01-01', '2020-06-01'), ('2020-02-01', '2020-03-01')], [('2020-01-01', '2020-06-01')]),
+    ([('2020-03-01', '2020-04-01'), ('2020-01-01', '2020-02-01')],
+     [('2020-01-01', '2020-02-01'), ('2020-03-01', '2020-04-01')]),
+])
+def test_merge_ranges(ranges, expected):
+    assert _merge_ranges([(T(a), T(b)) for a, b in ranges]) == [(T(a), T(b)) for a, b in expected]
+
+
+def test_split_range():
+    assert split_range(T('2020-01-01'), T('2021-01-01'), '1d') == [(T('2020-01-01'), T('2021-01-01'))]
+    chunks = split_range(T('2020-01-01'), T('2020-01-20'), '1m')
+    assert chunks[0] == (T('2020-01-01'), T('2020-01-08'))
+    assert chunks[-1][1] == T('2020-01-20')
+    assert all(a[1] == b[0] for a, b in zip(chunks, chunks[1:]))
+
+
+def test_load_returns_requested_range(counted_store):
+    frame = counted_store.load('AAA', '2000-03-01', '2000-04-01')
+    assert frame['Date'].iloc[0] == T('2000-03-01')
+    assert frame['Date'].iloc[-1] == T('2000-03-31')
+    assert list(frame.columns) == ['Date', 'Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def test_cached_range_is_not_fetched_again(counted_store, provider):
+    first = counted_store.load('AAA', '2000-01-01', '2001-01-01')
+    calls = len(provider.calls)
+    again = counted_store.load('AAA', '2000-06-01', '2000-09-01')
+    assert len(provider.calls) == calls
+    expected = first[(first['Date'] >= T('2000-06-01')) & (first['Date'] < T('2000-09-01'))]
+    pd.testing.assert_frame_equal(again.reset_index(drop=True), expected.reset_index(drop=True))
+
+
+def test_only_missing_ranges_are_fetched(counted_store, provider):
+    counted_store.load('AAA', '2000-03-01', '2000-06-01')
+    provider.calls.clear()
+    frame = counted_store.load('AAA', '2000-01-01', '2000-09-01')
+    assert [(a, b) for _, a, b in provider.calls] == [(T('2000-01-01'), T('2000-03-01')),
+                                                      (T('2000-06-01'), T('2000-09-01'))]
+    assert frame['Date'].is_monotonic_increasing and not frame['Date'].duplicated().any()
+    assert len(frame) == (T('2000-09-01') - T('2000-01-01')).days
+
+
+def test_empty_response_is_not_cached(counted_store, provider):
+    provider.fail = True
+    assert counted_store.load('AAA', '2000-01-01', '2000-02-01').empty
+    provider.fail = False
+    assert len(counted_store.load('AAA', '2000-01-01', '2000-02-01')) == 31
+    calls = len(provider.calls)
+    counted_store.load('AAA', '2000-01-01', '2000-02-01')
+    assert len(provider.calls) == calls
+
+
+def test_load_many_skips_symbols_without_bars(counted_store, provider):
+    assert counted_store.load_many(['AAA', 'ZZZ'], '2000-01-01', '2000-02-01') == ['AAA']
+    provider.calls.clear()
+    counted_store.load_many(['AAA', 'ZZZ'], '2000-01-01', '2000-02-01')
+    assert {symbol for symbol, _, _ in provider.calls} == {'ZZZ'}
+
+
+def test_new_bars_notify_listeners(counted_store, monkeypatch):
+    monkeypatch.setattr(price_store, '_update_listeners', [])
+    updates = []
+    add_update_listener(lambda symbol, interval: updates.append((symbol, interval)))
+    counted_store.load('BBB', '2000-01-01', '2000-02-01')
+    counted_store.load('BBB', '2000-01-01', '2000-02-01')
+    assert updates.count(('BBB', '1d')) == 1
+
+
+def test_cache_survives_a_new_store(counted_store, provider):
+    first = counted_store.load('AAA', '2000-01-01', '2000-04-01')
+    reopened = PriceStore(counted_store.root, provider)
+    calls = len(provider.calls)
+    pd.testing.assert_frame_equal(reopened.load('AAA', '2000-01-01', '2000-04-01'), first)
+    assert len(provider.calls) == calls
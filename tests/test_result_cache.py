@@ -0,0 +1,80 @@
+import os
+import pickle
+
+import pytest
+
+from result_cache import ResultCache, make_key
+
+
+def key(symbol, start='2020-01-01'):
+    return make_key(symbol, start, '2021-01-01', 'FRA', 1)
+
+
+def test_lru_eviction():
+    cache = ResultCache(max_entries=2)
+    cache.put(key('A'), 'a')
+    cache.put(key('B'), 'b')
+    assert cache.get(key('A')) == 'a'   # A devient la plus récente
+    cache.put(key('C'), 'c')
+    assert cache.get(key('B')) is None
+    assert cache.get(key('A')) == 'a' and cache.get(key('C')) == 'c'
+    stats = cache.stats()
+    assert stats['evictions'] == 1 and stats['entries'] == 2
+    assert (stats['hits'], stats['misses']) == (3, 1)
+
+
+def test_key_includes_strategy_version():
+    cache = ResultCache()
+    cache.put(make_key('A', 'x', 'y', 'FRA', 1), 'v1')
+    assert cache.get(make_key('A', 'x', 'y', 'FRA', 2)) is None
+
+
+def test_invalidate_symbol_only_drops_that_symbol():
+    cache = ResultCache()
+    cache.put(key('A'), 'a1')
+    cache.put(key('A', '2019-01-01'), 'a2')
+    cache.put(key('B'), 'b')
+    cache.invalidate_symbol('A', '1d')
+    assert cache.get(key('A')) is None and cache.get(key('A', '2019-01-01')) is None
+    assert cache.get(key('B')) == 'b'
+    assert cache.stats()['invalidations'] == 2
+
+
+def test_disk_level_is_shared_and_invalidated(tmp_path):
+    directory = str(tmp_path / 'results')
+    writer = ResultCache(disk_dir=directory)
+    writer.put(key('A'), {'finalCapital': 1})
+    writer.put(key('B'), {'finalCapital': 2})
+    assert not [name for name in os.listdir(directory) if name.startswith('.')]
+
+    reader = ResultCache(disk_dir=directory)
+    assert reader.get(key('A')) == {'finalCapital': 1}
+    assert reader.stats()['diskHits'] == 1
+
+    writer.invalidate_symbol('A')
+    assert ResultCache(disk_dir=directory).get(key('A')) is None
+    assert ResultCache(disk_dir=directory).get(key('B')) == {'finalCapital': 2}
+    # Déjà supprimées par un autre processus
+    reader.invalidate_symbol('A')
+
+
+def test_failed_write_leaves_no_temp_file(tmp_path):
+    directory = str(tmp_path / 'results')
+    cache = ResultCache(disk_dir=directory)
+    with pytest.raises((pickle.PicklingError, AttributeError)):
+        cache.put(key('A'), lambda: None)   # non sérialisable
+    assert os.listdir(directory) == []
+
+
+def test_new_bars_invalidate_analysis_results(store):
+    import api_server
+
+    api_server.result_cache.clear()
+    first = api_server.run_analysis('AAA', '2000-01-01', '2001-01-01', 'FRA')
+    assert api_server.run_analysis('AAA', '2000-01-01', '2001-01-01', 'FRA') is first
+
+    # Nouvelles barres du symbole : les résultats en cache sont périmés
+    store.load('AAA', '2000-01-01', '2002-01-01')
+    again = api_server.run_analysis('AAA', '2000-01-01', '2001-01-01', 'FRA')
+    assert again is not first
+    assert again['results'] == first['results']
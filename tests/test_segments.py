@@ -0,0 +1,95 @@
+import glob
+import os
+
+import numpy as np
+import pytest
+
+import segments
+from segments import SharedArrays, as_dates, attach_segment, write_segment
+
+
+def test_write_and_attach_round_trip(tmp_path):
+    dates = np.array(['2020-01-01', '2020-01-02'], dtype='datetime64[ns]')
+    path = str(tmp_path / 'block.npy')
+    write_segment(path, [dates, [1.5, 2.5], np.array([3, 4])])
+    block = attach_segment(path)
+    assert block.shape == (3, 2)
+    np.testing.assert_array_equal(as_dates(block[0]), dates)
+    np.testing.assert_array_equal(block[1], [1.5, 2.5])
+    np.testing.assert_array_equal(block[2].view(np.int64), [3, 4])
+    assert not block.flags.writeable
+
+
+def test_rewritten_segment_is_remapped(tmp_path):
+    path = str(tmp_path / 'block.npy')
+    write_segment(path, [[1.0, 2.0]])
+    old = attach_segment(path)
+    write_segment(path, [[5.0, 6.0, 7.0]])
+    np.testing.assert_array_equal(attach_segment(path)[0], [5.0, 6.0, 7.0])
+    # Les vues déjà distribuées gardent l'ancienne version
+    np.testing.assert_array_equal(old[0], [1.0, 2.0])
+    assert not glob.glob(str(tmp_path / '.segment-*'))
+
+
+def test_shared_arrays_round_trip_and_close(tmp_path):
+    arrays = {'price': np.arange(5.0), 'sma': np.linspace(0, 1, 5)}
+    with SharedArrays(arrays, directory=str(tmp_path)) as shared:
+        attached = shared.handle.attach()
+        assert list(attached) == ['price', 'sma']
+        np.testing.assert_array_equal(attached['sma'], arrays['sma'])
+        path = shared.path
+    assert not os.path.exists(path)
+    shared.close()
+
+
+def test_close_tolerates_a_mapped_segment(tmp_path, monkeypatch):
+    shared = SharedArrays({'price': np.arange(3.0)}, directory=str(tmp_path))
+
+    def refuse(path):
+        raise PermissionError(path)
+
+    # Comportement de Windows pour un fichier encore mappé
+    monkeypatch.setattr(segments.os, 'remove', refuse)
+    shared.close()
+
+
+def test_price_store_writes_versions_and_drops_old_ones(store):
+    directory = store._symbol_dir('AAA', '1d')
+    first = store.load('AAA', '2000-01-01', '2000-02-01')
+    old_segments = glob.glob(os.path.join(directory, 'bars*.npy'))
+    assert len(old_segments) == 1
+
+    wider = store.load('AAA', '2000-01-01', '2000-03-01')
+    segments_now = glob.glob(os.path.join(directory, 'bars*.npy'))
+    assert len(segments_now) == 1 and segments_now != old_segments
+    assert len(wider) == 60
+    # Les colonnes du premier chargement restent lisibles (ancien mapping)
+    assert len(first['Close']) == 31 and np.isfinite(first['Close']).all()
+
+
+def test_price_store_keeps_a_version_it_cannot_delete(store, monkeypatch):
+    directory = store._symbol_dir('AAA', '1d')
+    store.load('AAA', '2000-01-01', '2000-02-01')
+
+    real_remove = os.remove
+
+    def refuse_segments(path):
+        if os.path.basename(path).startswith('bars'):
+            raise PermissionError(path)
+        real_remove(path)
+
+    monkeypatch.setattr(os, 'remove', refuse_segments)
+    assert len(store.load('AAA', '2000-01-01', '2000-03-01')) == 60
+    assert len(glob.glob(os.path.join(directory, 'bars*.npy'))) == 2
+
+    # Ancienne version supprimée à l'écriture suivante, une fois libérée
+    monkeypatch.setattr(os, 'remove', real_remove)
+    assert len(store.load('AAA', '2000-01-01', '2000-04-01')) == 91
+    assert len(glob.glob(os.path.join(directory, 'bars*.npy'))) == 1
+
+
+@pytest.mark.parametrize('values', [np.array([1, 2], dtype=np.int32), np.array([1.0, 2.0], dtype=np.float32)])
+def test_rows_are_stored_as_float64(tmp_path, values):
+    path = str(tmp_path / 'block.npy')
+    write_segment(path, [values])
+    assert attach_segment(path).dtype == np.float64
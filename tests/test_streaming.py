@@ -0,0 +1,141 @@
+import json
+
+import numpy as np
+import pytest
+
+from conftest import make_bars, make_graph
+from indicators import IndicatorGraph, bollinger, dependencies, ema, indicator, macd, plan, rsi, sma
+from ledger import ORDER_LABELS
+from price_store import COLUMNS
+from streaming import STREAMING_INDICATORS, StateStore, StrategyState, update_symbol
+from strategies import get_strategy, register_strategy, run_strategy
+
+# Stratégie de test : indicateurs à lissage exponentiel (EMA, MACD, RSI) et bandes de Bollinger
+MOMENTUM = {
+    'name': 'TEST_MOMENTUM',
+    'source': 'Close',
+    'capital': 50000,
+    'params': {'fast': 12, 'slow': 26, 'stop_loss': 0.92},
+    'indicators': {
+        'MACD': {'type': 'macd', 'fast': '$fast', 'slow': '$slow'},
+        'SIGNAL': {'type': 'macd_signal', 'fast': '$fast', 'slow': '$slow'},
+        'RSI': {'type': 'rsi', 'window': 14},
+        'UPPER': {'type': 'bb_upper', 'window': 20}
+    },
+    'entry': ['and', ['cross_above', 'MACD', 'SIGNAL'], ['<', 'RSI', 70]],
+    'exits': [
+        {'when': ['>', 'price', 'UPPER'], 'sell_pct': 50},
+        {'when': ['cross_below', 'MACD', 'SIGNAL']},
+        {'stop_loss': '$stop_loss'}
+    ]
+}
+
+
+@pytest.fixture(scope='module', autouse=True)
+def momentum():
+    return register_strategy(dict(MOMENTUM))
+
+
+def bars_of(frame):
+    dates = frame.index.strftime('%Y-%m-%d').tolist()
+    return dates, {column: frame[column].to_numpy() for column in COLUMNS}
+
+
+def expected_orders(strategy, frame, params=None):
+    spec = get_strategy(strategy)
+    simulation = spec.backtest(make_graph(frame), params)
+    dates = frame.index.strftime('%Y-%m-%d').tolist()
+    return [(dates[int(t['index'])], ORDER_LABELS[int(t['order'])], float(t['quantity']),
+             float(t['price']), float(t['cash'])) for t in simulation.trades], simulation
+
+
+def as_tuples(orders):
+    return [(o['date'], o['order'], o['quantity'], o['price'], o['cash']) for o in orders]
+
+
+def stream(state, frame, start=0):
+    orders = []
+    for date, *values in zip(frame.index.strftime('%Y-%m-%d')[start:],
+                             *(frame[column].to_numpy()[start:] for column in COLUMNS)):
+        orders.extend(state.update(date, *values))
+    return orders
+
+
+@pytest.mark.parametrize('key', [
+    sma('Close', 20), indicator('rolling_std', 'Close', window=20), ema('Close', 12), rsi('Close', 14),
+    macd('Close'), macd('Close', line='signal'), macd('Close', line='hist'),
+    bollinger('Close'), bollinger('Close', band='lower'),
+], ids=lambda key: key.name)
+def test_streaming_indicators_match_the_graph(key):
+    close = make_bars(800, seed=4)['Close'].to_numpy()
+    expected = IndicatorGraph({'Close': close}).get(key)
+    nodes = [(node, STREAMING_INDICATORS[node.name]) for node in plan([key])]
+    states = [factory(dict(node.params)) if factory else None for node, (factory, _) in nodes]
+    streamed = []
+    for x in close:
+        values = {}
+        for (node, (_, update)), node_state in zip(nodes, states):
+            inputs = [values[dependency] for dependency in dependencies(node)]
+            values[node] = update(node_state, x, inputs, dict(node.params))
+        streamed.append(values[key])
+    np.testing.assert_allclose(streamed, expected, rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+@pytest.mark.parametrize('strategy', ['FRA', 'USA', 'TEST_MOMENTUM'])
+def test_bar_by_bar_matches_full_backtest(strategy):
+    frame = make_bars(1200, seed=3)
+    expected, simulation = expected_orders(strategy, frame)
+    state = StrategyState(strategy)
+    orders = as_tuples(stream(state, frame))
+    assert len(expected) > 5
+    assert orders == pytest.approx(expected)
+    assert state.cash == pytest.approx(simulation.cash)
+    assert state.position == simulation.position
+
+
+@pytest.mark.parametrize('strategy', ['FRA', 'USA', 'TEST_MOMENTUM'])
+def test_replay_then_update_matches_full_backtest(strategy):
+    frame = make_bars(1200, seed=6)
+    expected, _ = expected_orders(strategy, frame)
+    state = StrategyState(strategy)
+    dates, bars = bars_of(frame.iloc[:900])
+    orders = state.replay(dates, bars) + stream(state, frame, start=900)
+    assert as_tuples(orders) == pytest.approx(expected)
+
+
+def test_saved_state_resumes_exactly():
+    frame = make_bars(1200, seed=8)
+    expected, _ = expected_orders('USA', frame)
+    state = StrategyState('USA')
+    orders = stream(state, frame.iloc[:700])
+    restored = StrategyState.from_dict(json.loads(json.dumps(state.to_dict())))
+    orders += stream(restored, frame, start=700)
+    assert as_tuples(orders) == pytest.approx(expected)
+
+
+def test_replay_requires_a_new_state():
+    frame = make_bars(300)
+    state = StrategyState('FRA')
+    state.replay(*bars_of(frame.iloc[:200]))
+    with pytest.raises(ValueError):
+        state.replay(*bars_of(frame.iloc[200:]))
+
+
+def test_update_symbol_reads_only_new_bars(store, tmp_path):
+    states = StateStore(str(tmp_path / 'states'))
+    ledger = run_strategy('FRA', 'AAA', '2000-01-01', '2004-01-01')['ledger'].to_frame()
+    expected = list(zip(ledger['Date'].dt.strftime('%Y-%m-%d'), ledger['Ordre'].astype(str),
+                        ledger['Quantite'], ledger['Prix']))
+
+    state, first = update_symbol('AAA', 'FRA', '2000-01-01', '2003-01-01', states)
+    assert state.last_date == '2002-12-31'
+    state, rest = update_symbol('AAA', 'FRA', '2000-01-01', '2004-01-01', states)
+    assert state.last_date == '2003-12-31'
+    orders = [(o['date'], o['order'], o['quantity'], o['price']) for o in first + rest]
+    assert orders == pytest.approx(expected)
+
+    # Déjà à jour : aucune barre relue ; autres paramètres : automate séparé
+    assert update_symbol('AAA', 'FRA', '2000-01-01', '2004-01-01', states)[1] == []
+    other, _ = update_symbol('AAA', 'FRA', '2000-01-01', '2001-01-01', states, params={'stop_loss': 0.8})
+    assert other.last_date == '2000-12-31'
+    assert states.load('FRA', 'AAA').last_date == '2003-12-31'
@@ -0,0 +1,168 @@
+"""
+Backtest walk-forward : optimisation sur une fenêtre, validation sur la suivante
+
+L'historique est découpé en plis successifs : sur chaque pli, la grille de
+paramètres est balayée sur la période d'apprentissage (in-sample) et la
+meilleure combinaison est rejouée sur la période de test qui la suit
+(out-of-sample), par le backtest événementiel de /api/analyze (voir
+optimizer.sweep_graph). Les indicateurs de toutes les combinaisons de la
+grille sont calculés une seule fois sur la série complète et publiés dans un
+segment partagé ; chaque pli n'en lit que des tranches, qui gardent ainsi
+l'historique antérieur au pli. Les plis sont évalués en parallèle sur le pool
+de processus.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from engine import max_drawdown
+from indicators import indicator_graph
+from optimizer import attach_graph, expand_grid, indicator_keys, shared_graph, sweep_graph
+from price_store import load_prices
+from process_pool import DEFAULT_MAX_WORKERS, run_bounded
+from strategies import get_strategy
+
+# Bornes d'un pli : [is_start, is_end) apprentissage, [is_end, oos_end) test
+Fold = namedtuple('Fold', ['is_start', 'is_end', 'oos_end'])
+
+
+def make_folds(n_bars, n_folds=5, in_sample_ratio=0.75, anchored=False):
+    """
+    Découpe n_bars barres en plis apprentissage / test
+
+    Les périodes de test se suivent sans se chevaucher et couvrent la fin de
+    l'historique ; chaque période d'apprentissage représente in_sample_ratio
+    de la longueur du pli. En mode anchored, l'apprentissage commence
+    toujours à la première barre (fenêtre croissante).
+    """
+    if n_folds < 1:
+        raise ValueError("n_folds doit être au moins 1")
+    if not 0 < in_sample_ratio < 1:
+        raise ValueError("in_sample_ratio doit être compris entre 0 et 1")
+
+    train_blocks = in_sample_ratio / (1.0 - in_sample_ratio)
+    oos_size = int(n_bars // (n_folds + train_blocks))
+    is_size = int(round(oos_size * train_blocks))
+    if oos_size < 2 or is_size < 2:
+        raise ValueError(f"Historique trop court pour {n_folds} plis ({n_bars} barres)")
+
+    offset = n_bars - (is_size + n_folds * oos_size)
+    folds = []
+    for k in range(n_folds):
+        is_end = offset + is_size + k * oos_size
+        is_start = 0 if anchored else is_end - is_size
+        folds.append(Fold(is_start, is_end, is_end + oos_size))
+    return folds
+
+
+def _evaluate_fold(spec, graph, combinations, fold):
+    """
+    Optimise sur la période d'apprentissage du pli puis backteste la meilleure
+    combinaison sur sa période de test (exécuté dans un processus du pool ;
+    les tranches sont des vues, sans copie)
+    """
+    ranking = sweep_graph(spec, graph.window(fold.is_start, fold.is_end), combinations, max_workers=1)
+    best = ranking.iloc[0]
+    params = {name: best[name] for name in spec.defaults}
+
+    simulation = spec.backtest(graph.window(fold.is_end, fold.oos_end), params)
+    return {
+        'params': params,
+        'in_sample_equity': float(best['final_equity']),
+        'equity': simulation.equity,
+        'number_of_trades': len(simulation.trades),
+        'max_drawdown': max_drawdown(simulation.equity)
+    }
+
+
+def _evaluate_shared_fold(spec, handle, combinations, fold):
+    """_evaluate_fold sur les cours et indicateurs d'un segment partagé (voir optimizer.shared_graph)"""
+    return _evaluate_fold(spec, attach_graph(handle), combinations, fold)
+
+
+def walk_forward_graph(strategy, graph, n_bars, n_folds=5, in_sample_ratio=0.75, grid=None,
+                       anchored=False, max_workers=None):
+    """
+    Walk-forward sur les n_bars barres d'un IndicatorGraph
+
+    Returns:
+        (liste des plis, liste des résultats par pli, courbe de valeur
+        out-of-sample chaînée sur les plis)
+    """
+    spec = get_strategy(strategy) if isinstance(strategy, str) else strategy
+    combinations = expand_grid(spec, grid)
+    if not combinations:
+        raise ValueError("Aucune combinaison de paramètres valide")
+
+    folds = make_folds(n_bars, n_folds, in_sample_ratio, anchored)
+
+    max_workers = max_workers or DEFAULT_MAX_WORKERS
+    if max_workers <= 1 or len(folds) == 1:
+        results = [_evaluate_fold(spec, graph, combinations, fold) for fold in folds]
+    else:
+        # Indicateurs de toutes les combinaisons, une fois, sur toute la série
+        with shared_graph(graph, indicator_keys(spec, combinations)) as shared:
+            tasks = [(spec, shared.handle, combinations, fold) for fold in folds]
+            results = run_bounded(_evaluate_shared_fold, tasks, max_workers)
+
+    # Chaque période de test repart du capital initial : les rendements sont chaînés
+    curves = []
+    scale = 1.0
+    for result in results:
+        curves.append(result['equity'] * scale)
+        scale *= result['equity'][-1] / spec.capital
+    equity = np.concatenate(curves) if curves else np.empty(0)
+    return folds, results, equity
+
+
+def run_walk_forward(symbol, start_date, end_date, strategy, n_folds=5, in_sample_ratio=0.75,
+                     grid=None, anchored=False, max_workers=None):
+    """
+    Walk-forward d'une stratégie sur un symbole
+
+    Returns:
+        dict: plis (dates, paramètres retenus, valeur in-sample et
+        out-of-sample), courbe out-of-sample chaînée et synthèse
+    """
+    spec = get_strategy(strategy)
+
+    stock_data = load_prices(symbol, start_date, end_date, interval='1d')
+    if stock_data.empty:
+        raise ValueError(f"Aucune donnée trouvée pour {symbol}")
+
+    folds, results, equity = walk_forward_graph(
+        spec, indicator_graph(symbol, '1d', stock_data), len(stock_data), n_folds, in_sample_ratio,
+        grid=grid, anchored=anchored, max_workers=max_workers
+    )
+
+    dates = pd.DatetimeIndex(stock_data['Date'])
+    capital = spec.capital
+    rows = []
+    for fold, result in zip(folds, results):
+        rows.append({
+            'inSample': {'start': dates[fold.is_start].strftime('%Y-%m-%d'),
+                         'end': dates[fold.is_end - 1].strftime('%Y-%m-%d')},
+            'outOfSample': {'start': dates[fold.is_end].strftime('%Y-%m-%d'),
+                            'end': dates[fold.oos_end - 1].strftime('%Y-%m-%d')},
+            'params': {name: type(spec.defaults[name])(value) for name, value in result['params'].items()},
+            'inSampleGains': round((result['in_sample_equity'] - capital) / capital * 100, 1),
+            'outOfSampleGains': round((float(result['equity'][-1]) - capital) / capital * 100, 1),
+            'numberOfTrades': result['number_of_trades'],
+            'maxDrawdown': result['max_drawdown']
+        })
+
+    final_equity = float(equity[-1]) if len(equity) else float(capital)
+    return {
+        'folds': rows,
+        'dates': dates[folds[0].is_end:folds[-1].oos_end],
+        'equity': equity,
+        'summary': {
+            'initialCapital': capital,
+            'finalEquity': round(final_equity, 2),
+            'gains': round((final_equity - capital) / capital * 100, 1),
+            'maxDrawdown': max_drawdown(equity),
+            'numberOfTrades': sum(result['number_of_trades'] for result in results)
+        }
+    }
@@ -0,0 +1,27 @@
+"""
+Point d'entrée WSGI de l'API PyTrader pour un serveur de production
+
+    pip install -r requirements-prod.txt
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Avec preload_app (voir gunicorn.conf.py), ce module est importé une seule
+fois dans le processus maître : pandas, matplotlib, yfinance et les modules
+de stratégie sont chargés avant la création des workers, qui en héritent.
+"""
+
+import os
+import sys
+
+# Pas d'affichage sur un serveur : backend matplotlib sans interface
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import yfinance  # noqa: F401  (importé à la demande sinon, au premier téléchargement)
+except ImportError:
+    pass
+
+from api_server import app, shutdown_services  # noqa: E402
+
+__all__ = ['app', 'shutdown_services']